@@ -0,0 +1,199 @@
+# Bulk JSONL -> SQLite ingest for the dataset cache (tables in db/schema.py).
+#
+# Rows are parsed with orjson and inserted with INSERT OR IGNORE through executemany, one
+# transaction per batch, on a WAL-mode connection with synchronous=NORMAL. The unique
+# constraints on the tables do the dedupe, so re-ingesting a file (or an overlapping one)
+# only adds rows that are new.
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import orjson
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from db.schema import SCHEMA_VERSION, HumanHint, ImitationSample, SchemaInfo
+from src.utils.imitation_shards import pack_masks, unpack_masks
+
+IMITATION_COLUMNS = (
+    "battle_tag",
+    "turn",
+    "side",
+    "decision",
+    "teacher",
+    "format",
+    "action0",
+    "action1",
+    "obs_dim",
+    "act_size",
+    "obs",
+    "mask",
+)
+HINT_COLUMNS = ("replay_id", "battle_tag", "format", "turn", "side", "slot", "event", "hint")
+
+
+@dataclass
+class IngestStats:
+    read: int = 0
+    inserted: int = 0
+    invalid: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def duplicates(self) -> int:
+        return self.read - self.invalid - self.inserted
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.read / elapsed if elapsed > 0 else 0.0
+        return (
+            f"{self.inserted} inserted, {self.duplicates} duplicates, {self.invalid} invalid "
+            f"of {self.read} lines in {elapsed:.1f}s ({rate:.0f} lines/s)"
+        )
+
+
+def create_cache(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for table in (ImitationSample.__tablename__, HumanHint.__tablename__):
+            if session.exec(select(SchemaInfo).where(SchemaInfo.table_name == table)).first():
+                continue
+            session.add(SchemaInfo(table_name=str(table), version=SCHEMA_VERSION))
+        session.commit()
+    engine.dispose()
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    return conn
+
+
+def imitation_row(record: dict[str, Any]) -> tuple[Any, ...]:
+    obs = np.asarray(record["obs_v0"], dtype="<f4")
+    masks = np.asarray(record["mask"], dtype=np.bool_)
+    first, second = record["action"]
+    return (
+        str(record["battle_tag"]),
+        int(record.get("turn") or 0),
+        str(record.get("side") or ""),
+        int(record.get("decision") or 0),
+        str(record.get("teacher") or ""),
+        record.get("format"),
+        int(first),
+        int(second),
+        int(obs.shape[-1]),
+        int(masks.shape[-1]),
+        obs.tobytes(),
+        pack_masks(masks).tobytes(),
+    )
+
+
+def hint_row(record: dict[str, Any]) -> tuple[Any, ...]:
+    return (
+        record.get("replay_id"),
+        str(record["battle_tag"]),
+        record.get("format"),
+        int(record["turn"]),
+        str(record.get("side") or ""),
+        str(record.get("slot") or ""),
+        str(record["event"]),
+        str(record.get("hint") or record["event"]),
+    )
+
+
+def _iter_lines(path: Path) -> Iterator[bytes]:
+    with path.open("rb") as handle:
+        for line in handle:
+            if line.strip():
+                yield line
+
+
+def _ingest(
+    conn: sqlite3.Connection,
+    lines: Iterable[bytes],
+    table: str,
+    columns: tuple[str, ...],
+    to_row: Callable[[dict[str, Any]], tuple[Any, ...]],
+    batch_size: int,
+) -> IngestStats:
+    sql = (
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    stats = IngestStats()
+    batch: list[tuple[Any, ...]] = []
+
+    def flush() -> None:
+        before = conn.total_changes
+        with conn:  # one transaction per batch
+            conn.executemany(sql, batch)
+        stats.inserted += conn.total_changes - before
+        batch.clear()
+
+    for line in lines:
+        stats.read += 1
+        try:
+            batch.append(to_row(orjson.loads(line)))
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            stats.invalid += 1
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def ingest_imitation(conn: sqlite3.Connection, path: Path, batch_size: int = 10_000) -> IngestStats:
+    return _ingest(
+        conn,
+        _iter_lines(path),
+        str(ImitationSample.__tablename__),
+        IMITATION_COLUMNS,
+        imitation_row,
+        batch_size,
+    )
+
+
+def ingest_hints(conn: sqlite3.Connection, path: Path, batch_size: int = 10_000) -> IngestStats:
+    return _ingest(
+        conn, _iter_lines(path), str(HumanHint.__tablename__), HINT_COLUMNS, hint_row, batch_size
+    )
+
+
+def load_sample(
+    conn: sqlite3.Connection, battle_tag: str, turn: int, side: str = "", decision: int = 0
+) -> dict[str, Any] | None:
+    # Point lookup through the (battle_tag, turn, side, decision) unique index.
+    row = conn.execute(
+        f"SELECT teacher, format, action0, action1, obs_dim, act_size, obs, mask "
+        f"FROM {ImitationSample.__tablename__} "
+        f"WHERE battle_tag = ? AND turn = ? AND side = ? AND decision = ?",
+        (battle_tag, turn, side, decision),
+    ).fetchone()
+    if row is None:
+        return None
+    teacher, fmt, action0, action1, obs_dim, act_size, obs, mask = row
+    return {
+        "battle_tag": battle_tag,
+        "turn": turn,
+        "side": side,
+        "decision": decision,
+        "teacher": teacher,
+        "format": fmt,
+        "action": [action0, action1],
+        "obs_v0": np.frombuffer(obs, dtype="<f4", count=obs_dim),
+        "mask": unpack_masks(np.frombuffer(mask, dtype=np.uint8).reshape(2, -1), act_size),
+    }
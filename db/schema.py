@@ -1,6 +1,11 @@
-from datetime import datetime
+from datetime import UTC, datetime
 
-from sqlmodel import Field, SQLModel, create_engine
+from sqlalchemy import Index, LargeBinary, UniqueConstraint
+from sqlmodel import Column, Field, SQLModel, create_engine
+
+# Bump when a table layout changes; tables carry the version in their name so an old cache
+# can sit next to a new one while it is re-ingested.
+SCHEMA_VERSION = 2
 
 
 class Run(SQLModel, table=True):
@@ -10,6 +15,67 @@ class Run(SQLModel, table=True):
     notes: str | None = None
 
 
+class SchemaInfo(SQLModel, table=True):
+    __tablename__ = "schema_info"
+
+    table_name: str = Field(primary_key=True)
+    version: int
+    # Timezone-aware: recent sqlmodel releases reject naive datetimes on insert.
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class ImitationSample(SQLModel, table=True):
+    # obs is little-endian float32 bytes, mask is np.packbits of the (2, act_size) slot masks
+    # (the same encoding as the columnar shards in src/utils/imitation_shards.py). decision is
+    # the collector's per-battle request index: a forced switch after a faint shares its turn
+    # with that turn's move decision, so it is part of the dedupe key (0 for older rows).
+    __tablename__ = f"imitation_v{SCHEMA_VERSION}"
+    __table_args__ = (
+        UniqueConstraint(
+            "battle_tag", "turn", "side", "decision", name=f"uq_imitation_v{SCHEMA_VERSION}"
+        ),
+        Index(f"ix_imitation_v{SCHEMA_VERSION}_turn", "turn"),
+        Index(f"ix_imitation_v{SCHEMA_VERSION}_teacher", "teacher"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    battle_tag: str
+    turn: int
+    side: str = ""
+    decision: int = 0
+    teacher: str = ""
+    format: str | None = None
+    action0: int
+    action1: int
+    obs_dim: int
+    act_size: int
+    obs: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    mask: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
+class HumanHint(SQLModel, table=True):
+    # One battle turn can hold several hints per side (both slots switching, protect plus a
+    # switch), so event and slot are part of the dedupe key; slot is "" when not applicable.
+    __tablename__ = f"hints_v{SCHEMA_VERSION}"
+    __table_args__ = (
+        UniqueConstraint(
+            "battle_tag", "turn", "side", "event", "slot", name=f"uq_hints_v{SCHEMA_VERSION}"
+        ),
+        Index(f"ix_hints_v{SCHEMA_VERSION}_turn", "turn"),
+        Index(f"ix_hints_v{SCHEMA_VERSION}_hint", "hint"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    replay_id: str | None = None
+    battle_tag: str
+    format: str | None = None
+    turn: int
+    side: str = ""
+    slot: str = ""
+    event: str
+    hint: str
+
+
 def create_db(path: str = "runs.sqlite"):
     engine = create_engine(f"sqlite:///{path}")
     SQLModel.metadata.create_all(engine)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Time the protocol tokenizer against the per-line regex hint parser it replaced."""
+
+from __future__ import annotations
+
+import random
+import re
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import typer
+
+try:
+    from scripts.parse_replays_minimal import replay_hints
+    from src.utils.replay_archive import iter_loose_replays
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from scripts.parse_replays_minimal import replay_hints
+    from src.utils.replay_archive import iter_loose_replays
+
+# The hint parser before the tokenizer: three regexes tried in turn on every line.
+MOVE_LINE = re.compile(r"^\|move\|(?P<side>p[12])[ab]?: [^|]+\|(?P<move>[^|]+)")
+SWITCH_LINE = re.compile(r"^\|switch\|(?P<side>p[12])(?P<slot>[ab]): ")
+TURN_LINE = re.compile(r"^\|turn\|(?P<n>\d+)")
+MOVES = ["Protect", "Tailwind", "Fake Out", "Moonblast", "Heat Wave", "Detect", "Spore"]
+MONS = ["Incineroar", "Flutter Mane", "Tornadus", "Amoonguss", "Urshifu", "Rillaboom"]
+
+
+def regex_hints(tag: str, blob: bytes, ext: str) -> list[dict[str, object]]:
+    text = blob.decode("utf-8", errors="ignore")
+    base = {"replay_id": tag, "battle_tag": f"battle-{tag}", "format": tag.split("-")[0]}
+    hints: list[dict[str, object]] = []
+    turn: int | None = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if match := TURN_LINE.match(line):
+            turn = int(match.group("n"))
+        elif match := MOVE_LINE.match(line):
+            hint = {"protect": "protect", "detect": "protect", "tailwind": "tailwind"}.get(
+                match.group("move").strip().lower()
+            )
+            if turn is not None and hint:
+                hints.append({**base, "turn": turn, "event": hint, "side": match.group("side")})
+        elif (match := SWITCH_LINE.match(line)) and turn is not None:
+            hints.append({**base, "turn": turn, "event": "switch", "side": match.group("side")})
+    return hints
+
+
+def synthetic_log(rng: random.Random, turns: int) -> str:
+    # Roughly the mix of a real doubles log: moves, damage, chat and upkeep noise.
+    lines = ["|init|battle", "|tier|[Gen 9] Doubles OU", "|player|p1|Alice|1", "|player|p2|Bob|2"]
+    for turn in range(1, turns + 1):
+        lines.append(f"|turn|{turn}")
+        for side in ("p1", "p2"):
+            for slot in "ab":
+                mon = rng.choice(MONS)
+                if rng.random() < 0.1:
+                    lines.append(f"|switch|{side}{slot}: {mon}|{mon}, L50|100/100")
+                    continue
+                foe = "p2" if side == "p1" else "p1"
+                lines.append(f"|move|{side}{slot}: {mon}|{rng.choice(MOVES)}|{foe}a: {mon}")
+                lines.append(f"|-damage|{foe}a: {mon}|{rng.randint(1, 99)}/100")
+        if rng.random() < 0.3:
+            lines.append("|c|☆Alice|gg")
+        lines += ["|", "|upkeep"]
+    lines.append("|win|Alice")
+    return "\n".join(lines) + "\n"
+
+
+def best_of(parse: Callable[[str, bytes, str], list], corpus: list[bytes], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for idx, blob in enumerate(corpus):
+            parse(f"gen9doublesou-{idx}", blob, ".log")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+app = typer.Typer(add_completion=False, no_args_is_help=False)
+
+
+@app.command()
+def main(
+    raw_dir: Path | None = typer.Option(None, help="Benchmark these replays instead"),  # noqa: B008
+    logs: int = typer.Option(500, help="Synthetic logs to generate"),  # noqa: B008
+    turns: int = typer.Option(20, help="Turns per synthetic log"),  # noqa: B008
+    repeats: int = typer.Option(5, help="Timed passes; the best one is reported"),  # noqa: B008
+    seed: int = typer.Option(0, help="Synthetic corpus seed"),  # noqa: B008
+) -> None:
+    if raw_dir is not None:
+        corpus = [path.read_bytes() for path in iter_loose_replays(raw_dir)]
+    else:
+        rng = random.Random(seed)
+        corpus = [synthetic_log(rng, turns).encode() for _ in range(logs)]
+    n_lines = sum(blob.count(b"\n") for blob in corpus)
+    # Both must find the same hints, or the timing compares different work.
+    n_old = sum(len(regex_hints(f"t-{i}", blob, ".log")) for i, blob in enumerate(corpus))
+    n_new = sum(len(replay_hints(f"t-{i}", blob, ".log")) for i, blob in enumerate(corpus))
+    if n_old != n_new:
+        print(f"[warn] regex found {n_old} hints, tokenizer {n_new}")
+    old = best_of(regex_hints, corpus, repeats)
+    new = best_of(replay_hints, corpus, repeats)
+    print(f"{len(corpus)} logs, {n_lines} lines, best of {repeats}:")
+    print(f"  regex     {old:.3f}s ({n_lines / old / 1e6:.2f}M lines/s)")
+    print(f"  tokenizer {new:.3f}s ({n_lines / new / 1e6:.2f}M lines/s), {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    app()
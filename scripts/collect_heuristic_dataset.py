@@ -4,167 +4,108 @@
 from __future__ import annotations
 
 import asyncio
-import contextlib
-import json
-import random
+import multiprocessing
 import sys
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import cast
+from urllib.parse import urlparse
 
 import numpy as np
 import typer
 from poke_env.battle import DoubleBattle
-from poke_env.environment.doubles_env import DoublesEnv
 from poke_env.player import Player
 from poke_env.player.baselines import (
     MaxBasePowerPlayer,
     RandomPlayer,
     SimpleHeuristicsPlayer,
 )
+from poke_env.ps_client import AccountConfiguration
 
 try:
-    from src.utils.poke_env_utils import act_size_for_format, server_configuration_for_url
+    from src.utils.action_masks import action_to_tuple, legal_action_masks
+    from src.utils.battle_pool import BattlePool
+    from src.utils.dataset_merge import merge_jsonl_shards, shard_dir_for, shard_path
+    from src.utils.imitation_shards import SHARD_SUFFIX, ShardRecorder, open_shard
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.obs_encoder import ObsEncoderV0
+    from src.utils.opponent_pool import OpponentPool
+    from src.utils.poke_env_utils import (
+        act_size_for_format,
+        server_configuration_for_url,
+        url_with_port,
+    )
+    from src.utils.policy_player import BatchedPolicyPlayer, PoolPolicyPlayer
+    from src.utils.recorder import BufferedRecorder, Recorder, RecordSink
+    from src.utils.team_validation import TeamValidator, showdown_validate_command
     from src.utils.teambuilders import (
-        RotatingTeambuilder,
+        TeamPool,
         constant_team_from_text,
-        load_showdown_teams_from_dir,
+        pack_team,
         read_showdown_team,
     )
 except ImportError:  # allow running as a script without installing the package
     ROOT = Path(__file__).resolve().parents[1]
     if str(ROOT) not in sys.path:
         sys.path.insert(0, str(ROOT))
-    from src.utils.poke_env_utils import act_size_for_format, server_configuration_for_url
+    from src.utils.action_masks import action_to_tuple, legal_action_masks
+    from src.utils.battle_pool import BattlePool
+    from src.utils.dataset_merge import merge_jsonl_shards, shard_dir_for, shard_path
+    from src.utils.imitation_shards import SHARD_SUFFIX, ShardRecorder, open_shard
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.obs_encoder import ObsEncoderV0
+    from src.utils.opponent_pool import OpponentPool
+    from src.utils.poke_env_utils import (
+        act_size_for_format,
+        server_configuration_for_url,
+        url_with_port,
+    )
+    from src.utils.policy_player import BatchedPolicyPlayer, PoolPolicyPlayer
+    from src.utils.recorder import BufferedRecorder, Recorder, RecordSink
+    from src.utils.team_validation import TeamValidator, showdown_validate_command
     from src.utils.teambuilders import (
-        RotatingTeambuilder,
+        TeamPool,
         constant_team_from_text,
-        load_showdown_teams_from_dir,
+        pack_team,
         read_showdown_team,
     )
 
-STATUS_NAMES = ["SLP", "PAR", "BRN", "FRZ", "PSN", "TOX"]
-TYPE_NAMES = [
-    "NORMAL",
-    "FIRE",
-    "WATER",
-    "ELECTRIC",
-    "GRASS",
-    "ICE",
-    "FIGHTING",
-    "POISON",
-    "GROUND",
-    "FLYING",
-    "PSYCHIC",
-    "BUG",
-    "ROCK",
-    "GHOST",
-    "DRAGON",
-    "DARK",
-    "STEEL",
-    "FAIRY",
-]
-
-
-def encode_status(mon) -> list[int]:
-    onehot = [0] * len(STATUS_NAMES)
-    if mon:
-        status = getattr(mon, "status", None)
-        name = getattr(status, "name", None)
-        if isinstance(name, str) and name in STATUS_NAMES:
-            onehot[STATUS_NAMES.index(name)] = 1
-    return onehot
-
-
-def encode_types(mon) -> list[int]:
-    onehot = [0] * len(TYPE_NAMES)
-    if mon is None:
-        return onehot
-    types = getattr(mon, "types", []) or []
-    for t in types:
-        name = getattr(t, "name", str(t)).upper()
-        if name in TYPE_NAMES:
-            onehot[TYPE_NAMES.index(name)] = 1
-    return onehot
-
-
-def hp_ratio(mon) -> float:
-    if mon is None:
-        return 0.0
-    current = getattr(mon, "current_hp", None) or 0
-    maximum = getattr(mon, "max_hp", None) or 0
-    return float(current) / float(maximum) if maximum else 0.0
-
-
-def per_slot_mask(battle: DoubleBattle, slot: int, act_size: int) -> list[int]:
-    mask = [0] * act_size
-    for action_idx in range(act_size):
-        try:
-            DoublesEnv._action_to_order_individual(np.int64(action_idx), battle, False, slot)
-            mask[action_idx] = 1
-        except AssertionError:
-            mask[action_idx] = 0
-        except Exception:
-            mask[action_idx] = 0
-    return mask
-
-
-def action_to_tuple(order, battle: DoubleBattle) -> tuple[int, int]:
-    arr = DoublesEnv.order_to_action(order, battle, fake=True, strict=False)
-    pair = cast("tuple[int, int]", tuple(int(x) for x in arr))
-    return pair[0], pair[1]
-
-
-def encode_obs_v0(battle: DoubleBattle) -> list[float]:
-    feats: list[float] = []
-    slots = list(battle.active_pokemon) + list(battle.opponent_active_pokemon)
-    for mon in slots:
-        feats.append(hp_ratio(mon))
-        feats.extend(encode_status(mon))
-        feats.extend(encode_types(mon))
-    return feats
-
-
-class Recorder:
-    def __init__(self, out_path: Path):
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        self._fh = out_path.open("a", encoding="utf-8")
-
-    def write(self, payload: dict[str, object]) -> None:
-        self._fh.write(json.dumps(payload, ensure_ascii=False) + "\n")
-        self._fh.flush()
-
-    def close(self) -> None:
-        with contextlib.suppress(Exception):
-            self._fh.close()
-
 
 class RecordingHeuristics(SimpleHeuristicsPlayer):
-    def __init__(self, recorder: Recorder, act_size: int, teacher_name: str, **kwargs):
+    def __init__(self, recorder: RecordSink, act_size: int, teacher_name: str, **kwargs):
         self._recorder = recorder
         self._act_size = act_size
         self._teacher_name = teacher_name
+        self._encoder = ObsEncoderV0()
+        # Requests answered per battle: a forced switch after a faint shares its turn with
+        # that turn's move decision, so the index is what tells the two rows apart.
+        self._decisions: Counter[str] = Counter()
         super().__init__(**kwargs)
 
     def choose_move(self, battle: DoubleBattle):
         order = super().choose_move(battle)
-        mask0 = per_slot_mask(battle, 0, self._act_size)
-        mask1 = per_slot_mask(battle, 1, self._act_size)
-        obs = encode_obs_v0(battle)
+        masks = legal_action_masks(battle, self._act_size)
+        obs = self._encoder.encode(battle)
         first, second = action_to_tuple(order, battle)
         record = {
             "battle_tag": battle.battle_tag,
             "turn": battle.turn,
+            "side": battle.player_role,
+            "decision": self._decisions[battle.battle_tag],
             "teacher": self._teacher_name,
             "format": battle.battle_tag.split("-")[1] if "-" in battle.battle_tag else None,
-            "obs_v0": obs,
+            "obs_v0": obs.tolist(),
             "action": [first, second],
-            "mask": [mask0, mask1],
+            "mask": masks.astype(np.int8).tolist(),
         }
+        self._decisions[battle.battle_tag] += 1
         self._recorder.write(record)
         return order
 
 
+OPPONENT_WEIGHTS = [0.5, 0.3, 0.2]
+
+
 def make_player(kind: str, record: bool = False, **kwargs) -> Player:
     kind = kind.lower()
     if kind in {"simple", "heuristic", "simpleheuristics"}:
@@ -182,6 +123,12 @@ def make_player(kind: str, record: bool = False, **kwargs) -> Player:
         return MaxBasePowerPlayer(**kwargs)
     if kind == "random":
         return RandomPlayer(**kwargs)
+    if kind == "policy":
+        # Concurrent battles share one InferenceBatcher, so their forward passes are batched.
+        return BatchedPolicyPlayer(batcher=kwargs.pop("batcher"), **kwargs)
+    if kind == "pool":
+        # Past checkpoints sampled per battle, loaded once into the pool's shared LRU cache.
+        return PoolPolicyPlayer(pool=kwargs.pop("pool"), **kwargs)
     raise ValueError(f"Unknown player kind: {kind}")
 
 
@@ -195,22 +142,117 @@ class Settings:
     teacher_kind: str
     opponents_kinds: list[str]
     out_path: Path
+    concurrency: int = 1
+    account_prefix: str | None = None
+    team_cache: Path | None = None
+    showdown_dir: Path | None = None
+    validation_cache: Path | None = None
+    stall_timeout: float = 30.0
+    battle_timeout: float = 1800.0
+    policy_path: Path | None = None
+    policy_batch: int = 64
+    checkpoints_dir: Path | None = None
+    pool_strategy: str = "latest"
+    pool_cache: int = 4
+    buffered: bool = False
+    record_batch: int = 512
+    flush_interval: float = 2.0
+
+
+def account_for(prefix: str | None, role: str) -> AccountConfiguration | None:
+    # Showdown caps usernames at 18 characters.
+    if not prefix:
+        return None
+    return AccountConfiguration(f"{prefix}{role}"[:18], None)
+
+
+def make_recorder(settings: Settings) -> RecordSink:
+    if settings.out_path.suffix == SHARD_SUFFIX:
+        return ShardRecorder(settings.out_path, chunk_rows=settings.record_batch)
+    if settings.buffered:
+        return BufferedRecorder(
+            settings.out_path,
+            batch_size=settings.record_batch,
+            flush_interval=settings.flush_interval,
+        )
+    return Recorder(settings.out_path)
+
+
+def rejected_teams(settings: Settings, team_pool: TeamPool, our_team_text: str) -> list[str]:
+    # Runs every team through the local server's validator (cached by team hash) and returns
+    # the packed opponent teams to leave out. Our own team being illegal ends the run here
+    # instead of after a start timeout per battle.
+    if settings.showdown_dir is None:
+        return []
+    validator = TeamValidator(
+        showdown_validate_command(settings.showdown_dir), cache_path=settings.validation_cache
+    )
+    teams = team_pool.team_files()
+    ours = pack_team(our_team_text)
+    if ours is not None:
+        teams[str(settings.our_team_path)] = ours
+    rejected = validator.check(teams, settings.battle_format)
+    for label, problems in sorted(rejected.items()):
+        print(f"[teams] {label} rejected for {settings.battle_format}:")
+        for problem in problems:
+            print(f"  {problem}")
+    if str(settings.our_team_path) in rejected:
+        raise ValueError(f"{settings.our_team_path} is not legal in {settings.battle_format}")
+    print(
+        f"[teams] {len(teams) - len(rejected)}/{len(teams)} teams valid for "
+        f"{settings.battle_format} ({validator.validated} checked, the rest cached)"
+    )
+    return [teams[label] for label in rejected]
+
+
+def opponent_weights(kinds: list[str]) -> dict[str, float]:
+    # Up to three kinds keep the 0.5/0.3/0.2 split in listed order; more kinds are sampled
+    # uniformly, so every listed kind is played. A repeated kind's weights add up.
+    if len(kinds) <= len(OPPONENT_WEIGHTS):
+        weights = OPPONENT_WEIGHTS[: len(kinds)]
+    else:
+        weights = [1.0] * len(kinds)
+    kind_weights: dict[str, float] = {}
+    for kind, weight in zip(kinds, weights, strict=True):
+        kind_weights[kind] = kind_weights.get(kind, 0.0) + weight
+    return kind_weights
+
+
+def policy_batcher(settings: Settings) -> InferenceBatcher | None:
+    # The "policy" opponent needs a saved MaskablePPO model; other kinds need no batcher.
+    if "policy" not in settings.opponents_kinds:
+        return None
+    if settings.policy_path is None:
+        raise ValueError("The policy opponent needs --policy")
+    return InferenceBatcher(maskable_ppo_policy(settings.policy_path), settings.policy_batch)
+
+
+def opponent_pool(settings: Settings) -> OpponentPool | None:
+    if "pool" not in settings.opponents_kinds:
+        return None
+    if settings.checkpoints_dir is None:
+        raise ValueError("The pool opponent needs --checkpoints")
+    pool = OpponentPool(
+        settings.checkpoints_dir,
+        strategy=settings.pool_strategy,
+        cache_size=settings.pool_cache,
+        max_batch=settings.policy_batch,
+    )
+    if not len(pool):
+        raise ValueError(f"No checkpoints in {settings.checkpoints_dir}")
+    return pool
 
 
-async def play_dataset(settings: Settings) -> None:
+async def play_dataset(settings: Settings, pool: OpponentPool | None = None) -> None:
     act_size = act_size_for_format(settings.battle_format)
     server_cfg = server_configuration_for_url(settings.server_url)
 
     our_team_text = read_showdown_team(settings.our_team_path)
-    opponents = [
-        team
-        for team in load_showdown_teams_from_dir(settings.opponent_teams_dir)
-        if team.strip() and team.strip() != our_team_text.strip()
-    ]
-    if not opponents:
-        opponents = [our_team_text]
+    # Parsed once (or loaded from the cache) and shared by every opponent client.
+    team_pool = TeamPool(settings.opponent_teams_dir, cache_path=settings.team_cache)
+    illegal = rejected_teams(settings, team_pool, our_team_text)
 
-    recorder = Recorder(settings.out_path)
+    recorder = make_recorder(settings)
     teacher = make_player(
         settings.teacher_kind,
         record=True,
@@ -219,32 +261,137 @@ async def play_dataset(settings: Settings) -> None:
         battle_format=settings.battle_format,
         team=constant_team_from_text(our_team_text),
         server_configuration=server_cfg,
-        max_concurrent_battles=1,
+        max_concurrent_battles=settings.concurrency,
+        account_configuration=account_for(settings.account_prefix, "teacher"),
     )
-
-    try:
-        for battle_idx in range(settings.n_battles):
-            weights = [0.5, 0.3, 0.2][: len(settings.opponents_kinds)]
-            opponent_kind = random.choices(settings.opponents_kinds, weights=weights)[0]
-            opponent = make_player(
-                opponent_kind,
+    # One long-lived client per opponent kind; each accept pulls the next rotating team.
+    batcher = policy_batcher(settings)
+    checkpoints = pool or opponent_pool(settings)
+    extra: dict[str, dict] = {
+        "policy": {"batcher": batcher, "act_size": act_size},
+        "pool": {"pool": checkpoints, "act_size": act_size},
+    }
+    kind_weights = opponent_weights(settings.opponents_kinds)
+    battles = BattlePool(
+        teacher,
+        {
+            kind: make_player(
+                kind,
                 battle_format=settings.battle_format,
-                team=RotatingTeambuilder(opponents),
+                team=team_pool.builder(exclude=[our_team_text, *illegal], fallback=our_team_text),
                 server_configuration=server_cfg,
-                max_concurrent_battles=1,
+                max_concurrent_battles=settings.concurrency,
+                account_configuration=account_for(settings.account_prefix, kind),
+                **extra.get(kind, {}),
             )
-            try:
-                await asyncio.wait_for(teacher.battle_against(opponent, n_battles=1), timeout=60)
-            except TimeoutError:
-                print(f"[warn] battle {battle_idx + 1}: timeout, probably a rejected team")
-                continue
+            for kind in kind_weights
+        },
+        weights=list(kind_weights.values()),
+        concurrency=settings.concurrency,
+        stall_timeout=settings.stall_timeout,
+        battle_timeout=settings.battle_timeout,
+    )
+
+    try:
+        stats = await battles.run(settings.n_battles)
     finally:
         recorder.close()
+        if batcher is not None:
+            batcher.close()
+        if checkpoints is not None:
+            checkpoints.close()
 
     print(
-        f"Collected {settings.n_battles} battles in {settings.out_path}. "
+        f"Collected {stats.finished} battles in {settings.out_path}. "
         f"Teacher={settings.teacher_kind} format={settings.battle_format} act_size={act_size}"
     )
+    print(f"[pool] concurrency={settings.concurrency} {stats.summary()}")
+    print(f"[recorder] {type(recorder).__name__} {recorder.stats.summary()}")
+    if batcher is not None:
+        print(f"[batcher] {batcher.stats.summary()}")
+    if checkpoints is not None:
+        print(
+            f"[checkpoints] {len(checkpoints)} ({settings.pool_strategy}) "
+            f"{checkpoints.stats.summary()}"
+        )
+
+
+def _run_worker(settings: Settings, pool: OpponentPool | None = None) -> None:
+    asyncio.run(play_dataset(settings, pool))
+
+
+def worker_settings(settings: Settings, workers: int, base_port: int) -> list[Settings]:
+    # Worker i talks to the server on base_port + i, logs in as w<i>-<role> and appends to
+    # its own shard, so workers never share a websocket, an account or a file handle.
+    per_worker, extra = divmod(settings.n_battles, workers)
+    return [
+        replace(
+            settings,
+            n_battles=per_worker + (1 if idx < extra else 0),
+            server_url=url_with_port(settings.server_url, base_port + idx),
+            out_path=shard_path(settings.out_path, idx),
+            account_prefix=f"w{idx}-",
+        )
+        for idx in range(workers)
+    ]
+
+
+def launch_workers(settings: Settings, workers: int, base_port: int) -> None:
+    if settings.team_cache is not None:
+        # Warm the packed-team cache once so spawned workers start without parsing teams.
+        teams = TeamPool(settings.opponent_teams_dir, cache_path=settings.team_cache)
+        print(
+            f"[teams] {len(teams)} opponent teams, {teams.parsed} parsed -> {settings.team_cache}"
+        )
+        # Validate once up front too, so workers read verdicts from the cache.
+        rejected_teams(settings, teams, read_showdown_team(settings.our_team_path))
+    # Load the newest checkpoints once; workers get handles to the same shared-memory weights.
+    checkpoints = opponent_pool(settings)
+    if checkpoints is not None:
+        checkpoints.warm()
+    shards = worker_settings(settings, workers, base_port)
+    ctx = multiprocessing.get_context("spawn")  # poke-env runs its own loop thread
+    processes = [
+        ctx.Process(target=_run_worker, args=(shard, checkpoints), name=f"collect-w{idx}")
+        for idx, shard in enumerate(shards)
+        if shard.n_battles > 0
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            print(f"[warn] {process.name} exited with code {process.exitcode}")
+    merge_shards(settings.out_path)
+
+
+def merge_shards(out_path: Path) -> None:
+    shards = sorted(shard_dir_for(out_path).glob(f"shard-*{out_path.suffix or '.jsonl'}"))
+    if out_path.suffix == SHARD_SUFFIX:
+        # Columnar shards are memory-mapped side by side by the loaders; nothing to rewrite.
+        filled = 0
+        for shard in shards:
+            data = open_shard(shard)
+            if not len(data):
+                print(f"  {shard.name}: empty, skipped")
+                continue
+            filled += 1
+            print(f"  {shard.name}: {len(data.battle_tags)} battles, {len(data)} records")
+        print(f"{filled} columnar shards with records in {shard_dir_for(out_path)}")
+        return
+    manifest = merge_jsonl_shards(shards, out_path)
+    for entry in manifest["shards"]:
+        if entry.get("missing"):
+            print(f"[warn] shard {entry['shard']} missing at {entry['path']}")
+            continue
+        print(
+            f"  {entry['shard']}: {entry['battles']} battles, {entry['records']} records, "
+            f"{entry['duplicates']} duplicates dropped"
+        )
+    print(
+        f"Merged {len(manifest['shards'])} shards -> {out_path}: {manifest['battles']} battles, "
+        f"{manifest['records']} records appended to {manifest['existing']} already there"
+    )
 
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
@@ -259,7 +406,32 @@ def main(
     opponent_teams_dir: Path = typer.Option(Path("teams"), help="Directory with opponent teams"),  # noqa: B008
     teacher: str = typer.Option("simple", help="Teacher kind"),  # noqa: B008
     opponents: str = typer.Option("simple,maxbp,random", help="Opponent kinds"),  # noqa: B008
-    out: Path = typer.Option(Path("data/imitation.jsonl"), help="Output JSONL path"),  # noqa: B008
+    out: Path = typer.Option(Path("data/imitation.jsonl"), help="Output path (.jsonl/.shard)"),  # noqa: B008
+    concurrency: int = typer.Option(1, help="Battles kept in flight at once"),  # noqa: B008
+    workers: int = typer.Option(1, help="Worker processes, one local server port each"),  # noqa: B008
+    base_port: int | None = typer.Option(None, help="Port of worker 0 (default: URL port)"),  # noqa: B008
+    merge_only: bool = typer.Option(False, help="Only merge existing shards into --out"),  # noqa: B008
+    buffered: bool = typer.Option(False, help="Batch records on a background writer thread"),  # noqa: B008
+    record_batch: int = typer.Option(512, help="Buffered mode: records per write"),  # noqa: B008
+    flush_interval: float = typer.Option(2.0, help="Buffered mode: max seconds between writes"),  # noqa: B008
+    team_cache: Path | None = typer.Option(  # noqa: B008
+        Path("data/team_pool.json"), help="Packed opponent-team cache shared by workers"
+    ),
+    stall_timeout: float = typer.Option(  # noqa: B008
+        30.0, help="Forfeit a battle after this many seconds without a protocol message"
+    ),
+    battle_timeout: float = typer.Option(1800.0, help="Forfeit battles running longer than this"),  # noqa: B008
+    showdown_dir: Path | None = typer.Option(  # noqa: B008
+        None, help="pokemon-showdown checkout whose validator checks every team first"
+    ),
+    validation_cache: Path = typer.Option(  # noqa: B008
+        Path("data/team_validation.jsonl"), help="Validator verdicts per format and team hash"
+    ),
+    policy: Path | None = typer.Option(None, help="MaskablePPO model for the policy opponent"),  # noqa: B008
+    policy_batch: int = typer.Option(64, help="Policy opponent: max battles per forward pass"),  # noqa: B008
+    checkpoints: Path | None = typer.Option(None, help="Checkpoint dir for the pool opponent"),  # noqa: B008
+    pool_strategy: str = typer.Option("latest", help="Pool sampling: latest/uniform/prioritized"),  # noqa: B008
+    pool_cache: int = typer.Option(4, help="Pool opponent: checkpoints kept loaded"),  # noqa: B008
 ) -> None:
     opponent_list = [token.strip() for token in opponents.split(",") if token.strip()]
     if not opponent_list:
@@ -273,8 +445,27 @@ def main(
         teacher_kind=teacher,
         opponents_kinds=opponent_list,
         out_path=out,
+        concurrency=max(1, concurrency),
+        buffered=buffered,
+        record_batch=record_batch,
+        flush_interval=flush_interval,
+        team_cache=team_cache,
+        showdown_dir=showdown_dir,
+        validation_cache=validation_cache,
+        stall_timeout=stall_timeout,
+        battle_timeout=battle_timeout,
+        policy_path=policy,
+        policy_batch=max(1, policy_batch),
+        checkpoints_dir=checkpoints,
+        pool_strategy=pool_strategy,
+        pool_cache=max(1, pool_cache),
     )
-    asyncio.run(play_dataset(settings))
+    if merge_only:
+        merge_shards(out)
+    elif workers > 1:
+        launch_workers(settings, workers, base_port or urlparse(server_url).port or 8000)
+    else:
+        asyncio.run(play_dataset(settings))
 
 
 if __name__ == "__main__":
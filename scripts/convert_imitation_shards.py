@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Convert imitation JSONL into a columnar shard (float32 obs, int16 actions, packed masks)."""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import typer
+
+try:
+    from src.utils.imitation_shards import SHARD_SUFFIX, convert_jsonl, iter_jsonl_records
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.imitation_shards import SHARD_SUFFIX, convert_jsonl, iter_jsonl_records
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+@app.command()
+def main(
+    src: Path = typer.Option(Path("data/imitation.jsonl"), help="Input JSONL path"),  # noqa: B008
+    out: Path | None = typer.Option(None, help="Output shard dir (default: <src>.shard)"),  # noqa: B008
+    chunk_rows: int = typer.Option(16384, help="Rows buffered per column write"),  # noqa: B008
+) -> None:
+    out = out or src.with_suffix(SHARD_SUFFIX)
+    started = time.perf_counter()
+    rows = convert_jsonl(iter_jsonl_records(src), out, chunk_rows=chunk_rows)
+    elapsed = time.perf_counter() - started
+    in_mb = src.stat().st_size / 1e6
+    out_mb = sum(f.stat().st_size for f in out.iterdir()) / 1e6
+    print(
+        f"Converted {rows} rows in {elapsed:.1f}s: {src} ({in_mb:.1f} MB) -> {out} ({out_mb:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Turn stored human replays into imitation tuples offline, without a Showdown server."""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import typer
+
+try:
+    from src.utils.imitation_shards import SHARD_SUFFIX, ShardRecorder
+    from src.utils.recorder import BufferedRecorder, RecordSink
+    from src.utils.replay_archive import ReplayArchive, ReplayRef, iter_loose_replays
+    from src.utils.replay_imitation import ConvertStats, ReplayConverter
+    from src.utils.showdown_protocol import log_from_blob
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.imitation_shards import SHARD_SUFFIX, ShardRecorder
+    from src.utils.recorder import BufferedRecorder, RecordSink
+    from src.utils.replay_archive import ReplayArchive, ReplayRef, iter_loose_replays
+    from src.utils.replay_imitation import ConvertStats, ReplayConverter
+    from src.utils.showdown_protocol import log_from_blob
+
+CONVERTER = ReplayConverter()
+
+
+def convert_one(ref: ReplayRef) -> tuple[ReplayRef, list[dict[str, Any]], ConvertStats, str | None]:
+    # Top-level so it pickles into pool workers; errors come back as data, not exceptions.
+    try:
+        name = Path(ref.name)
+        log = log_from_blob(ref.read(), name.suffix.lower())
+        records, stats = CONVERTER.convert(name.stem, log)
+        return ref, records, stats, None
+    except Exception as exc:
+        return ref, [], ConvertStats(replays=1), f"{type(exc).__name__}: {exc}"
+
+
+def convert_all(
+    refs: list[ReplayRef], workers: int = 1, chunk_size: int = 16
+) -> Iterator[tuple[ReplayRef, list[dict[str, Any]], ConvertStats, str | None]]:
+    # Results come back in input order whatever the worker count, so output is deterministic.
+    if workers <= 1:
+        yield from map(convert_one, refs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(convert_one, refs, chunksize=max(1, chunk_size))
+
+
+def replay_refs(raw_dir: Path, archive: Path | None) -> list[ReplayRef]:
+    if archive is not None:
+        return ReplayArchive(archive, readonly=True).refs()
+    return [ReplayRef(path.name, path) for path in iter_loose_replays(raw_dir)]
+
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+@app.command()
+def main(
+    raw_dir: Path = typer.Option(Path("data/replays_raw"), help="Directory with raw replays"),  # noqa: B008
+    archive: Path | None = typer.Option(  # noqa: B008
+        None, help="Read replays from this compressed archive instead of raw_dir"
+    ),
+    out: Path = typer.Option(  # noqa: B008
+        Path("data/imitation_human.jsonl"), help="Output path (.jsonl/.shard)"
+    ),
+    workers: int = typer.Option(1, help="Converter processes (1 = convert in this process)"),  # noqa: B008
+    chunk_size: int = typer.Option(16, help="Replays handed to a worker at a time"),  # noqa: B008
+) -> None:
+    refs = replay_refs(raw_dir, archive)
+    # Records arrive in bulk, so JSONL goes through the batching writer thread.
+    recorder: RecordSink = (
+        ShardRecorder(out) if out.suffix == SHARD_SUFFIX else BufferedRecorder(out)
+    )
+    totals = ConvertStats()
+    failures: list[tuple[str, str]] = []
+    started = time.perf_counter()
+    try:
+        for ref, records, stats, error in convert_all(refs, workers, chunk_size):
+            totals.add(stats)
+            if error is not None:
+                failures.append((ref.label, error))
+                continue
+            for record in records:
+                recorder.write(record)
+    finally:
+        recorder.close()
+    elapsed = time.perf_counter() - started
+    print(f"{totals.summary()} -> {out}")
+    print(f"{len(refs) / elapsed if elapsed > 0 else 0.0:.1f} replays/s with {workers} workers")
+    if failures:
+        print(f"[warn] {len(failures)} replays failed to convert:")
+        for label, error in failures:
+            print(f"  {label}: {error}")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,11 +1,235 @@
+#!/usr/bin/env python3
+"""Round-robin evaluation of baseline players and checkpoints on local Showdown servers."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
 import typer
+from poke_env.battle import AbstractBattle
+from poke_env.player import Player
+from poke_env.ps_client import AccountConfiguration
+
+try:
+    from src.utils.battle_pool import BattlePool
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.poke_env_utils import (
+        act_size_for_format,
+        server_configuration_for_url,
+        url_with_port,
+    )
+    from src.utils.policy_player import BatchedPolicyPlayer
+    from src.utils.selfplay_env import OPPONENTS
+    from src.utils.teambuilders import TeamPool
+    from src.utils.tournament import Tournament
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.battle_pool import BattlePool
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.poke_env_utils import (
+        act_size_for_format,
+        server_configuration_for_url,
+        url_with_port,
+    )
+    from src.utils.policy_player import BatchedPolicyPlayer
+    from src.utils.selfplay_env import OPPONENTS
+    from src.utils.teambuilders import TeamPool
+    from src.utils.tournament import Tournament
+
+
+@dataclass
+class EvalSettings:
+    battle_format: str
+    server_urls: list[str]
+    teams_dir: Path
+    concurrency: int = 4
+    chunk: int = 20
+    stall_timeout: float = 30.0
+    battle_timeout: float = 1800.0
+
+
+def agent_names(baselines: list[str], checkpoints: list[Path]) -> dict[str, Path | None]:
+    # Agent name -> checkpoint path (None for a baseline); checkpoints are named by file stem.
+    agents: dict[str, Path | None] = {}
+    for kind in baselines:
+        if kind not in OPPONENTS:
+            raise typer.BadParameter(f"Unknown baseline {kind!r} (expected {', '.join(OPPONENTS)})")
+        agents[kind] = None
+    for path in checkpoints:
+        name = path.stem
+        while name in agents:
+            name += "_"
+        agents[name] = path
+    return agents
+
+
+def make_players(
+    settings: EvalSettings,
+    server_idx: int,
+    agents: dict[str, Path | None],
+    batchers: dict[str, InferenceBatcher],
+    team_pool: TeamPool,
+) -> dict[str, Player]:
+    # One logged-in client per agent on each server; both sides draw teams from the pool.
+    act_size = act_size_for_format(settings.battle_format)
+    players: dict[str, Player] = {}
+    for agent_idx, (name, path) in enumerate(agents.items()):
+        kwargs = {
+            "battle_format": settings.battle_format,
+            "team": team_pool.builder(),
+            "server_configuration": server_configuration_for_url(settings.server_urls[server_idx]),
+            "max_concurrent_battles": settings.concurrency,
+            # Showdown caps usernames at 18 characters.
+            "account_configuration": AccountConfiguration(
+                f"ev{server_idx}-{agent_idx}-{name}"[:18], None
+            ),
+        }
+        if path is None:
+            players[name] = OPPONENTS[name](**kwargs)
+        else:
+            players[name] = BatchedPolicyPlayer(batcher=batchers[name], act_size=act_size, **kwargs)
+    return players
+
+
+async def run_server(
+    settings: EvalSettings, tournament: Tournament, players: dict[str, Player]
+) -> None:
+    # Plays chunks of whichever matchup is furthest behind until every matchup is decided.
+    while (job := tournament.next_matchup(settings.chunk)) is not None:
+        (first, second), games = job
+        results: list[bool | None] = []
+
+        def on_finished(_kind: str, battle: AbstractBattle, results=results) -> None:
+            results.append(battle.won)
+
+        pool = BattlePool(
+            players[first],
+            {second: players[second]},
+            concurrency=settings.concurrency,
+            stall_timeout=settings.stall_timeout,
+            battle_timeout=settings.battle_timeout,
+        )
+        try:
+            await pool.run(games, on_finished)
+        finally:
+            # Results are applied on this loop, not poke-env's, so the tournament has one owner.
+            for won in results:
+                tournament.record(first, second, won)
+            tournament.release((first, second), games)
+        if not results:
+            # Every battle of the chunk failed to start or stalled; retrying would loop forever.
+            print(f"[warn] no {first} vs {second} battle finished, stopping this server")
+            return
+        matchup = tournament.matchups[(first, second)]
+        low, high = matchup.interval(tournament.z)
+        status = "decided" if tournament.decided((first, second)) else "open"
+        print(
+            f"[{first} vs {second}] {matchup.wins}-{matchup.losses}-{matchup.ties} "
+            f"win rate {matchup.win_rate:.3f} [{low:.3f}, {high:.3f}] ({status})"
+        )
+
+
+async def evaluate(
+    settings: EvalSettings, tournament: Tournament, agents: dict[str, Path | None]
+) -> None:
+    team_pool = TeamPool(settings.teams_dir)
+    if not len(team_pool):
+        raise typer.BadParameter(f"No valid teams in {settings.teams_dir}")
+    # One batcher per checkpoint, shared by its clients on every server.
+    batchers = {
+        name: InferenceBatcher(maskable_ppo_policy(path))
+        for name, path in agents.items()
+        if path is not None
+    }
+    servers = [
+        make_players(settings, idx, agents, batchers, team_pool)
+        for idx in range(len(settings.server_urls))
+    ]
+    try:
+        await asyncio.gather(*(run_server(settings, tournament, players) for players in servers))
+    finally:
+        for batcher in batchers.values():
+            batcher.close()
+
+
+def report(tournament: Tournament) -> None:
+    print("\nMatchups (win rate of the first agent, Wilson interval):")
+    for (first, second), matchup in tournament.matchups.items():
+        low, high = matchup.interval(tournament.z)
+        print(
+            f"  {first:>16} vs {second:<16} {matchup.games:5d} games  "
+            f"{matchup.win_rate:.3f} [{low:.3f}, {high:.3f}]"
+        )
+    print("\nElo (Bradley-Terry, mean 1500):")
+    ratings = tournament.ratings()
+    for name, rating in sorted(ratings.items(), key=lambda item: -item[1]):
+        print(f"  {name:>16} {rating:7.1f}")
+    share = 100 * tournament.games / tournament.budget if tournament.budget else 0.0
+    print(
+        f"\n{tournament.games}/{tournament.budget} games played "
+        f"({share:.0f}% of the fixed budget of {tournament.max_games} per matchup)"
+    )
+
 
-app = typer.Typer()
+app = typer.Typer(add_completion=False, no_args_is_help=True)
 
 
 @app.command()
-def main(n_games: int = 1000):
-    print("Offline evaluation stub with", n_games, "games.")
+def main(
+    n_games: int = typer.Option(1000, help="Max games per matchup"),  # noqa: B008
+    agents: str = typer.Option("simple,maxbp,random", help="Baseline agents"),  # noqa: B008
+    checkpoints: str = typer.Option("", help="Comma-separated MaskablePPO models to include"),  # noqa: B008
+    format: str = typer.Option("gen9doublesou", help="Battle format"),  # noqa: B008
+    teams: Path = typer.Option(Path("teams"), help="Team pool both sides draw from"),  # noqa: B008
+    server_url: str = typer.Option("http://localhost:8000", help="Showdown server URL"),  # noqa: B008
+    servers: int = typer.Option(1, help="Local servers on consecutive ports"),  # noqa: B008
+    base_port: int | None = typer.Option(None, help="Port of server 0 (default: URL port)"),  # noqa: B008
+    concurrency: int = typer.Option(4, help="Battles in flight per server"),  # noqa: B008
+    chunk: int = typer.Option(20, help="Games per matchup between stopping checks"),  # noqa: B008
+    min_games: int = typer.Option(40, help="Games before a matchup may stop early"),  # noqa: B008
+    precision: float = typer.Option(0.05, help="Stop once the interval is within +-this"),  # noqa: B008
+    z: float = typer.Option(1.96, help="Interval width in standard errors"),  # noqa: B008
+    out: Path | None = typer.Option(  # noqa: B008
+        Path("data/eval_offline.jsonl"), help="Game journal; an interrupted run resumes from it"
+    ),
+    stall_timeout: float = typer.Option(30.0, help="Forfeit battles stalled this many seconds"),  # noqa: B008
+) -> None:
+    baselines = [token.strip() for token in agents.split(",") if token.strip()]
+    models = [Path(token.strip()) for token in checkpoints.split(",") if token.strip()]
+    roster = agent_names(baselines, models)
+    port = base_port or urlparse(server_url).port or 8000
+    settings = EvalSettings(
+        battle_format=format,
+        server_urls=[url_with_port(server_url, port + idx) for idx in range(max(1, servers))],
+        teams_dir=teams,
+        concurrency=max(1, concurrency),
+        chunk=max(1, chunk),
+        stall_timeout=stall_timeout,
+    )
+    tournament = Tournament(
+        list(roster),
+        max_games=n_games,
+        min_games=min_games,
+        precision=precision,
+        z=z,
+        journal_path=out,
+    )
+    if tournament.games:
+        print(f"Resuming from {out}: {tournament.games} games already played")
+    print(
+        f"{len(roster)} agents, {len(tournament.matchups)} matchups on "
+        f"{len(settings.server_urls)} server(s), up to {n_games} games each"
+    )
+    try:
+        asyncio.run(evaluate(settings, tournament, roster))
+    finally:
+        report(tournament)
 
 
 if __name__ == "__main__":
@@ -3,10 +3,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import re
-import time
-import urllib.error
+import sys
 import urllib.parse
 import urllib.request
 import urllib.robotparser
@@ -16,6 +16,18 @@ from pathlib import Path
 
 import typer
 
+try:
+    from src.utils.fetch_index import FetchIndex
+    from src.utils.replay_archive import ReplayArchive
+    from src.utils.replay_fetch import FetchEngine
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.fetch_index import FetchIndex
+    from src.utils.replay_archive import ReplayArchive
+    from src.utils.replay_fetch import FetchEngine
+
 BASE_URL = "https://replay.pokemonshowdown.com"
 USER_AGENT_DEFAULT = "poke-rl/0.1 (+contact: none)"
 
@@ -53,22 +65,6 @@ def http_get(url: str, user_agent: str, timeout: float = 15.0) -> bytes:
         return response.read()
 
 
-def try_fetch_variants(replay_id: str, user_agent: str) -> tuple[bytes | None, str | None]:
-    for ext in (".json", ".log", ""):
-        url = f"{BASE_URL}/{replay_id}{ext}"
-        try:
-            blob = http_get(url, user_agent=user_agent)
-        except urllib.error.HTTPError as exc:
-            if exc.code == 404:
-                continue
-            return None, None
-        except Exception:
-            return None, None
-        if blob:
-            return blob, (ext or ".html")
-    return None, None
-
-
 def best_effort_user_search(user: str, fmt: str, limit: int, user_agent: str) -> list[str]:
     ids: list[str] = []
     try:
@@ -116,6 +112,10 @@ class Settings:
     rate: float
     user_agent: str
     overwrite: bool
+    concurrency: int = 4
+    max_retries: int = 4
+    base_url: str = BASE_URL
+    archive: Path | None = None
 
 
 def collect_targets(settings: Settings) -> list[str]:
@@ -141,52 +141,66 @@ def collect_targets(settings: Settings) -> list[str]:
 
 def run(settings: Settings) -> None:
     settings.out_dir.mkdir(parents=True, exist_ok=True)
-    robots = load_robots(BASE_URL)
+    robots = load_robots(settings.base_url)
     user_agent = settings.user_agent or USER_AGENT_DEFAULT
-    index_path = settings.out_dir / "index.json"
-    try:
-        index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
-    except Exception:
-        index = {}
 
     replay_ids = collect_targets(settings)
     if not replay_ids:
         print("No targets provided. Use --ids/--urls or --user to discover replays.")
         return
 
-    delay = 1.0 / max(settings.rate, 0.1)
-    fetched = 0
+    index = FetchIndex(settings.out_dir)
+    pending: list[str] = []
     for replay_id in replay_ids:
-        base_path = settings.out_dir / replay_id
-        if not settings.overwrite and any(
-            base_path.with_suffix(suffix).exists() for suffix in (".json", ".log", ".html")
-        ):
+        if not settings.overwrite and replay_id in index:
             continue
-        url = f"{BASE_URL}/{replay_id}"
+        url = f"{settings.base_url}/{replay_id}"
         if not robots.can_fetch(user_agent, url):
             print(f"robots disallow: {url}")
             continue
-        blob, ext = try_fetch_variants(replay_id, user_agent)
+        pending.append(replay_id)
+
+    fetched = 0
+    archive = ReplayArchive(settings.archive) if settings.archive else None
+
+    def on_result(replay_id: str, blob: bytes | None, ext: str | None) -> None:
+        nonlocal fetched
         if not blob or not ext:
             print(f"miss: {replay_id}")
-            continue
-        output_path = base_path.with_suffix(ext)
+            return
         try:
-            output_path.write_bytes(blob)
+            if archive is not None:
+                archive.add(replay_id, blob, ext)
+                output_path = archive.root
+            else:
+                output_path = (settings.out_dir / replay_id).with_suffix(ext)
+                output_path.write_bytes(blob)
         except Exception as exc:
             print(f"error: {replay_id} {exc}")
-            continue
-        index[replay_id] = {
-            "path": str(output_path),
-            "ext": ext,
-            "format": replay_id.split("-")[0],
-        }
+            return
+        index.record(replay_id, output_path, ext)
         fetched += 1
-        if settings.rate > 0:
-            time.sleep(delay)
 
-    index_path.write_text(json.dumps(index, indent=2), encoding="utf-8")
-    print(f"Fetched {fetched} / {len(replay_ids)} replays into {settings.out_dir}")
+    # --rate is a global ceiling shared by all concurrent requests, retries included.
+    engine = FetchEngine(
+        user_agent,
+        rate=settings.rate,
+        concurrency=settings.concurrency,
+        max_retries=settings.max_retries,
+    )
+    try:
+        stats = asyncio.run(
+            engine.fetch_many(settings.base_url, pending, on_result, variants=index.variants)
+        )
+        if index.redundant_lines > len(index):
+            index.compact()
+    finally:
+        index.close()
+        if archive is not None:
+            archive.close()
+    target = settings.archive or settings.out_dir
+    print(f"Fetched {fetched} / {len(replay_ids)} replays into {target}")
+    print(f"HTTP: {stats.summary()}")
 
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
@@ -201,9 +215,14 @@ def main(
     user: str | None = typer.Option(None, help="Fetch recent replays for this username"),  # noqa: B008
     format: str = typer.Option("gen9doublesou", help="Replay format"),  # noqa: B008
     limit: int = typer.Option(200, help="Max replays to fetch from user search"),  # noqa: B008
-    rate: float = typer.Option(0.5, help="Requests per second"),  # noqa: B008
+    rate: float = typer.Option(0.5, help="Requests per second, across all connections"),  # noqa: B008
+    concurrency: int = typer.Option(4, help="Requests in flight at once"),  # noqa: B008
+    max_retries: int = typer.Option(4, help="Retries per request on 429/5xx"),  # noqa: B008
     user_agent: str = typer.Option(USER_AGENT_DEFAULT, help="HTTP User-Agent"),  # noqa: B008
     overwrite: bool = typer.Option(False, help="Overwrite existing files"),  # noqa: B008
+    archive: Path | None = typer.Option(  # noqa: B008
+        None, help="Append replays to this compressed archive instead of loose files"
+    ),
 ) -> None:
     settings = Settings(
         out_dir=out_dir,
@@ -216,6 +235,9 @@ def main(
         rate=rate,
         user_agent=user_agent,
         overwrite=overwrite,
+        concurrency=concurrency,
+        max_retries=max_retries,
+        archive=archive,
     )
     run(settings)
 
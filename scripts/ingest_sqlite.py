@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Bulk-ingest imitation and human-hint JSONL into the SQLite dataset cache (db/schema.py)."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import typer
+
+try:
+    from db.ingest import connect, create_cache, ingest_hints, ingest_imitation
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from db.ingest import connect, create_cache, ingest_hints, ingest_imitation
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+@app.command()
+def main(
+    db_path: Path = typer.Option(Path("data/dataset_cache.sqlite"), "--db", help="SQLite cache"),  # noqa: B008
+    imitation: list[Path] = typer.Option([], help="Imitation JSONL files (repeatable)"),  # noqa: B008
+    hints: list[Path] = typer.Option([], help="Human-hint JSONL files (repeatable)"),  # noqa: B008
+    batch_size: int = typer.Option(10_000, help="Rows per executemany/transaction"),  # noqa: B008
+) -> None:
+    if not imitation and not hints:
+        raise typer.BadParameter("pass at least one --imitation or --hints file")
+    create_cache(db_path)
+    conn = connect(db_path)
+    try:
+        for path in imitation:
+            print(f"[imitation] {path}: {ingest_imitation(conn, path, batch_size).summary()}")
+        for path in hints:
+            print(f"[hints] {path}: {ingest_hints(conn, path, batch_size).summary()}")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Pack a directory of loose replay files into a compressed replay archive."""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+from pathlib import Path
+
+import typer
+
+try:
+    from src.utils.replay_archive import ReplayArchive, iter_loose_replays
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.replay_archive import ReplayArchive, iter_loose_replays
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+@app.command()
+def main(
+    raw_dir: Path = typer.Option(Path("data/replays_raw"), help="Directory with raw replays"),  # noqa: B008
+    archive: Path = typer.Option(Path("data/replays_archive"), help="Archive directory"),  # noqa: B008
+    shard_mb: int = typer.Option(256, help="Start a new shard past this many MB"),  # noqa: B008
+    level: int = typer.Option(6, help="gzip compression level (1-9)"),  # noqa: B008
+    delete: bool = typer.Option(False, help="Delete each file once its archived copy verifies"),  # noqa: B008
+) -> None:
+    store = ReplayArchive(archive, shard_bytes=shard_mb << 20, level=level)
+    added = skipped = deleted = 0
+    raw_bytes = 0
+    try:
+        for path in iter_loose_replays(raw_dir):
+            blob = path.read_bytes()
+            digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+            entry = store.get(path.stem)
+            # Re-running is safe: replays already archived with the same bytes are skipped.
+            if entry is None or entry["hash"] != digest:
+                entry = store.add(path.stem, blob, path.suffix or ".html")
+                added += 1
+                raw_bytes += len(blob)
+            else:
+                skipped += 1
+            if delete:
+                if hashlib.blake2b(store.read(path.stem), digest_size=16).hexdigest() != digest:
+                    print(f"[warn] {path}: archived copy does not verify, keeping the file")
+                    continue
+                path.unlink()
+                deleted += 1
+    finally:
+        store.close()
+    packed = sum(shard.stat().st_size for shard in archive.glob("shard-*.gz"))
+    print(f"Archived {added} replays ({raw_bytes / 1e6:.1f} MB raw), {skipped} already present")
+    print(
+        f"{len(store)} replays in {archive} ({packed / 1e6:.1f} MB packed); deleted {deleted} files"
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -3,101 +3,111 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
-import re
-from collections.abc import Iterable
+import sys
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import TextIO
 
 import typer
 
-MOVE_LINE = re.compile(r"^\|move\|(?P<side>p[12])[ab]?: [^|]+\|(?P<move>[^|]+)")
-SWITCH_LINE = re.compile(r"^\|switch\|(?P<side>p[12])(?P<slot>[ab]): ")
-TURN_LINE = re.compile(r"^\|turn\|(?P<n>\d+)")
-
-
-def _lines_from_blob(blob: bytes, ext: str) -> list[str]:
-    if ext == ".json":
-        try:
-            payload = json.loads(blob.decode("utf-8", errors="ignore"))
-        except Exception:
-            payload = None
-        if isinstance(payload, dict):
-            for key in ("log", "logdata", "replay", "payload"):
-                value = payload.get(key)
-                if isinstance(value, str):
-                    return [line for line in value.splitlines() if line.strip()]
-    text = blob.decode("utf-8", errors="ignore")
-    if "|init|battle" in text:
-        text = text[text.index("|init|battle") :]
-    return [line for line in text.splitlines() if line.strip()]
-
-
-def iter_replay_files(raw_dir: Path) -> Iterable[Path]:
-    for path in sorted(raw_dir.glob("*")):
-        if path.is_file() and path.suffix.lower() in {".json", ".log", ".html", ""}:
-            yield path
-
-
-def parse_replay(path: Path) -> list[dict[str, object]]:
-    tag = path.stem
-    lines = _lines_from_blob(path.read_bytes(), path.suffix.lower())
+try:
+    from src.utils.parse_manifest import ParseManifest, manifest_path
+    from src.utils.replay_archive import ReplayArchive, ReplayRef, iter_loose_replays
+    from src.utils.showdown_protocol import Move, ProtocolParser, Switch, log_from_blob
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.parse_manifest import ParseManifest, manifest_path
+    from src.utils.replay_archive import ReplayArchive, ReplayRef, iter_loose_replays
+    from src.utils.showdown_protocol import Move, ProtocolParser, Switch, log_from_blob
+
+HINT_PARSER = ProtocolParser(types=("move", "switch"))  # no "drag": only chosen switches
+MOVE_HINTS = {"protect": "protect", "detect": "protect", "tailwind": "tailwind"}
+
+
+def replay_hints(tag: str, blob: bytes, ext: str) -> list[dict[str, object]]:
+    log = log_from_blob(blob, ext)
+    base = {"replay_id": tag, "battle_tag": f"battle-{tag}", "format": tag.split("-")[0]}
     hints: list[dict[str, object]] = []
-    turn: int | None = None
-    for line in lines:
-        turn_match = TURN_LINE.match(line)
-        if turn_match:
-            turn = int(turn_match.group("n"))
+    for event in HINT_PARSER.events_from_text(log):
+        if event.turn is None:
             continue
-        move_match = MOVE_LINE.match(line)
-        if move_match:
-            if turn is None:
-                continue
-            move = move_match.group("move").strip().lower()
-            side = move_match.group("side")
-            if move in {"protect", "detect"}:
+        if isinstance(event, Move):
+            hint = MOVE_HINTS.get(event.move.lower())
+            if hint:
                 hints.append(
-                    {
-                        "replay_id": tag,
-                        "battle_tag": f"battle-{tag}",
-                        "format": tag.split("-")[0],
-                        "turn": turn,
-                        "event": "protect",
-                        "hint": "protect",
-                        "side": side,
-                    }
+                    {**base, "turn": event.turn, "event": hint, "hint": hint, "side": event.side}
                 )
-            if move == "tailwind":
-                hints.append(
-                    {
-                        "replay_id": tag,
-                        "battle_tag": f"battle-{tag}",
-                        "format": tag.split("-")[0],
-                        "turn": turn,
-                        "event": "tailwind",
-                        "hint": "tailwind",
-                        "side": side,
-                    }
-                )
-            continue
-        switch_match = SWITCH_LINE.match(line)
-        if switch_match:
-            if turn is None:
-                continue
+        elif isinstance(event, Switch) and event.slot:
             hints.append(
                 {
-                    "replay_id": tag,
-                    "battle_tag": f"battle-{tag}",
-                    "format": tag.split("-")[0],
-                    "turn": turn,
+                    **base,
+                    "turn": event.turn,
                     "event": "switch",
                     "hint": "switch",
-                    "side": switch_match.group("side"),
-                    "slot": switch_match.group("slot"),
+                    "side": event.side,
+                    "slot": event.slot,
                 }
             )
     return hints
 
 
+def list_replays(raw_dir: Path, archive: Path | None) -> list[tuple[ReplayRef, int, int]]:
+    # (ref, size, mtime_ns) per replay; archived replays use their add time as the mtime.
+    replays: list[tuple[ReplayRef, int, int]] = []
+    if archive is not None:
+        store = ReplayArchive(archive, readonly=True)
+        for replay_id in sorted(store):
+            entry = store[replay_id]
+            replays.append((store.ref(replay_id), entry["size"], entry["added_ns"]))
+        return replays
+    for path in iter_loose_replays(raw_dir):
+        stat = path.stat()
+        replays.append((ReplayRef(path.name, path), stat.st_size, stat.st_mtime_ns))
+    return replays
+
+
+def scan_one(
+    job: tuple[ReplayRef, str | None],
+) -> tuple[ReplayRef, str, list[dict[str, object]] | None, str | None]:
+    # Top-level so it pickles into pool workers; errors come back as data, not exceptions.
+    # The replay is read once for both the hash and the parse; hints are None when the
+    # content still matches the known hash (a touched but unchanged file).
+    ref, known_hash = job
+    try:
+        blob = ref.read()
+        digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+        if digest == known_hash:
+            return ref, digest, None, None
+        name = Path(ref.name)
+        return ref, digest, replay_hints(name.stem, blob, name.suffix.lower()), None
+    except Exception as exc:
+        return ref, "", [], f"{type(exc).__name__}: {exc}"
+
+
+def scan_all(
+    jobs: list[tuple[ReplayRef, str | None]], workers: int = 1, chunk_size: int = 64
+) -> Iterator[tuple[ReplayRef, str, list[dict[str, object]] | None, str | None]]:
+    # Results come back in input order whatever the worker count, so output is deterministic.
+    if workers <= 1:
+        yield from map(scan_one, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(scan_one, jobs, chunksize=max(1, chunk_size))
+
+
+def _write_hints(handle: TextIO, hints: Iterable[dict[str, object]]) -> int:
+    n_events = 0
+    for hint in hints:
+        handle.write(json.dumps(hint) + "\n")
+        n_events += 1
+    return n_events
+
+
 app = typer.Typer(add_completion=False, no_args_is_help=True)
 
 
@@ -105,20 +115,82 @@ app = typer.Typer(add_completion=False, no_args_is_help=True)
 def main(
     raw_dir: Path = typer.Option(Path("data/replays_raw"), help="Directory with raw replays"),  # noqa: B008
     out: Path = typer.Option(Path("data/human_hints.jsonl"), help="Output JSONL path"),  # noqa: B008
+    workers: int = typer.Option(1, help="Parser processes (1 = parse in this process)"),  # noqa: B008
+    chunk_size: int = typer.Option(64, help="Files handed to a worker at a time"),  # noqa: B008
+    full: bool = typer.Option(False, help="Ignore the manifest and re-parse every replay"),  # noqa: B008
+    archive: Path | None = typer.Option(  # noqa: B008
+        None, help="Read replays from this compressed archive instead of raw_dir"
+    ),
 ) -> None:
     out.parent.mkdir(parents=True, exist_ok=True)
+    manifest = ParseManifest(manifest_path(out), archive or raw_dir)
+    if full:
+        manifest.reset()
+
+    # Stat every replay; only new files and files whose size/mtime moved get read.
+    jobs: list[tuple[ReplayRef, str | None]] = []
+    stats: dict[str, tuple[int, int]] = {}
+    seen: set[str] = set()
+    for ref, size, mtime_ns in list_replays(raw_dir, archive):
+        seen.add(ref.name)
+        if not manifest.is_current(ref.name, size, mtime_ns):
+            entry = manifest.get(ref.name)
+            jobs.append((ref, entry["hash"] if entry else None))
+            stats[ref.name] = (size, mtime_ns)
+    removed = [name for name in manifest if name not in seen]
+    for name in removed:
+        manifest.forget(name)
+
+    # Appending is only safe onto the exact output the last committed run left behind.
+    rewrite = bool(removed) or not (out.exists() and out.stat().st_size == manifest.output_size)
     n_files = 0
     n_events = 0
-    with out.open("w", encoding="utf-8") as handle:
-        for replay_path in iter_replay_files(raw_dir):
-            try:
-                for event in parse_replay(replay_path):
-                    handle.write(json.dumps(event) + "\n")
-                    n_events += 1
-                n_files += 1
-            except Exception:
-                continue
+    n_touched = 0
+    appended: list[dict[str, object]] = []
+    failures: list[tuple[str, str]] = []
+    for ref, digest, hints, error in scan_all(jobs, workers, chunk_size):
+        known = manifest.get(ref.name)
+        if error is not None:
+            failures.append((ref.label, error))
+            if known is not None:
+                manifest.forget(ref.name)
+                rewrite = True
+            continue
+        if hints is None:
+            assert known is not None
+            manifest.record(ref.name, *stats[ref.name], digest, known["hints"])
+            n_touched += 1
+            continue
+        manifest.record(ref.name, *stats[ref.name], digest, hints)
+        if known is None:
+            appended.extend(hints)
+        elif known["hints"] != hints:
+            rewrite = True
+        n_events += len(hints)
+        n_files += 1
+
+    if rewrite:
+        tmp = out.with_name(f"{out.name}.tmp")
+        with tmp.open("w", encoding="utf-8") as handle:
+            n_total = _write_hints(handle, manifest.hints())
+        tmp.replace(out)
+    else:
+        with out.open("a", encoding="utf-8") as handle:
+            _write_hints(handle, appended)
+        n_total = None
+    manifest.commit(out.stat().st_size)
+    manifest.close()
+
     print(f"Parsed {n_events} events from {n_files} files -> {out}")
+    unchanged = len(seen) - len(jobs)
+    print(
+        f"{unchanged} unchanged, {n_touched} touched but identical, {len(removed)} removed; "
+        + (f"rewrote {n_total} events" if n_total is not None else f"appended {n_events} events")
+    )
+    if failures:
+        print(f"[warn] {len(failures)} files failed to parse:")
+        for label, error in failures:
+            print(f"  {label}: {error}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""MaskablePPO training on vectorized Gen 9 Doubles environments against a fixed opponent."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import typer
+import yaml
+from sb3_contrib import MaskablePPO
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList, CheckpointCallback
+
+try:
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.opponent_pool import STRATEGIES, OpponentPool
+    from src.utils.selfplay_env import OPPONENTS, POLICY_OPPONENT, env_specs
+    from src.utils.teambuilders import read_showdown_team
+    from src.utils.vec_env import StepRateVecEnv, make_vec_env
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.inference_batcher import InferenceBatcher, maskable_ppo_policy
+    from src.utils.opponent_pool import STRATEGIES, OpponentPool
+    from src.utils.selfplay_env import OPPONENTS, POLICY_OPPONENT, env_specs
+    from src.utils.teambuilders import read_showdown_team
+    from src.utils.vec_env import StepRateVecEnv, make_vec_env
+
+
+class StepRateCallback(BaseCallback):
+    # Logs env steps/sec after every rollout, next to SB3's own fps (which includes updates).
+    def __init__(self, venv: StepRateVecEnv):
+        super().__init__()
+        self.venv = venv
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self) -> None:
+        self.logger.record("rollout/env_steps_per_s", self.venv.steps_per_s(since_last=True))
+
+
+def load_config(path: Path) -> dict[str, Any]:
+    config = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    if not isinstance(config, dict):
+        raise typer.BadParameter(f"{path} is not a mapping")
+    return config
+
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+@app.command()
+def main(
+    config: Path = typer.Option(Path("configs/default.yml"), help="PPO/env config"),  # noqa: B008
+    server_url: str = typer.Option("http://localhost:8000", help="Showdown server URL"),  # noqa: B008
+    servers: int = typer.Option(1, help="Local servers on consecutive ports, shared round-robin"),  # noqa: B008
+    base_port: int | None = typer.Option(None, help="Port of server 0 (default: URL port)"),  # noqa: B008
+    envs: int | None = typer.Option(None, help="Environments (default: rollout_workers)"),  # noqa: B008
+    opponent: str = typer.Option("simple", help=f"Opponent kind: {', '.join(OPPONENTS)}"),  # noqa: B008
+    opponent_policy: Path | None = typer.Option(  # noqa: B008
+        None, help="Play against this saved MaskablePPO model instead of --opponent"
+    ),
+    opponent_pool: Path | None = typer.Option(  # noqa: B008
+        None, help="Play against past checkpoints in this dir; new ones are saved there"
+    ),
+    pool_strategy: str = typer.Option("latest", help=f"Pool sampling: {'/'.join(STRATEGIES)}"),  # noqa: B008
+    pool_cache: int = typer.Option(4, help="Checkpoints kept loaded"),  # noqa: B008
+    checkpoint_every: int = typer.Option(50_000, help="Env steps between pool checkpoints"),  # noqa: B008
+    team: Path = typer.Option(Path("teams/gen9dou_fixed.txt"), help="Team for both sides"),  # noqa: B008
+    timesteps: int | None = typer.Option(None, help="Override total_timesteps"),  # noqa: B008
+    minibatch: int = typer.Option(2048, help="PPO minibatch size"),  # noqa: B008
+    out: Path = typer.Option(Path("models/ppo_selfplay.zip"), help="Where to save the model"),  # noqa: B008
+) -> None:
+    cfg = load_config(config)
+    n_envs = envs or int(cfg.get("rollout_workers", 1))
+    battle_format = str(cfg.get("format", "gen9doublesou"))
+    batcher = None
+    if opponent_policy is not None:
+        # Every env's opponent move comes from one batched forward pass per vector step.
+        opponent = POLICY_OPPONENT
+        batcher = InferenceBatcher(maskable_ppo_policy(opponent_policy, deterministic=False))
+    pool = None
+    if opponent_pool is not None:
+        opponent = POLICY_OPPONENT
+        pool = OpponentPool(opponent_pool, strategy=pool_strategy, cache_size=max(1, pool_cache))
+    specs = env_specs(
+        n_envs,
+        battle_format,
+        server_url,
+        n_servers=servers,
+        base_port=base_port or urlparse(server_url).port or 8000,
+        opponent=opponent,
+        team=read_showdown_team(team),
+    )
+    venv = make_vec_env(specs, opponent_batcher=batcher, opponent_pool=pool)
+    # config batch_size is the rollout size across all environments.
+    n_steps = max(1, int(cfg.get("batch_size", 2048)) // n_envs)
+    model = MaskablePPO(
+        "MlpPolicy",
+        venv,
+        learning_rate=float(cfg.get("learning_rate", 3e-4)),
+        n_steps=n_steps,
+        batch_size=min(minibatch, n_steps * n_envs),
+        n_epochs=int(cfg.get("update_epochs", 4)),
+        gamma=float(cfg.get("gamma", 0.99)),
+        gae_lambda=float(cfg.get("gae_lambda", 0.95)),
+        clip_range=float(cfg.get("clip_ratio", 0.2)),
+        ent_coef=float(cfg.get("entropy_coef", 0.0)),
+        vf_coef=float(cfg.get("vf_coef", 0.5)),
+        max_grad_norm=float(cfg.get("max_grad_norm", 0.5)),
+        seed=cfg.get("seed"),
+        verbose=1,
+    )
+    callbacks: list[BaseCallback] = [StepRateCallback(venv)]
+    if pool is not None and opponent_pool is not None:
+        opponent_pool.mkdir(parents=True, exist_ok=True)
+        if not len(pool):
+            model.save(opponent_pool / "ppo_0_steps.zip")  # the first battles mirror the start
+            pool.refresh()
+        # Snapshots land in the pool dir; the env picks them up as battles finish.
+        callbacks.append(
+            CheckpointCallback(max(1, checkpoint_every // n_envs), opponent_pool, name_prefix="ppo")
+        )
+    print(
+        f"Training on {n_envs} envs over {max(1, servers)} server(s), "
+        f"{n_steps} steps/env per rollout, opponent={opponent}"
+    )
+    try:
+        model.learn(
+            total_timesteps=timesteps or int(cfg.get("total_timesteps", 100_000)),
+            callback=CallbackList(callbacks),
+        )
+        out.parent.mkdir(parents=True, exist_ok=True)
+        model.save(out)
+    finally:
+        print(f"[envs] {venv.summary()}")
+        if batcher is not None:
+            print(f"[opponent] {batcher.stats.summary()}")
+        if pool is not None:
+            print(f"[opponent-pool] {len(pool)} checkpoints, {pool.stats.summary()}")
+        venv.close()
+    print(f"Saved model to {out}")
+
+
+if __name__ == "__main__":
+    app()
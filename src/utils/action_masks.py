@@ -0,0 +1,183 @@
+# Legal-action masks for DoublesEnv built straight from a DoubleBattle.
+#
+# Mirrors the checks in DoublesEnv._action_to_order_individual (fake=False) but walks the
+# battle state once per slot instead of converting every action index and catching the
+# assertion. Index layout per slot: 0 pass, 1-6 switch to team[i - 1], then blocks of 20
+# per gimmick (none, mega, z-move, dynamax, tera) made of 4 moves x 5 targets (-2..2).
+
+from __future__ import annotations
+
+from typing import cast
+
+import numpy as np
+import numpy.typing as npt
+from poke_env.battle import DoubleBattle, Move, MoveCategory, Pokemon, PokemonType, Target
+from poke_env.battle.move import SPECIAL_MOVES
+from poke_env.environment.doubles_env import DoublesEnv
+from poke_env.player import BattleOrder
+
+N_SWITCHES = 6
+N_MOVES = 4
+N_TARGETS = 5
+MOVE_OFFSET = 1 + N_SWITCHES
+GIMMICK_STRIDE = N_MOVES * N_TARGETS
+FORCED_PASS = ([False, True], [True, False])
+
+# Same table as DoubleBattle.get_possible_showdown_targets, built once instead of per call.
+# "ally" and "self" are placeholders resolved against the slot being masked.
+_ALLY, _SELF = "ally", "self"
+_EMPTY = DoubleBattle.EMPTY_TARGET_POSITION
+_FOES = (DoubleBattle.OPPONENT_1_POSITION, DoubleBattle.OPPONENT_2_POSITION)
+_TARGETS_BY_KIND: dict[Target | int | None, tuple[int | str, ...]] = {
+    Target.ADJACENT_ALLY: (_ALLY,),
+    Target.ADJACENT_ALLY_OR_SELF: (_ALLY, _SELF),
+    Target.ADJACENT_FOE: _FOES,
+    Target.ALL: (_EMPTY,),
+    Target.ALL_ADJACENT: (_EMPTY,),
+    Target.ALL_ADJACENT_FOES: (_EMPTY,),
+    Target.ALLIES: (_EMPTY,),
+    Target.ALLY_SIDE: (_EMPTY,),
+    Target.ALLY_TEAM: (_EMPTY,),
+    Target.ANY: (_ALLY, *_FOES),
+    Target.FOE_SIDE: (_EMPTY,),
+    Target.NORMAL: (_ALLY, *_FOES),
+    Target.RANDOM_NORMAL: (_EMPTY,),
+    Target.SCRIPTED: (_EMPTY,),
+    Target.SELF: (_EMPTY,),
+    _EMPTY: (_EMPTY,),
+    None: _FOES,
+}
+
+
+def _gimmick_flags(battle: DoubleBattle, pos: int, n_gimmicks: int) -> list[bool]:
+    flags = [
+        True,
+        bool(battle.can_mega_evolve[pos]),
+        bool(battle.can_z_move[pos]),
+        bool(battle.can_dynamax[pos]),
+        battle.can_tera[pos] is not False,
+    ]
+    return flags[: n_gimmicks + 1]
+
+
+def _occupied_positions(battle: DoubleBattle) -> set[int]:
+    role, opp_role = battle.player_role, battle.opponent_role
+    positions = {
+        f"{role}a": DoubleBattle.POKEMON_1_POSITION,
+        f"{role}b": DoubleBattle.POKEMON_2_POSITION,
+        f"{opp_role}a": DoubleBattle.OPPONENT_1_POSITION,
+        f"{opp_role}b": DoubleBattle.OPPONENT_2_POSITION,
+    }
+    idents = [*battle._active_pokemon, *battle._opponent_active_pokemon]
+    if any(ident not in positions for ident in idents):
+        # poke-env raises for unknown slots, which makes every move target illegal.
+        return set()
+    return {positions[ident] for ident in idents} | {_EMPTY}
+
+
+def _showdown_targets(move: Move, mon: Pokemon, pos: int, occupied: set[int]) -> list[int]:
+    if move.id in SPECIAL_MOVES:
+        return [_EMPTY]
+    if mon.is_dynamaxed:
+        kinds: tuple[int | str, ...] = (_EMPTY,) if move.category == MoveCategory.STATUS else _FOES
+    elif move.non_ghost_target and PokemonType.GHOST not in mon.types:
+        return [_EMPTY]
+    elif move.id == "terastarstorm" and mon.type_1 == PokemonType.STELLAR:
+        kinds = (_EMPTY,)
+    else:
+        kinds = _TARGETS_BY_KIND[move.deduced_target]
+    self_position = (DoubleBattle.POKEMON_1_POSITION, DoubleBattle.POKEMON_2_POSITION)[pos]
+    ally_position = (DoubleBattle.POKEMON_2_POSITION, DoubleBattle.POKEMON_1_POSITION)[pos]
+    resolved = [
+        ally_position if kind == _ALLY else self_position if kind == _SELF else kind
+        for kind in kinds
+    ]
+    return [target for target in resolved if isinstance(target, int) and target in occupied]
+
+
+def _move_candidates(battle: DoubleBattle, pos: int, active_mon: Pokemon) -> list[Move]:
+    available = battle.available_moves[pos]
+    if len(available) == 1 and available[0].id in ("struggle", "recharge"):
+        return list(available)
+    return list(active_mon.moves.values())
+
+
+def _fill_slot(
+    battle: DoubleBattle,
+    pos: int,
+    team: list[Pokemon],
+    occupied: set[int],
+    out: npt.NDArray[np.bool_],
+) -> None:
+    act_size = out.shape[0]
+    out[:] = False
+    if act_size == 0:
+        return
+    out[0] = True
+    if battle.force_switch == FORCED_PASS[pos]:
+        return
+
+    if not battle.trapped[pos]:
+        switchable = {mon.base_species for mon in battle.available_switches[pos]}
+        for idx, mon in enumerate(team[: min(N_SWITCHES, act_size - 1)]):
+            if mon.base_species in switchable:
+                out[1 + idx] = True
+
+    active_mon = battle.active_pokemon[pos]
+    if battle.force_switch[pos] or active_mon is None or act_size <= MOVE_OFFSET:
+        return
+
+    n_gimmicks = (act_size - MOVE_OFFSET - 1) // GIMMICK_STRIDE
+    gimmicks = _gimmick_flags(battle, pos, n_gimmicks)
+    available_by_id: dict[str, Move] = {}
+    for move in battle.available_moves[pos]:
+        available_by_id.setdefault(move.id, move)
+
+    for move_idx, move in enumerate(_move_candidates(battle, pos, active_mon)[:N_MOVES]):
+        legal_move = available_by_id.get(move.id)
+        if legal_move is None:
+            continue
+        try:
+            targets = _showdown_targets(legal_move, active_mon, pos, occupied)
+        except KeyError:
+            continue
+        for target in targets:
+            if not -2 <= target <= 2:
+                continue
+            base = MOVE_OFFSET + move_idx * N_TARGETS + target + 2
+            for gimmick, allowed in enumerate(gimmicks):
+                action_idx = base + gimmick * GIMMICK_STRIDE
+                if allowed and action_idx < act_size:
+                    out[action_idx] = True
+
+
+def slot_action_mask(battle: DoubleBattle, pos: int, act_size: int) -> npt.NDArray[np.bool_]:
+    # Return the legal-action mask for a single slot (0 or 1).
+
+    out = np.zeros(act_size, dtype=np.bool_)
+    _fill_slot(battle, pos, list(battle.team.values()), _occupied_positions(battle), out)
+    return out
+
+
+def legal_action_masks(
+    battle: DoubleBattle, act_size: int, out: npt.NDArray[np.bool_] | None = None
+) -> npt.NDArray[np.bool_]:
+    # Return a (2, act_size) bool array with the legal actions for both slots.
+
+    if out is None:
+        out = np.zeros((2, act_size), dtype=np.bool_)
+    elif out.shape != (2, act_size) or out.dtype != np.bool_:
+        raise ValueError(f"out must be a bool array of shape (2, {act_size}), got {out.shape}")
+    team = list(battle.team.values())
+    occupied = _occupied_positions(battle)
+    _fill_slot(battle, 0, team, occupied, out[0])
+    _fill_slot(battle, 1, team, occupied, out[1])
+    return out
+
+
+def action_to_tuple(order: BattleOrder, battle: DoubleBattle) -> tuple[int, int]:
+    # DoublesEnv action pair for an order, without legality checks (-2 marks an invalid slot).
+
+    arr = DoublesEnv.order_to_action(order, battle, fake=True, strict=False)
+    pair = cast("tuple[int, int]", tuple(int(x) for x in arr))
+    return pair[0], pair[1]
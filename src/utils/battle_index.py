@@ -0,0 +1,266 @@
+# Persistent search index over battle logs for the viewer.
+#
+# One SQLite file holds a `battles` row per log (format, players, winner, turn count, plus the
+# size/mtime it was built from) and an FTS5 table over players, team species and moves used,
+# keyed by the same rowid. update() stats the replay directory (and optionally a replay
+# archive) and re-summarizes only logs that are new or whose size/mtime moved, deleting rows
+# for logs that are gone, all in one transaction. Loose logs get their turn-offset sidecar
+# (src/utils/turn_index.py) refreshed from the same read. search() combines exact filters on the
+# plain columns with an FTS MATCH and pages with LIMIT/OFFSET, newest first, so the viewer
+# never lists or reads the directory to answer a query.
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.utils.replay_archive import ReplayArchive
+from src.utils.showdown_protocol import (
+    Move,
+    Player,
+    Preview,
+    ProtocolParser,
+    Switch,
+    Turn,
+    Win,
+    log_from_blob,
+)
+from src.utils.turn_index import load_turn_index, sidecar_path
+
+ARCHIVE_PREFIX = "archive:"
+SUMMARY_PARSER = ProtocolParser(types=("player", "poke", "switch", "drag", "move", "win", "tie"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT,
+    p1 TEXT,
+    p2 TEXT,
+    winner TEXT COLLATE NOCASE,
+    turns INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS battles_format ON battles (format, mtime_ns);
+CREATE INDEX IF NOT EXISTS battles_mtime ON battles (mtime_ns);
+CREATE VIRTUAL TABLE IF NOT EXISTS battles_fts USING fts5(players, team, moves);
+"""
+
+
+@dataclass
+class BattleSummary:
+    format: str | None = None
+    players: dict[str, str] = field(default_factory=dict)
+    winner: str | None = None
+    turns: int = 0
+    team: list[str] = field(default_factory=list)
+    moves: list[str] = field(default_factory=list)
+
+
+@dataclass
+class IndexStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.added} added, {self.updated} updated, {self.removed} removed, "
+            f"{self.unchanged} unchanged"
+        )
+
+
+def summarize_log(text: str, name: str = "") -> BattleSummary:
+    summary = BattleSummary()
+    stem = Path(name.removeprefix(ARCHIVE_PREFIX)).stem
+    if stem.startswith("battle-"):
+        stem = stem[len("battle-") :]
+    summary.format = stem.split("-")[0] or None
+    team: dict[str, None] = {}
+    moves: dict[str, None] = {}
+    for event in SUMMARY_PARSER.events_from_text(text):
+        if isinstance(event, Turn):
+            summary.turns = event.turn
+        elif isinstance(event, Player):
+            summary.players[event.side] = event.name
+        elif isinstance(event, Preview | Switch):
+            team.setdefault(event.species.replace("-*", ""), None)
+        elif isinstance(event, Move):
+            moves.setdefault(event.move, None)
+        elif isinstance(event, Win):
+            summary.winner = event.winner
+    summary.team = list(team)
+    summary.moves = list(moves)
+    return summary
+
+
+def _phrase(value: str) -> str:
+    # FTS5 string literal: the value is matched as a phrase, operators and all.
+    return '"' + value.replace('"', '""') + '"'
+
+
+@dataclass
+class _Source:
+    name: str
+    size: int
+    mtime_ns: int
+    path: Path
+
+
+class BattleIndex:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _known(self) -> dict[str, tuple[int, int, int]]:
+        rows = self.conn.execute("SELECT name, id, size, mtime_ns FROM battles")
+        return {name: (rowid, size, mtime_ns) for name, rowid, size, mtime_ns in rows}
+
+    def _sources(
+        self, replay_dir: Path, pattern: str, archive: ReplayArchive | None
+    ) -> Iterator[_Source]:
+        with os.scandir(replay_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and Path(entry.name).match(pattern):
+                    stat = entry.stat()
+                    yield _Source(entry.name, stat.st_size, stat.st_mtime_ns, Path(entry.path))
+        if archive is not None:
+            for replay_id in archive:
+                item = archive[replay_id]
+                name = ARCHIVE_PREFIX + replay_id
+                yield _Source(name, item["size"], item["added_ns"], archive.root)
+
+    def update(
+        self,
+        replay_dir: Path,
+        pattern: str = "*.log",
+        archive: ReplayArchive | None = None,
+    ) -> IndexStats:
+        stats = IndexStats()
+        known = self._known()
+        seen: set[str] = set()
+        with self.conn:
+            for source in self._sources(replay_dir, pattern, archive):
+                seen.add(source.name)
+                row = known.get(source.name)
+                if row is not None and row[1:] == (source.size, source.mtime_ns):
+                    stats.unchanged += 1
+                    continue
+                if source.name.startswith(ARCHIVE_PREFIX):
+                    assert archive is not None
+                    replay_id = source.name[len(ARCHIVE_PREFIX) :]
+                    ext = archive[replay_id]["ext"]
+                    text = log_from_blob(archive.read(replay_id), ext)
+                else:
+                    data = source.path.read_bytes()
+                    load_turn_index(source.path, data)
+                    text = log_from_blob(data, source.path.suffix.lower())
+                self._upsert(source, summarize_log(text, source.name), row)
+                if row is None:
+                    stats.added += 1
+                else:
+                    stats.updated += 1
+            gone = [(known[name][0],) for name in known.keys() - seen]
+            for name in known.keys() - seen:
+                if not name.startswith(ARCHIVE_PREFIX):
+                    with contextlib.suppress(OSError):
+                        sidecar_path(replay_dir / name).unlink()
+            self.conn.executemany("DELETE FROM battles WHERE id = ?", gone)
+            self.conn.executemany("DELETE FROM battles_fts WHERE rowid = ?", gone)
+            stats.removed = len(gone)
+        return stats
+
+    def _upsert(
+        self, source: _Source, summary: BattleSummary, row: tuple[int, int, int] | None
+    ) -> None:
+        values = (
+            source.size,
+            source.mtime_ns,
+            summary.format,
+            summary.players.get("p1"),
+            summary.players.get("p2"),
+            summary.winner,
+            summary.turns,
+        )
+        if row is None:
+            cursor = self.conn.execute(
+                "INSERT INTO battles (size, mtime_ns, format, p1, p2, winner, turns, name) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*values, source.name),
+            )
+            rowid = cursor.lastrowid
+        else:
+            rowid = row[0]
+            self.conn.execute(
+                "UPDATE battles SET size = ?, mtime_ns = ?, format = ?, p1 = ?, p2 = ?, "
+                "winner = ?, turns = ? WHERE id = ?",
+                (*values, rowid),
+            )
+            self.conn.execute("DELETE FROM battles_fts WHERE rowid = ?", (rowid,))
+        self.conn.execute(
+            "INSERT INTO battles_fts (rowid, players, team, moves) VALUES (?, ?, ?, ?)",
+            (
+                rowid,
+                "\n".join(summary.players.values()),
+                "\n".join(summary.team),
+                "\n".join(summary.moves),
+            ),
+        )
+
+    def search(
+        self,
+        format: str | None = None,
+        player: str | None = None,
+        team: Iterable[str] = (),
+        winner: str | None = None,
+        min_turns: int | None = None,
+        max_turns: int | None = None,
+        move: str | None = None,
+        page: int = 0,
+        page_size: int = 50,
+    ) -> tuple[list[dict[str, object]], int]:
+        # Returns (one page of battles, total matches). Text filters match whole words,
+        # e.g. team=["Urshifu"] also finds Urshifu-Rapid-Strike.
+        where: list[str] = []
+        params: list[object] = []
+        terms = []
+        if player:
+            terms.append(f"players : {_phrase(player)}")
+        terms.extend(f"team : {_phrase(species)}" for species in team if species)
+        if move:
+            terms.append(f"moves : {_phrase(move)}")
+        if terms:
+            where.append("b.id IN (SELECT rowid FROM battles_fts WHERE battles_fts MATCH ?)")
+            params.append(" AND ".join(terms))
+        for clause, value in (
+            ("b.format = ?", format),
+            ("b.winner = ?", winner),
+            ("b.turns >= ?", min_turns),
+            ("b.turns <= ?", max_turns),
+        ):
+            if value not in (None, ""):
+                where.append(clause)
+                params.append(value)
+        sql_where = f"WHERE {' AND '.join(where)}" if where else ""
+        total = self.conn.execute(f"SELECT COUNT(*) FROM battles b {sql_where}", params)
+        count = int(total.fetchone()[0])
+        rows = self.conn.execute(
+            f"SELECT b.name, b.format, b.p1, b.p2, b.winner, b.turns FROM battles b {sql_where} "
+            "ORDER BY b.mtime_ns DESC, b.id DESC LIMIT ? OFFSET ?",
+            [*params, page_size, max(0, page) * page_size],
+        )
+        columns = ("name", "format", "p1", "p2", "winner", "turns")
+        return [dict(zip(columns, row, strict=True)) for row in rows], count
+
+    def close(self) -> None:
+        self.conn.close()
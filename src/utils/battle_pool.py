@@ -0,0 +1,192 @@
+# Keep a fixed set of logged-in players busy with N battles in flight.
+#
+# poke-env's battle_against/send_challenges wait for *all* of a player's battles to end before
+# returning, so calling them per battle serialises everything. The pool drives the same
+# challenge/accept primitives itself: challenges go out one at a time (Showdown only allows a
+# single pending challenge per user) and each finished battle frees its slot immediately.
+#
+# A watchdog replaces a flat per-battle timeout. A battle counts as making progress whenever a
+# protocol message lands or its turn advances. One with no progress for `stall_timeout`
+# seconds is forfeited and its slot freed; a healthy battle may run up to `battle_timeout`.
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import Counter
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+
+from poke_env.battle import AbstractBattle
+from poke_env.concurrency import handle_threaded_coroutines
+from poke_env.data import to_id_str
+from poke_env.player import Player
+
+
+@dataclass
+class PoolStats:
+    started: int = 0
+    finished: int = 0
+    start_timeouts: int = 0
+    stalls: int = 0  # no protocol message or turn advance for stall_timeout
+    battle_timeouts: int = 0  # still making progress at battle_timeout
+    forfeits: int = 0  # forfeits sent for either of the above
+    elapsed_s: float = 0.0
+    by_kind: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def battles_per_s(self) -> float:
+        return self.finished / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def summary(self) -> str:
+        kinds = ", ".join(f"{kind}={count}" for kind, count in sorted(self.by_kind.items()))
+        return (
+            f"{self.finished}/{self.started} battles in {self.elapsed_s:.1f}s "
+            f"({self.battles_per_s:.2f} battles/s); start timeouts={self.start_timeouts} "
+            f"stalls={self.stalls} battle timeouts={self.battle_timeouts} "
+            f"forfeits={self.forfeits}; opponents: {kinds}"
+        )
+
+
+def battle_progress(battle: AbstractBattle) -> tuple[int, int]:
+    # Changes whenever the battle parses a protocol message or moves to a new turn.
+    return battle.turn, len(battle.current_observation.events)
+
+
+class BattlePool:
+    def __init__(
+        self,
+        player: Player,
+        opponents: dict[str, Player],
+        weights: Sequence[float] | None = None,
+        concurrency: int = 1,
+        start_timeout: float = 60.0,
+        stall_timeout: float = 30.0,
+        battle_timeout: float = 1800.0,
+        watch_interval: float = 1.0,
+    ):
+        if not opponents:
+            raise ValueError("BattlePool needs at least one opponent")
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.player = player
+        self.opponents = opponents
+        self._kinds = list(opponents)
+        self._weights = list(weights) if weights else None
+        self._concurrency = concurrency
+        self._start_timeout = start_timeout
+        self._stall_timeout = stall_timeout
+        self._battle_timeout = battle_timeout
+        self._watch_interval = watch_interval
+        self.stats = PoolStats()
+
+    def sample_kind(self) -> str:
+        return random.choices(self._kinds, weights=self._weights)[0]
+
+    async def run(
+        self, n_battles: int, on_finished: Callable[[str, AbstractBattle], None] | None = None
+    ) -> PoolStats:
+        stats: PoolStats = await handle_threaded_coroutines(self._run(n_battles, on_finished))
+        return stats
+
+    async def _run(
+        self, n_battles: int, on_finished: Callable[[str, AbstractBattle], None] | None
+    ) -> PoolStats:
+        await self.player.ps_client.logged_in.wait()
+        for opponent in self.opponents.values():
+            await opponent.ps_client.logged_in.wait()
+
+        slots = asyncio.Semaphore(self._concurrency)
+        in_flight: set[asyncio.Task[None]] = set()
+        started_at = time.perf_counter()
+        for battle_idx in range(n_battles):
+            await slots.acquire()
+            kind = self.sample_kind()
+            battle = await self._start_battle(self.opponents[kind])
+            if battle is None:
+                self.stats.start_timeouts += 1
+                print(
+                    f"[warn] battle {battle_idx + 1}: no battle started, probably a rejected team"
+                )
+                slots.release()
+                continue
+            self.stats.started += 1
+            self.stats.by_kind[kind] += 1
+            task = asyncio.create_task(self._finish_battle(kind, battle, slots, on_finished))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        self.stats.elapsed_s = time.perf_counter() - started_at
+        return self.stats
+
+    async def _accept_one(self, opponent: Player, challenger: str) -> None:
+        while to_id_str(await opponent._challenge_queue.get()) != challenger:
+            continue
+        await opponent.ps_client.accept_challenge(challenger, opponent.next_team)
+        await opponent._battle_semaphore.acquire()
+
+    async def _start_battle(self, opponent: Player) -> AbstractBattle | None:
+        player = self.player
+        known = set(player.battles)
+        # Showdown announces a challenge both as |pm| and |updatechallenges|, so entries left
+        # over from the previous battle are dropped before sending the next one.
+        while not opponent._challenge_queue.empty():
+            opponent._challenge_queue.get_nowait()
+        accept = asyncio.create_task(self._accept_one(opponent, to_id_str(player.username)))
+        try:
+            await player.ps_client.challenge(
+                to_id_str(opponent.username), player.format, player.next_team
+            )
+            await asyncio.wait_for(player._battle_semaphore.acquire(), self._start_timeout)
+            await asyncio.wait_for(accept, self._start_timeout)
+        except TimeoutError:
+            accept.cancel()
+            await player.ps_client.send_message(f"/cancelchallenge {to_id_str(opponent.username)}")
+            return None
+        new_tags = [tag for tag in player.battles if tag not in known]
+        return player.battles[new_tags[0]] if new_tags else None
+
+    async def _finish_battle(
+        self,
+        kind: str,
+        battle: AbstractBattle,
+        slots: asyncio.Semaphore,
+        on_finished: Callable[[str, AbstractBattle], None] | None,
+    ) -> None:
+        condition = self.player._battle_end_condition
+        started = last_progress = time.monotonic()
+        progress = battle_progress(battle)
+        try:
+            while not battle.finished:
+                try:
+                    async with condition:
+                        await asyncio.wait_for(
+                            condition.wait_for(lambda: battle.finished), self._watch_interval
+                        )
+                except TimeoutError:
+                    pass
+                if battle.finished:
+                    break
+                now = time.monotonic()
+                current = battle_progress(battle)
+                if current != progress:
+                    progress, last_progress = current, now
+                if now - last_progress >= self._stall_timeout:
+                    self.stats.stalls += 1
+                    reason = f"stalled on turn {battle.turn} for {now - last_progress:.0f}s"
+                elif now - started >= self._battle_timeout:
+                    self.stats.battle_timeouts += 1
+                    reason = f"still running after {now - started:.0f}s"
+                else:
+                    continue
+                print(f"[warn] {battle.battle_tag}: {reason}, forfeiting")
+                self.stats.forfeits += 1
+                await self.player.ps_client.send_message("/forfeit", battle.battle_tag)
+                return
+            self.stats.finished += 1
+            if on_finished is not None:
+                on_finished(kind, battle)
+        finally:
+            slots.release()
@@ -0,0 +1,149 @@
+# Merge per-worker JSONL shards into one deduplicated dataset plus a manifest.
+
+from __future__ import annotations
+
+import hashlib
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+
+def shard_dir_for(out_path: Path) -> Path:
+    return out_path.parent / f"{out_path.stem}.shards"
+
+
+def shard_path(out_path: Path, shard_idx: int) -> Path:
+    return shard_dir_for(out_path) / f"shard-{shard_idx:03d}{out_path.suffix or '.jsonl'}"
+
+
+def manifest_path_for(out_path: Path) -> Path:
+    return out_path.with_name(f"{out_path.stem}.manifest.json")
+
+
+def _iter_records(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open("rb") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _row_key(record: dict[str, Any]) -> tuple[str, str, str, str]:
+    # One decision: battle_tag, turn, side and the collector's per-battle decision index, since
+    # a forced switch after a faint is a second decision on the same turn. Rows from before
+    # the index was recorded have one decision per turn as far as the key can tell.
+    return (
+        str(record.get("battle_tag")),
+        str(record.get("turn")),
+        str(record.get("side") or ""),
+        str(record.get("decision", "")),
+    )
+
+
+def _position(record: dict[str, Any]) -> tuple[int, int]:
+    turn, decision = record.get("turn"), record.get("decision")
+    return turn if isinstance(turn, int) else 0, decision if isinstance(decision, int) else 0
+
+
+class _BattleInstances:
+    # Tells a replayed row from a reused battle tag within one shard. A side's rows arrive in
+    # (turn, decision) order, so a position going backwards is either a repeat (byte-identical
+    # to the row already seen there) or the first row of a new battle under the same tag.
+
+    def __init__(self) -> None:
+        # (tag, side) -> (reuse count, last position, position -> row digest) of the current
+        # battle
+        self._state: dict[
+            tuple[str, str], tuple[int, tuple[int, int], dict[tuple[int, int], bytes]]
+        ] = {}
+
+    def reuse(self, record: dict[str, Any]) -> int:
+        key = (str(record.get("battle_tag")), str(record.get("side") or ""))
+        position = _position(record)
+        digest = hashlib.blake2b(
+            orjson.dumps(record, option=orjson.OPT_SORT_KEYS), digest_size=16
+        ).digest()
+        reuse, last, rows = self._state.get(key, (0, position, {}))
+        if position < last and rows.get(position) != digest:
+            reuse, last, rows = reuse + 1, position, {}
+        rows.setdefault(position, digest)
+        self._state[key] = (reuse, max(last, position), rows)
+        return reuse
+
+
+def merge_jsonl_shards(
+    shards: Iterable[Path], out_path: Path, manifest_path: Path | None = None
+) -> dict[str, Any]:
+    # Local servers number battles from 1, so tags are only unique within a shard: merged
+    # rows get the shard name appended to battle_tag. A shard appended to by several runs can
+    # reuse a tag too; _BattleInstances spots the new battle and it gets a further "-r<n>"
+    # suffix. Rows dedupe on (battle_tag, turn, side, decision) and are appended to
+    # `out_path`, skipping keys it already holds, so rows collected before and re-merging the
+    # same shards both stay intact.
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    seen: set[tuple[str, str, str, str]] = set()
+    if out_path.exists():
+        seen.update(_row_key(record) for record in _iter_records(out_path))
+    existing = len(seen)
+    entries: list[dict[str, Any]] = []
+    with out_path.open("ab") as out:
+        if out.tell() and not _ends_with_newline(out_path):
+            out.write(b"\n")  # start after a torn last line instead of extending it
+        for shard in shards:
+            if not shard.exists():
+                entries.append({"shard": shard.stem, "path": str(shard), "missing": True})
+                continue
+            written = duplicates = 0
+            battles: set[str] = set()
+            instances = _BattleInstances()
+            for record in _iter_records(shard):
+                tag = record.get("battle_tag")
+                if isinstance(tag, str):
+                    reuse = instances.reuse(record)
+                    suffix = f"-{shard.stem}" + (f"-r{reuse}" if reuse else "")
+                    record["battle_tag"] = f"{tag}{suffix}"
+                    battles.add(record["battle_tag"])
+                record["shard"] = shard.stem
+                key = _row_key(record)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                out.write(orjson.dumps(record, option=orjson.OPT_SORT_KEYS) + b"\n")
+                written += 1
+            entries.append(
+                {
+                    "shard": shard.stem,
+                    "path": str(shard),
+                    "battles": len(battles),
+                    "records": written,
+                    "duplicates": duplicates,
+                }
+            )
+
+    manifest = {
+        "out_path": str(out_path),
+        "existing": existing,
+        "battles": sum(entry.get("battles", 0) for entry in entries),
+        "records": sum(entry.get("records", 0) for entry in entries),
+        "duplicates": sum(entry.get("duplicates", 0) for entry in entries),
+        "shards": entries,
+    }
+    manifest_path = manifest_path or manifest_path_for(out_path)
+    manifest_path.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    return manifest
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as handle:
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
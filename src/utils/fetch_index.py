@@ -0,0 +1,123 @@
+# Append-only index of fetched replays.
+#
+# Every fetch is appended to <out_dir>/index.jsonl and flushed as it happens, so a crash
+# loses at most the line being written (a torn last line is ignored on load). The journal
+# is replayed into a dict on open, which answers "already have it?" in O(1) without
+# touching the replay files, and remembers which variant extension worked so re-fetches
+# go straight to it. compact() rewrites the journal to one line per replay. A legacy
+# index.json from older runs is imported the first time the journal is created.
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from src.utils.replay_fetch import REPLAY_VARIANTS
+
+JOURNAL_NAME = "index.jsonl"
+LEGACY_INDEX_NAME = "index.json"
+
+
+class FetchIndex:
+    def __init__(self, out_dir: Path, fsync: bool = False):
+        self.path = out_dir / JOURNAL_NAME
+        self._fsync = fsync
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._lines = 0
+        out_dir.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        if fresh:
+            self._import_legacy(out_dir / LEGACY_INDEX_NAME)
+        else:
+            self._load()
+        self._fh = self.path.open("ab")
+        if fresh and self._entries:
+            self.compact()
+        elif self._fh.tell() and not self._ends_with_newline():
+            self._fh.write(b"\n")  # start after a torn last line instead of extending it
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def _load(self) -> None:
+        with self.path.open("rb") as handle:
+            for line in handle:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("id"), str):
+                    self._entries[entry["id"]] = entry
+                    self._lines += 1
+
+    def _import_legacy(self, legacy: Path) -> None:
+        try:
+            index = json.loads(legacy.read_text(encoding="utf-8")) if legacy.exists() else {}
+        except (OSError, ValueError):
+            index = {}
+        for replay_id, entry in index.items():
+            if isinstance(entry, dict):
+                self._entries[replay_id] = {"id": replay_id, **entry}
+
+    def __contains__(self, replay_id: object) -> bool:
+        return replay_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def get(self, replay_id: str) -> dict[str, Any] | None:
+        return self._entries.get(replay_id)
+
+    def variants(self, replay_id: str) -> list[str]:
+        # Known replays try the extension that worked last time first.
+        entry = self._entries.get(replay_id)
+        ext = entry.get("ext") if entry else None
+        if not isinstance(ext, str):
+            return list(REPLAY_VARIANTS)
+        known = "" if ext == ".html" else ext
+        return [known, *(variant for variant in REPLAY_VARIANTS if variant != known)]
+
+    def record(self, replay_id: str, path: Path, ext: str) -> None:
+        entry = {
+            "id": replay_id,
+            "path": str(path),
+            "ext": ext,
+            "format": replay_id.split("-")[0],
+            "fetched_at": round(time.time(), 3),
+        }
+        self._fh.write(orjson.dumps(entry) + b"\n")
+        self._fh.flush()
+        if self._fsync:
+            os.fsync(self._fh.fileno())
+        self._entries[replay_id] = entry
+        self._lines += 1
+
+    @property
+    def redundant_lines(self) -> int:
+        return self._lines - len(self._entries)
+
+    def compact(self) -> None:
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with tmp.open("wb") as handle:
+            for entry in self._entries.values():
+                handle.write(orjson.dumps(entry) + b"\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._fh.close()
+        tmp.replace(self.path)
+        self._lines = len(self._entries)
+        self._fh = self.path.open("ab")
+
+    def close(self) -> None:
+        self._fh.close()
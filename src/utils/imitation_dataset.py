@@ -0,0 +1,194 @@
+# Streaming imitation dataset for torch DataLoaders.
+#
+# Sources are JSONL files and columnar shards (see imitation_shards.py). Each source is cut
+# into work units (byte ranges for JSONL, row ranges for shards) and the units are dealt
+# round-robin across DataLoader workers, so a single large file still spreads over every
+# worker. Rows pass through a bounded shuffle buffer and come out as collated batches:
+#   obs    float32 (B, obs_dim)
+#   action int64   (B, 2)
+#   mask   bool    (B, 2, act_size)
+# Memory stays O(shuffle_buffer) no matter how large the dataset is.
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import orjson
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from src.utils.imitation_shards import SHARD_SUFFIX, open_shard, unpack_masks
+
+Row = tuple[npt.NDArray[np.float32], npt.NDArray[np.int64], npt.NDArray[np.bool_]]
+Batch = dict[str, torch.Tensor]
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    path: Path
+    start: int
+    stop: int  # bytes for JSONL, rows for shards
+
+
+def _jsonl_units(path: Path, unit_bytes: int) -> list[WorkUnit]:
+    size = path.stat().st_size
+    return [
+        WorkUnit(path, start, min(start + unit_bytes, size))
+        for start in range(0, size, max(1, unit_bytes))
+    ]
+
+
+def _shard_units(path: Path, unit_rows: int) -> list[WorkUnit]:
+    rows = len(open_shard(path))
+    return [
+        WorkUnit(path, start, min(start + unit_rows, rows))
+        for start in range(0, rows, max(1, unit_rows))
+    ]
+
+
+def _iter_jsonl_unit(unit: WorkUnit) -> Iterator[Row]:
+    # A unit owns every line that *starts* inside [start, stop); the line straddling the
+    # boundary is read by the unit it starts in.
+    with unit.path.open("rb") as handle:
+        if unit.start > 0:
+            handle.seek(unit.start - 1)
+            handle.readline()
+        while handle.tell() < unit.stop:
+            line = handle.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+                yield (
+                    np.asarray(record["obs_v0"], dtype=np.float32),
+                    np.asarray(record["action"], dtype=np.int64),
+                    np.asarray(record["mask"], dtype=np.bool_),
+                )
+            except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue
+
+
+def _iter_shard_unit(unit: WorkUnit, block_rows: int = 1024) -> Iterator[Row]:
+    shard = open_shard(unit.path)
+    for start in range(unit.start, unit.stop, block_rows):
+        stop = min(start + block_rows, unit.stop)
+        obs = np.asarray(shard.obs[start:stop])
+        action = np.asarray(shard.action[start:stop], dtype=np.int64)
+        masks = unpack_masks(np.asarray(shard.mask[start:stop]), shard.act_size)
+        yield from zip(obs, action, masks, strict=True)
+
+
+class ImitationStream(IterableDataset[Batch]):
+    def __init__(
+        self,
+        paths: Sequence[Path],
+        batch_size: int = 256,
+        shuffle_buffer: int = 16384,
+        seed: int = 0,
+        drop_last: bool = False,
+        unit_bytes: int = 32 << 20,
+        unit_rows: int = 65536,
+    ):
+        super().__init__()
+        self.paths = [Path(p) for p in paths]
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+        self.units: list[WorkUnit] = []
+        for path in self.paths:
+            if path.suffix == SHARD_SUFFIX or path.is_dir():
+                self.units.extend(_shard_units(path, unit_rows))
+            else:
+                self.units.extend(_jsonl_units(path, unit_bytes))
+
+    def set_epoch(self, epoch: int) -> None:
+        # Call between epochs (before iterating) so workers reshuffle differently.
+        self.epoch = epoch
+
+    def _assigned_units(self, rng: random.Random) -> list[WorkUnit]:
+        units = list(self.units)
+        rng.shuffle(units)  # same order in every worker: the seed excludes the worker id
+        info = get_worker_info()
+        if info is None:
+            return units
+        return units[info.id :: info.num_workers]
+
+    def _rows(self, units: list[WorkUnit]) -> Iterator[Row]:
+        for unit in units:
+            if unit.path.suffix == SHARD_SUFFIX or unit.path.is_dir():
+                yield from _iter_shard_unit(unit)
+            else:
+                yield from _iter_jsonl_unit(unit)
+
+    def _shuffled(self, rows: Iterator[Row], rng: random.Random) -> Iterator[Row]:
+        if self.shuffle_buffer <= 1:
+            yield from rows
+            return
+        buffer: list[Row] = []
+        for row in rows:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(row)
+                continue
+            idx = rng.randrange(len(buffer))
+            yield buffer[idx]
+            buffer[idx] = row
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def __iter__(self) -> Iterator[Batch]:
+        info = get_worker_info()
+        worker_id = info.id if info is not None else 0
+        unit_rng = random.Random(f"{self.seed}:{self.epoch}")
+        row_rng = random.Random(f"{self.seed}:{self.epoch}:{worker_id}")
+        batch: list[Row] = []
+        for row in self._shuffled(self._rows(self._assigned_units(unit_rng)), row_rng):
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                yield collate_rows(batch)
+                batch = []
+        if batch and not self.drop_last:
+            yield collate_rows(batch)
+
+
+def collate_rows(rows: Sequence[Row]) -> Batch:
+    obs, action, mask = zip(*rows, strict=True)
+    return {
+        "obs": torch.from_numpy(np.stack(obs)),
+        "action": torch.from_numpy(np.stack(action)),
+        "mask": torch.from_numpy(np.stack(mask)),
+    }
+
+
+def make_imitation_loader(
+    paths: Sequence[Path],
+    batch_size: int = 256,
+    shuffle_buffer: int = 16384,
+    num_workers: int = 2,
+    prefetch_factor: int = 4,
+    seed: int = 0,
+    pin_memory: bool = False,
+    **dataset_kwargs: Any,
+) -> DataLoader[Batch]:
+    # Batches are built inside the workers, so the DataLoader runs with batch_size=None and
+    # prefetch_factor counts whole batches queued per worker.
+    dataset = ImitationStream(
+        paths, batch_size=batch_size, shuffle_buffer=shuffle_buffer, seed=seed, **dataset_kwargs
+    )
+    return DataLoader(
+        dataset,
+        batch_size=None,
+        num_workers=num_workers,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        persistent_workers=False,
+        pin_memory=pin_memory,
+    )
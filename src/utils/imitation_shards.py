@@ -0,0 +1,401 @@
+# Fixed-width columnar shards for imitation tuples.
+#
+# A shard is a directory of .npy columns, two name journals and a small meta.json:
+#   obs.npy     float32 (N, obs_dim)
+#   action.npy  int16   (N, 2)
+#   mask.npy    uint8   (N, 2, ceil(act_size / 8))  np.packbits of the two slot masks
+#   turn.npy    int16   (N,)
+#   battle.npy  int32   (N,)  line number in battle_tags.jsonl
+#   teacher.npy int16   (N,)  line number in teachers.jsonl
+#   side.npy    int8    (N,)  index into SIDES, -1 if the record had no side
+# Columns are appended in chunks and their .npy headers (reserved at a fixed size) are
+# patched after every chunk, so np.load(..., mmap_mode="r") works on a shard that is still
+# being written and training reads obs/action without copying. A chunk's new battle tags and
+# teachers are appended to their journals (one JSON string per line) before its rows become
+# visible, so a flush writes only what is new; meta.json (dims, and rows once closed) is
+# written when the columns are created and on close. Readers take the row count from the
+# shortest column header, which is correct for a shard still being written or one whose writer
+# died. Schema 1 shards kept the tags in meta.json and had no side column; a writer reopening
+# one moves the tags to the journal and fills the side column with -1.
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+import orjson
+
+from src.utils.recorder import RecorderStats
+
+SCHEMA_VERSION = 2
+SHARD_SUFFIX = ".shard"
+HEADER_LEN = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+COLUMNS: dict[str, np.dtype[Any]] = {
+    "obs": np.dtype("<f4"),
+    "action": np.dtype("<i2"),
+    "mask": np.dtype("u1"),
+    "turn": np.dtype("<i2"),
+    "battle": np.dtype("<i4"),
+    "teacher": np.dtype("<i2"),
+    "side": np.dtype("i1"),
+}
+SIDES = ("p1", "p2")
+TAGS_NAME = "battle_tags.jsonl"
+TEACHERS_NAME = "teachers.jsonl"
+
+
+def _npy_header(dtype: np.dtype[Any], shape: tuple[int, ...]) -> bytes:
+    header = f"{{'descr': '{dtype.str}', 'fortran_order': False, 'shape': {shape!r}, }}"
+    header = header.ljust(HEADER_LEN - len(NPY_MAGIC) - 2 - 1) + "\n"
+    if len(header) + len(NPY_MAGIC) + 2 != HEADER_LEN:
+        raise ValueError(f"npy header for shape {shape} does not fit in {HEADER_LEN} bytes")
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _read_names(path: Path) -> list[str]:
+    # A torn last line (a writer that died mid-append) is skipped; its rows were never published.
+    if not path.exists():
+        return []
+    names = []
+    with path.open("rb") as handle:
+        for line in handle:
+            try:
+                name = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(name, str):
+                names.append(name)
+    return names
+
+
+def _append_names(path: Path, names: list[str]) -> None:
+    with path.open("ab") as handle:
+        if handle.tell() and not _ends_with_newline(path):
+            handle.write(b"\n")  # start after a torn last line instead of extending it
+        handle.write(b"".join(orjson.dumps(name) + b"\n" for name in names))
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as handle:
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
+
+
+def _column_rows(path: Path) -> int:
+    # Rows published in every column: the shortest .npy header (0 if a column is missing).
+    rows = [
+        int(np.load(path / f"{name}.npy", mmap_mode="r").shape[0])
+        if (path / f"{name}.npy").exists()
+        else 0
+        for name in COLUMNS
+    ]
+    return min(rows)
+
+
+def side_index(side: str | None) -> int:
+    return SIDES.index(side) if side in SIDES else -1
+
+
+def mask_bytes(act_size: int) -> int:
+    return (act_size + 7) // 8
+
+
+def pack_masks(masks: npt.ArrayLike) -> npt.NDArray[np.uint8]:
+    return np.packbits(np.asarray(masks, dtype=np.bool_), axis=-1)
+
+
+def unpack_masks(packed: npt.NDArray[np.uint8], act_size: int) -> npt.NDArray[np.bool_]:
+    return np.unpackbits(packed, axis=-1, count=act_size).view(np.bool_)
+
+
+class ShardWriter:
+    def __init__(self, path: Path, chunk_rows: int = 4096):
+        self.path = path
+        self._chunk_rows = max(1, chunk_rows)
+        path.mkdir(parents=True, exist_ok=True)
+        meta_path = path / "meta.json"
+        self._meta: dict[str, Any] = (
+            json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        )
+        self._rows = int(self._meta.get("rows", 0))
+        if self._meta.get("schema_version", SCHEMA_VERSION) >= 2:
+            # Anything past meta["rows"] was flushed by a writer that never got to close().
+            self._rows = _column_rows(path)
+        self._battle_tags = _read_names(path / TAGS_NAME)
+        self._teachers = _read_names(path / TEACHERS_NAME)
+        self._journaled = {TAGS_NAME: len(self._battle_tags), TEACHERS_NAME: len(self._teachers)}
+        # Schema 1 kept the names in meta.json; they are journaled before meta says schema 2.
+        self._battle_tags += self._meta.pop("battle_tags", [])
+        self._teachers += self._meta.pop("teachers", [])
+        self._battle_ids = {tag: idx for idx, tag in enumerate(self._battle_tags)}
+        self._teacher_ids = {name: idx for idx, name in enumerate(self._teachers)}
+        self._obs_dim: int | None = self._meta.get("obs_dim")
+        self._act_size: int | None = self._meta.get("act_size")
+        self._handles: dict[str, Any] = {}
+        self._pending: dict[str, list[npt.NDArray[Any]]] = {name: [] for name in COLUMNS}
+        self._pending_rows = 0
+        self.flushes = 0
+        if not meta_path.exists():
+            self._write_meta()  # rows 0, dims null until the first append
+
+    @property
+    def rows(self) -> int:
+        return self._rows + self._pending_rows
+
+    def _row_shape(self, name: str) -> tuple[int, ...]:
+        assert self._obs_dim is not None and self._act_size is not None
+        return {
+            "obs": (self._obs_dim,),
+            "action": (2,),
+            "mask": (2, mask_bytes(self._act_size)),
+        }.get(name, ())
+
+    def _open_columns(self) -> None:
+        for name, dtype in COLUMNS.items():
+            column = self.path / f"{name}.npy"
+            if not column.exists() or self._rows == 0:
+                with column.open("wb") as fresh:
+                    if name == "side" and self._rows:
+                        # Upgrading a schema 1 shard: its records' sides were not kept.
+                        fresh.write(_npy_header(dtype, (self._rows,)))
+                        fresh.write(np.full(self._rows, -1, dtype=dtype).tobytes())
+                    else:
+                        fresh.write(_npy_header(dtype, (0, *self._row_shape(name))))
+            handle = column.open("r+b")
+            handle.seek(HEADER_LEN + self._rows * dtype.itemsize * _prod(self._row_shape(name)))
+            handle.truncate()
+            self._handles[name] = handle
+        self._journal_names()
+        self._write_meta()
+
+    def _journal_names(self) -> None:
+        for journal, names in ((TAGS_NAME, self._battle_tags), (TEACHERS_NAME, self._teachers)):
+            if len(names) > self._journaled[journal]:
+                _append_names(self.path / journal, names[self._journaled[journal] :])
+                self._journaled[journal] = len(names)
+
+    def append(
+        self,
+        obs: npt.ArrayLike,
+        action: npt.ArrayLike,
+        masks: npt.ArrayLike,
+        battle_tag: str,
+        turn: int,
+        teacher: str,
+        side: str | None = None,
+    ) -> None:
+        obs_arr = np.asarray(obs, dtype=COLUMNS["obs"])
+        mask_arr = np.asarray(masks, dtype=np.bool_)
+        if self._obs_dim is None or self._act_size is None:
+            self._obs_dim, self._act_size = int(obs_arr.shape[-1]), int(mask_arr.shape[-1])
+        if obs_arr.shape != (self._obs_dim,) or mask_arr.shape != (2, self._act_size):
+            raise ValueError(
+                f"row shape mismatch: obs {obs_arr.shape} mask {mask_arr.shape}, shard has "
+                f"obs_dim={self._obs_dim} act_size={self._act_size}"
+            )
+        if not self._handles:
+            self._open_columns()
+        battle_idx = self._battle_ids.setdefault(battle_tag, len(self._battle_tags))
+        if battle_idx == len(self._battle_tags):
+            self._battle_tags.append(battle_tag)
+        teacher_idx = self._teacher_ids.setdefault(teacher, len(self._teachers))
+        if teacher_idx == len(self._teachers):
+            self._teachers.append(teacher)
+
+        pending = self._pending
+        pending["obs"].append(obs_arr)
+        pending["action"].append(np.asarray(action, dtype=COLUMNS["action"]))
+        pending["mask"].append(pack_masks(mask_arr))
+        pending["turn"].append(np.asarray(turn, dtype=COLUMNS["turn"]))
+        pending["battle"].append(np.asarray(battle_idx, dtype=COLUMNS["battle"]))
+        pending["teacher"].append(np.asarray(teacher_idx, dtype=COLUMNS["teacher"]))
+        pending["side"].append(np.asarray(side_index(side), dtype=COLUMNS["side"]))
+        self._pending_rows += 1
+        if self._pending_rows >= self._chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending_rows:
+            return
+        new_rows = self._rows + self._pending_rows
+        self._journal_names()  # before the headers publish rows that refer to the new names
+        for name, dtype in COLUMNS.items():
+            handle = self._handles[name]
+            handle.write(np.stack(self._pending[name]).astype(dtype, copy=False).tobytes())
+            handle.flush()
+            handle.seek(0)
+            handle.write(_npy_header(dtype, (new_rows, *self._row_shape(name))))
+            handle.seek(0, os.SEEK_END)
+            self._pending[name].clear()
+        self._rows, self._pending_rows = new_rows, 0
+        self.flushes += 1
+
+    def _write_meta(self) -> None:
+        self._meta.update(
+            schema_version=SCHEMA_VERSION,
+            rows=self._rows,
+            obs_dim=self._obs_dim,
+            act_size=self._act_size,
+        )
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_bytes(orjson.dumps(self._meta))
+        tmp.replace(self.path / "meta.json")
+
+    def close(self) -> None:
+        self.flush()
+        if self._handles or not self._rows:
+            self._write_meta()
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+
+def _prod(shape: tuple[int, ...]) -> int:
+    return int(np.prod(shape, dtype=np.int64)) if shape else 1
+
+
+class ShardRecorder:
+    # Recorder-compatible front end so RecordingHeuristics can write shards directly.
+
+    def __init__(self, out_path: Path, chunk_rows: int = 4096):
+        self._writer = ShardWriter(out_path, chunk_rows=chunk_rows)
+        self.stats = RecorderStats()
+
+    def write(self, payload: dict[str, Any]) -> None:
+        started = time.perf_counter()
+        flushes = self._writer.flushes
+        self._writer.append(
+            obs=payload["obs_v0"],
+            action=payload["action"],
+            masks=payload["mask"],
+            battle_tag=str(payload.get("battle_tag") or ""),
+            turn=int(payload.get("turn") or 0),
+            teacher=str(payload.get("teacher") or ""),
+            side=payload.get("side"),
+        )
+        self.stats.records += 1
+        if self._writer.flushes != flushes:
+            self.stats.write_s += time.perf_counter() - started
+
+    def close(self) -> None:
+        started = time.perf_counter()
+        self._writer.close()
+        self.stats.write_s += time.perf_counter() - started
+        self.stats.batches = self._writer.flushes
+        self.stats.bytes = sum(f.stat().st_size for f in self._writer.path.glob("*.npy"))
+
+
+@dataclass
+class ImitationShard:
+    path: Path
+    meta: dict[str, Any]
+    obs: npt.NDArray[np.float32]
+    action: npt.NDArray[np.int16]
+    mask: npt.NDArray[np.uint8]
+    turn: npt.NDArray[np.int16]
+    battle: npt.NDArray[np.int32]
+    teacher: npt.NDArray[np.int16]
+    side: npt.NDArray[np.int8]
+    battle_tags: list[str]
+    teachers: list[str]
+
+    @property
+    def act_size(self) -> int:
+        return int(self.meta["act_size"])
+
+    def __len__(self) -> int:
+        return int(self.obs.shape[0])
+
+    def masks(self, rows: Any = slice(None)) -> npt.NDArray[np.bool_]:
+        return unpack_masks(np.asarray(self.mask[rows]), self.act_size)
+
+    def battle_tag(self, row: int) -> str:
+        return self.battle_tags[int(self.battle[row])]
+
+    def teacher_name(self, row: int) -> str:
+        return self.teachers[int(self.teacher[row])]
+
+    def side_name(self, row: int) -> str | None:
+        idx = int(self.side[row])
+        return SIDES[idx] if idx >= 0 else None
+
+
+def open_shard(path: Path, mmap_mode: Literal["r", "r+", "c"] | None = "r") -> ImitationShard:
+    # Memory-map every column; rows are trimmed to the shortest column so a shard that is
+    # being appended to is read consistently up to its last completed chunk. The journals are
+    # read after the columns, so every published row's tag and teacher are already in them.
+    # A shard that never got a row (no meta.json or no columns yet) opens empty.
+    meta_path = path / "meta.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+    legacy = meta.get("schema_version", 1) < 2
+    required = [name for name in COLUMNS if name != "side" or not legacy]
+    if not meta or not all((path / f"{name}.npy").exists() for name in required):
+        dims = {
+            "obs": (meta.get("obs_dim") or 0,),
+            "action": (2,),
+            "mask": (2, mask_bytes(meta.get("act_size") or 0)),
+        }
+        columns = {
+            name: np.zeros((0, *dims.get(name, ())), dtype=dtype) for name, dtype in COLUMNS.items()
+        }
+        battle_tags: list[str] = []
+        teachers: list[str] = []
+    elif legacy:
+        rows = int(meta.get("rows", 0))
+        columns = {
+            name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode)[:rows]
+            for name in COLUMNS
+            if name != "side"
+        }
+        columns["side"] = np.full(rows, -1, dtype=COLUMNS["side"])
+        battle_tags, teachers = list(meta.get("battle_tags", [])), list(meta.get("teachers", []))
+    else:
+        columns = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in COLUMNS}
+        rows = min(column.shape[0] for column in columns.values())
+        columns = {name: column[:rows] for name, column in columns.items()}
+        battle_tags, teachers = _read_names(path / TAGS_NAME), _read_names(path / TEACHERS_NAME)
+    return ImitationShard(
+        path=path, meta=meta, battle_tags=battle_tags, teachers=teachers, **columns
+    )
+
+
+def iter_jsonl_records(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open("rb") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "obs_v0" in record:
+                yield record
+
+
+def convert_jsonl(
+    records: Iterable[dict[str, Any]], out_path: Path, chunk_rows: int = 16384
+) -> int:
+    writer = ShardWriter(out_path, chunk_rows=chunk_rows)
+    try:
+        for record in records:
+            writer.append(
+                obs=record["obs_v0"],
+                action=record["action"],
+                masks=record["mask"],
+                battle_tag=str(record.get("battle_tag") or ""),
+                turn=int(record.get("turn") or 0),
+                teacher=str(record.get("teacher") or ""),
+                side=record.get("side"),
+            )
+    finally:
+        writer.close()
+    return writer.rows
@@ -0,0 +1,181 @@
+# Batched policy inference for many concurrent battles.
+#
+# Instead of one tiny forward pass per choose_move, battles await submit(obs, mask). The
+# batcher (bound to the event loop of the first submit) takes the oldest waiting request, then
+# waits until either `max_batch` requests are queued or `max_delay` seconds have passed since
+# that request arrived. It stacks them into (B, D) observations and (B, 2, A) masks, runs a
+# single masked forward pass and resolves each request's future with its (2,) action pair.
+# The forward pass runs in a worker thread so the loop keeps reading battle messages and
+# queuing the next batch meanwhile. infer() is the synchronous path for callers that already
+# hold a batch, e.g. a vector env asking for every opponent's move at once; both paths feed
+# the same stats. torch_policy and sb3_policy adapt a torch module or an SB3 model to PolicyFn.
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import torch
+
+# (B, D) float32 observations, (B, 2, A) bool masks -> (B, 2) int actions.
+PolicyFn = Callable[[npt.NDArray[np.float32], npt.NDArray[np.bool_]], npt.NDArray[np.int64]]
+
+
+@dataclass
+class BatcherStats:
+    requests: int = 0
+    batches: int = 0
+    max_batch: int = 0
+    queue_wait_s: float = 0.0  # summed submit -> forward-start time
+    max_queue_wait_s: float = 0.0
+    forward_s: float = 0.0
+
+    @property
+    def mean_batch(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def mean_queue_wait_ms(self) -> float:
+        return 1000 * self.queue_wait_s / self.requests if self.requests else 0.0
+
+    def summary(self) -> str:
+        forward_ms = 1000 * self.forward_s / self.batches if self.batches else 0.0
+        return (
+            f"{self.requests} requests in {self.batches} batches (mean {self.mean_batch:.1f}, "
+            f"max {self.max_batch}); queue wait mean {self.mean_queue_wait_ms:.2f} ms, "
+            f"max {1000 * self.max_queue_wait_s:.2f} ms; forward {forward_ms:.2f} ms/batch"
+        )
+
+
+class InferenceBatcher:
+    def __init__(self, policy: PolicyFn, max_batch: int = 64, max_delay: float = 0.002):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = BatcherStats()
+        self._pending: deque[tuple[Any, Any, float, asyncio.Future[Any]]] = deque()
+        self._ready: asyncio.Event | None = None
+        self._full: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._running = False
+
+    async def submit(
+        self, obs: npt.NDArray[np.float32], mask: npt.NDArray[np.bool_]
+    ) -> npt.NDArray[np.int64]:
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._ready, self._full = asyncio.Event(), asyncio.Event()
+            self._task = loop.create_task(self._serve())
+        assert self._ready is not None and self._full is not None
+        future: asyncio.Future[Any] = loop.create_future()
+        self._pending.append((obs, mask, time.perf_counter(), future))
+        self._ready.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        result: npt.NDArray[np.int64] = await future
+        return result
+
+    async def _serve(self) -> None:
+        assert self._ready is not None and self._full is not None
+        while True:
+            await self._ready.wait()
+            delay = self._pending[0][2] + self.max_delay - time.perf_counter()
+            if len(self._pending) < self.max_batch and delay > 0:
+                self._full.clear()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), delay)
+            size = min(self.max_batch, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(size)]
+            if not self._pending:
+                self._ready.clear()
+            await self._run(batch)
+
+    async def _run(self, batch: list[tuple[Any, Any, float, asyncio.Future[Any]]]) -> None:
+        started = time.perf_counter()
+        obs = np.stack([item[0] for item in batch])
+        masks = np.stack([item[1] for item in batch])
+        self._running = True
+        try:
+            actions = await asyncio.to_thread(self.policy, obs, masks)
+        except Exception as exc:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._running = False
+        self._record(len(batch), started, [started - item[2] for item in batch])
+        for (*_, future), action in zip(batch, actions, strict=True):
+            if not future.done():  # the battle may have been cancelled while waiting
+                future.set_result(action)
+
+    def infer(
+        self, obs: npt.NDArray[np.float32], masks: npt.NDArray[np.bool_]
+    ) -> npt.NDArray[np.int64]:
+        # One forward pass over a batch the caller already stacked; no queueing.
+        started = time.perf_counter()
+        actions = np.asarray(self.policy(obs, masks))
+        self._record(len(obs), started, [])
+        return actions
+
+    def _record(self, size: int, started: float, waits: list[float]) -> None:
+        stats = self.stats
+        stats.requests += size
+        stats.batches += 1
+        stats.max_batch = max(stats.max_batch, size)
+        stats.queue_wait_s += sum(waits)
+        stats.max_queue_wait_s = max(stats.max_queue_wait_s, *waits, 0.0)
+        stats.forward_s += time.perf_counter() - started
+
+    @property
+    def idle(self) -> bool:
+        # Nothing queued or in a forward pass, so close() strands no caller.
+        return not self._pending and not self._running
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def torch_policy(module: torch.nn.Module, deterministic: bool = True) -> PolicyFn:
+    # `module` maps (B, D) observations to (B, 2 * A) logits, slot a's block first.
+    def policy(obs: npt.NDArray[np.float32], masks: npt.NDArray[np.bool_]) -> Any:
+        with torch.inference_mode():
+            logits = module(torch.as_tensor(obs)).reshape(masks.shape)
+            logits = logits.masked_fill(~torch.as_tensor(masks), float("-inf"))
+            if deterministic:
+                actions = logits.argmax(dim=-1)
+            else:
+                actions = torch.distributions.Categorical(logits=logits).sample()
+        return actions.numpy()
+
+    return policy
+
+
+def sb3_policy(model: Any, deterministic: bool = True) -> PolicyFn:
+    # A MaskablePPO model (predict takes flat action_masks) as a PolicyFn.
+    def policy(obs: npt.NDArray[np.float32], masks: npt.NDArray[np.bool_]) -> Any:
+        actions, _ = model.predict(
+            obs, action_masks=masks.reshape(len(masks), -1), deterministic=deterministic
+        )
+        return np.asarray(actions, dtype=np.int64)
+
+    return policy
+
+
+def maskable_ppo_policy(path: Path, deterministic: bool = True) -> PolicyFn:
+    # A saved MaskablePPO model, loaded on CPU; sb3-contrib is only imported when one plays.
+    from sb3_contrib import MaskablePPO
+
+    return sb3_policy(MaskablePPO.load(path, device="cpu"), deterministic)
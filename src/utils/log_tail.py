@@ -0,0 +1,70 @@
+# Tail and follow for growing battle logs.
+#
+# tail_lines reads backwards from the end of the file in fixed-size blocks until it has seen
+# enough newlines, so showing the last N lines costs O(N) bytes whatever the file size.
+# LogFollower remembers the byte offset it has consumed and, on each poll(), reads only what
+# was appended since; a line still being written is held back until its newline arrives. If
+# the file shrinks (truncated or replaced), following restarts from the top. To follow on from
+# a tail, call tail_lines with complete_only=True: a line still being written is then left out
+# and the returned offset is where it starts, so the follower emits it once, whole.
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+BLOCK_SIZE = 64 << 10
+
+
+def tail_lines(
+    path: Path, n: int, block_size: int = BLOCK_SIZE, complete_only: bool = False
+) -> tuple[list[str], int]:
+    # Returns (last n lines, offset just past them) -- the offset is where a LogFollower should
+    # pick up. A trailing line without a newline is shown unless complete_only is set.
+    with path.open("rb") as handle:
+        end = handle.seek(0, os.SEEK_END)
+        if n <= 0:
+            return [], end
+        pos = end
+        chunks: list[bytes] = []
+        newlines = 0
+        while pos > 0 and newlines <= n:
+            step = min(block_size, pos)
+            pos -= step
+            handle.seek(pos)
+            chunk = handle.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    partial = 0
+    if complete_only and not data.endswith(b"\n"):
+        partial = len(data) - (data.rfind(b"\n") + 1)
+        data = data[: len(data) - partial]
+    lines = data.decode("utf-8", errors="ignore").splitlines()
+    return lines[-n:], end - partial
+
+
+class LogFollower:
+    def __init__(self, path: Path, offset: int = 0):
+        self.path = path
+        self.offset = offset
+        self._partial = b""
+
+    def poll(self, max_bytes: int = 1 << 20) -> list[str]:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            self.offset, self._partial = 0, b""
+        if size == self.offset:
+            return []
+        with self.path.open("rb") as handle:
+            handle.seek(self.offset)
+            data = handle.read(min(size - self.offset, max_bytes))
+        self.offset += len(data)
+        data = self._partial + data
+        complete, _, self._partial = data.rpartition(b"\n")
+        if not complete and not data.endswith(b"\n"):
+            return []
+        return complete.decode("utf-8", errors="ignore").split("\n")
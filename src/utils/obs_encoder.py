@@ -0,0 +1,142 @@
+# Observation encoders for DoubleBattle.
+#
+# obs_v0 is 25 floats per active slot (ours a/b, then the opponent's a/b): HP ratio, a status
+# one-hot over STATUS_NAMES and a type multi-hot over TYPE_NAMES; empty slots are all zero.
+# encode_obs_v0 is the original list-building reference. ObsEncoderV0 produces the same
+# values (bit-identical once cast to float32) from enum-keyed lookup tables, writing into a
+# caller-supplied float32 buffer so collection and re-featurization do not allocate per turn.
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from poke_env.battle import DoubleBattle, Pokemon, PokemonType, Status
+
+STATUS_NAMES = ["SLP", "PAR", "BRN", "FRZ", "PSN", "TOX"]
+TYPE_NAMES = [
+    "NORMAL",
+    "FIRE",
+    "WATER",
+    "ELECTRIC",
+    "GRASS",
+    "ICE",
+    "FIGHTING",
+    "POISON",
+    "GROUND",
+    "FLYING",
+    "PSYCHIC",
+    "BUG",
+    "ROCK",
+    "GHOST",
+    "DRAGON",
+    "DARK",
+    "STEEL",
+    "FAIRY",
+]
+SLOT_DIM = 1 + len(STATUS_NAMES) + len(TYPE_NAMES)
+OBS_V0_DIM = 4 * SLOT_DIM
+
+
+def encode_status(mon) -> list[int]:
+    onehot = [0] * len(STATUS_NAMES)
+    if mon:
+        status = getattr(mon, "status", None)
+        name = getattr(status, "name", None)
+        if isinstance(name, str) and name in STATUS_NAMES:
+            onehot[STATUS_NAMES.index(name)] = 1
+    return onehot
+
+
+def encode_types(mon) -> list[int]:
+    onehot = [0] * len(TYPE_NAMES)
+    if mon is None:
+        return onehot
+    types = getattr(mon, "types", []) or []
+    for t in types:
+        name = getattr(t, "name", str(t)).upper()
+        if name in TYPE_NAMES:
+            onehot[TYPE_NAMES.index(name)] = 1
+    return onehot
+
+
+def hp_ratio(mon) -> float:
+    if mon is None:
+        return 0.0
+    current = getattr(mon, "current_hp", None) or 0
+    maximum = getattr(mon, "max_hp", None) or 0
+    return float(current) / float(maximum) if maximum else 0.0
+
+
+def encode_obs_v0(battle: DoubleBattle) -> list[float]:
+    feats: list[float] = []
+    slots = list(battle.active_pokemon) + list(battle.opponent_active_pokemon)
+    for mon in slots:
+        feats.append(hp_ratio(mon))
+        feats.extend(encode_status(mon))
+        feats.extend(encode_types(mon))
+    return feats
+
+
+# Offsets within a slot block, keyed by enum member so encoding is a dict lookup.
+_STATUS_OFFSET: dict[Status, int] = {Status[name]: 1 + i for i, name in enumerate(STATUS_NAMES)}
+_TYPE_OFFSET: dict[PokemonType, int] = {
+    PokemonType[name]: 1 + len(STATUS_NAMES) + i for i, name in enumerate(TYPE_NAMES)
+}
+_SLOT_KEYS = {"p1": ("p1a", "p1b", "p2a", "p2b"), "p2": ("p2a", "p2b", "p1a", "p1b")}
+
+
+class ObsEncoderV0:
+    dim = OBS_V0_DIM
+
+    def _slots(self, battle: DoubleBattle) -> list[Pokemon | None]:
+        # Same result as battle.active_pokemon + battle.opponent_active_pokemon without the
+        # per-call role checks and list building of the properties.
+        keys = _SLOT_KEYS.get(battle.player_role or "")
+        if keys is None:
+            return [*battle.active_pokemon, *battle.opponent_active_pokemon]
+        ours, theirs = battle._active_pokemon, battle._opponent_active_pokemon
+        slots: list[Pokemon | None] = []
+        for key, active in zip(keys, (ours, ours, theirs, theirs), strict=True):
+            mon = active.get(key)
+            slots.append(mon if mon is not None and mon.active and not mon.fainted else None)
+        return slots
+
+    def encode(
+        self, battle: DoubleBattle, out: npt.NDArray[np.float32] | None = None
+    ) -> npt.NDArray[np.float32]:
+        if out is None:
+            out = np.zeros(self.dim, dtype=np.float32)
+        else:
+            out.fill(0.0)
+        # Scalar stores through a memoryview skip numpy's per-item indexing overhead; the
+        # float64 -> float32 rounding is the same as numpy's cast. out must be contiguous.
+        view: Any = out.data
+        for base, mon in zip(range(0, self.dim, SLOT_DIM), self._slots(battle), strict=True):
+            if mon is None:
+                continue
+            maximum = mon.max_hp
+            if maximum:
+                view[base] = mon.current_hp / maximum
+            offset = _STATUS_OFFSET.get(mon.status)  # type: ignore[arg-type]
+            if offset is not None:
+                view[base + offset] = 1.0
+            for mon_type in mon.types:
+                offset = _TYPE_OFFSET.get(mon_type)
+                if offset is not None:
+                    view[base + offset] = 1.0
+        return out
+
+    def encode_batch(
+        self, battles: Sequence[DoubleBattle], out: npt.NDArray[np.float32] | None = None
+    ) -> npt.NDArray[np.float32]:
+        # Encodes battles[i] into row i of a (len(battles), dim) array.
+        if out is None:
+            out = np.empty((len(battles), self.dim), dtype=np.float32)
+        if out.shape[0] < len(battles) or out.shape[1:] != (self.dim,):
+            raise ValueError(f"out has shape {out.shape}, need ({len(battles)}, {self.dim})")
+        for row, battle in zip(out, battles, strict=False):
+            self.encode(battle, row)
+        return out[: len(battles)]
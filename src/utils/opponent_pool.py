@@ -0,0 +1,186 @@
+# Past checkpoints as self-play opponents, with an LRU cache of loaded policies.
+#
+# OpponentPool scans a directory of saved models (oldest first by mtime, then name) and
+# samples one per battle: "latest" always takes the newest, "uniform" any of them, and
+# "prioritized" weights each by its smoothed win rate squared ((wins + 1) / (games + 2)), so the
+# checkpoints that still beat the current side come up most. record() feeds those win rates.
+# Loaded policies live in an LRU cache of `cache_size` torch modules; a miss loads from disk
+# and evicts the least recently used one. Cached modules are moved to shared memory, so
+# handing the pool to a spawned worker process (Process args) passes handles to the same
+# weights instead of copying them; a checkpoint first loaded inside a worker stays private to
+# that worker. Each cached module gets its own InferenceBatcher, built lazily per process,
+# so battles against the same checkpoint share forward passes. An evicted checkpoint's batcher
+# is retired and closed only once idle, since battles may still be waiting on it.
+
+from __future__ import annotations
+
+import random
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import torch
+
+from src.utils.inference_batcher import InferenceBatcher, PolicyFn, sb3_policy
+
+STRATEGIES = ("latest", "uniform", "prioritized")
+
+
+def load_maskable_ppo_module(path: Path) -> torch.nn.Module:
+    # The policy network of a saved MaskablePPO model; its predict() takes action_masks.
+    from sb3_contrib import MaskablePPO
+
+    module: torch.nn.Module = MaskablePPO.load(path, device="cpu").policy
+    return module
+
+
+@dataclass
+class Checkpoint:
+    name: str
+    path: Path
+    wins: int = 0
+    games: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        # Smoothed, so an unplayed checkpoint starts at 0.5 rather than 0.
+        return (self.wins + 1) / (self.games + 2)
+
+
+@dataclass
+class PoolCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    load_s: float = 0.0
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0.0
+        load_ms = 1000 * self.load_s / self.misses if self.misses else 0.0
+        return (
+            f"{self.hits}/{lookups} cache hits ({hit_rate:.0f}%), {self.misses} loads "
+            f"({load_ms:.1f} ms each), {self.evictions} evictions"
+        )
+
+
+class OpponentPool:
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str = "*.zip",
+        strategy: str = "latest",
+        cache_size: int = 4,
+        loader: Callable[[Path], torch.nn.Module] = load_maskable_ppo_module,
+        adapter: Callable[[torch.nn.Module], PolicyFn] = sb3_policy,
+        max_batch: int = 64,
+        seed: int | None = None,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy: {strategy} (expected {STRATEGIES})")
+        if cache_size < 1:
+            raise ValueError("cache_size must be >= 1")
+        self.directory = directory
+        self.pattern = pattern
+        self.strategy = strategy
+        self.cache_size = cache_size
+        self.loader = loader
+        self.adapter = adapter
+        self.max_batch = max_batch
+        self.stats = PoolCacheStats()
+        self._rng = random.Random(seed)
+        self._checkpoints: dict[str, Checkpoint] = {}
+        self._modules: OrderedDict[str, torch.nn.Module] = OrderedDict()
+        self._batchers: dict[str, InferenceBatcher] = {}
+        self._retired: list[InferenceBatcher] = []
+        self.refresh()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Batchers hold event-loop state; each process builds its own around the shared modules.
+        state = self.__dict__.copy()
+        state["_batchers"], state["_retired"] = {}, []
+        return state
+
+    def refresh(self) -> int:
+        # Rescans the directory, keeping known checkpoints' results; returns how many appeared.
+        paths = sorted(self.directory.glob(self.pattern), key=lambda p: (p.stat().st_mtime, p.name))
+        found = {path.name: path for path in paths if path.is_file()}
+        added = len(found.keys() - self._checkpoints.keys())
+        self._checkpoints = {
+            name: self._checkpoints.get(name) or Checkpoint(name, path)
+            for name, path in found.items()
+        }
+        return added
+
+    @property
+    def checkpoints(self) -> list[Checkpoint]:
+        return list(self._checkpoints.values())
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def sample(self) -> Checkpoint:
+        checkpoints = self.checkpoints
+        if not checkpoints:
+            raise ValueError(f"No checkpoints matching {self.pattern} in {self.directory}")
+        if self.strategy == "latest":
+            return checkpoints[-1]
+        if self.strategy == "uniform":
+            return self._rng.choice(checkpoints)
+        weights = [checkpoint.win_rate**2 for checkpoint in checkpoints]
+        return self._rng.choices(checkpoints, weights=weights)[0]
+
+    def record(self, name: str, won: bool) -> None:
+        # One finished game of checkpoint `name`; won is from the checkpoint's side.
+        checkpoint = self._checkpoints.get(name)
+        if checkpoint is not None:
+            checkpoint.games += 1
+            checkpoint.wins += int(won)
+
+    def module(self, checkpoint: Checkpoint) -> torch.nn.Module:
+        cached = self._modules.get(checkpoint.name)
+        if cached is not None:
+            self._modules.move_to_end(checkpoint.name)
+            self.stats.hits += 1
+            return cached
+        started = time.perf_counter()
+        module = self.loader(checkpoint.path)
+        module.eval()
+        module.share_memory()
+        self.stats.misses += 1
+        self.stats.load_s += time.perf_counter() - started
+        self._modules[checkpoint.name] = module
+        while len(self._modules) > self.cache_size:
+            evicted, _ = self._modules.popitem(last=False)
+            self.stats.evictions += 1
+            batcher = self._batchers.pop(evicted, None)
+            if batcher is not None:
+                # Battles may still await this batcher; it is closed once it drains.
+                self._retired.append(batcher)
+        return module
+
+    def warm(self, count: int | None = None) -> None:
+        # Loads the newest `count` (default: cache_size) checkpoints, e.g. before spawning
+        # workers so they all start from the same shared weights.
+        for checkpoint in self.checkpoints[-(count or self.cache_size) :]:
+            self.module(checkpoint)
+
+    def batcher(self, checkpoint: Checkpoint) -> InferenceBatcher:
+        module = self.module(checkpoint)
+        for retired in [batcher for batcher in self._retired if batcher.idle]:
+            retired.close()
+            self._retired.remove(retired)
+        batcher = self._batchers.get(checkpoint.name)
+        if batcher is None:
+            batcher = InferenceBatcher(self.adapter(module), max_batch=self.max_batch)
+            self._batchers[checkpoint.name] = batcher
+        return batcher
+
+    def close(self) -> None:
+        for batcher in [*self._batchers.values(), *self._retired]:
+            batcher.close()
+        self._batchers.clear()
+        self._retired.clear()
@@ -0,0 +1,153 @@
+# Manifest of parsed replays for incremental hint extraction.
+#
+# <out>.manifest.jsonl is an append-only journal, one line per replay that was (re)parsed or
+# removed: {"name", "size", "mtime_ns", "hash", "hints"} or {"name", "deleted": true}. A run
+# ends with a {"commit": {...}} line recording the raw_dir and the size of the hints file it
+# left behind; lines after the last commit belong to a run that died and are ignored, so the
+# journal and the output never disagree about what was written. Replays whose size and mtime
+# (for archived replays: the time they were added) match their entry are not read at all; the
+# hash catches touched-but-identical files. Because every replay's hints are kept here,
+# dropping a replay rewrites the output without parsing.
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+MANIFEST_SUFFIX = ".manifest.jsonl"
+
+
+def manifest_path(out: Path) -> Path:
+    return out.with_name(out.stem + MANIFEST_SUFFIX)
+
+
+class ParseManifest:
+    def __init__(self, path: Path, raw_dir: Path):
+        self.path = path
+        self.raw_dir = str(raw_dir.resolve())
+        self.output_size: int | None = None
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._lines = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        committed_end = self._load() if path.exists() else 0
+        self._fh = path.open("ab")
+        if self._lines == 0 and self._fh.tell():
+            self.compact()  # nothing committed, or for another raw_dir: start a clean journal
+        elif self._fh.tell() != committed_end:
+            self._fh.truncate(committed_end)  # drop what an interrupted run appended
+
+    def _load(self) -> int:
+        # Returns the byte offset just past the last commit line.
+        entries: dict[str, dict[str, Any]] = {}
+        pending: list[dict[str, Any]] = []
+        lines = 0
+        offset = committed_end = 0
+        with self.path.open("rb") as handle:
+            for line in handle:
+                offset += len(line)
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                commit = record.get("commit")
+                if isinstance(commit, dict):
+                    for entry in pending:
+                        if entry.get("deleted"):
+                            entries.pop(entry["name"], None)
+                        else:
+                            entries[entry["name"]] = entry
+                    lines += len(pending) + 1
+                    pending = []
+                    committed_end = offset
+                    self.output_size = commit.get("output_size")
+                    if commit.get("raw_dir") != self.raw_dir:
+                        entries, lines, self.output_size = {}, 0, None
+                elif isinstance(record.get("name"), str):
+                    pending.append(record)
+        self._entries = entries
+        self._lines = lines
+        return committed_end
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def get(self, name: str) -> dict[str, Any] | None:
+        return self._entries.get(name)
+
+    def hints(self) -> Iterator[dict[str, Any]]:
+        # All recorded hints in file-name order, the order a full parse writes them in.
+        for name in sorted(self._entries):
+            yield from self._entries[name]["hints"]
+
+    def is_current(self, name: str, size: int, mtime_ns: int) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry["size"] == size and entry["mtime_ns"] == mtime_ns
+
+    def record(
+        self, name: str, size: int, mtime_ns: int, digest: str, hints: list[dict[str, Any]]
+    ) -> None:
+        entry = {
+            "name": name,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": digest,
+            "hints": hints,
+        }
+        self._fh.write(orjson.dumps(entry) + b"\n")
+        self._entries[name] = entry
+        self._lines += 1
+
+    def forget(self, name: str) -> None:
+        if self._entries.pop(name, None) is not None:
+            self._fh.write(orjson.dumps({"name": name, "deleted": True}) + b"\n")
+            self._lines += 1
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self.output_size = None
+        self.compact()
+
+    def _commit_line(self, output_size: int | None) -> bytes:
+        commit = {"raw_dir": self.raw_dir, "output_size": output_size}
+        return orjson.dumps({"commit": commit}) + b"\n"
+
+    def commit(self, output_size: int) -> None:
+        self._fh.write(self._commit_line(output_size))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.output_size = output_size
+        self._lines += 1
+        if self.redundant_lines > len(self._entries):
+            self.compact()
+
+    @property
+    def redundant_lines(self) -> int:
+        return self._lines - len(self._entries)
+
+    def compact(self) -> None:
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with tmp.open("wb") as handle:
+            for entry in self._entries.values():
+                handle.write(orjson.dumps(entry) + b"\n")
+            handle.write(self._commit_line(self.output_size))
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._fh.close()
+        tmp.replace(self.path)
+        self._lines = len(self._entries) + 1
+        self._fh = self.path.open("ab")
+
+    def close(self) -> None:
+        self._fh.close()
@@ -55,7 +55,12 @@ def server_configuration_for_url(url: str):
     parsed = urlparse(url)
     hostname = parsed.hostname or ""
 
-    if ("localhost" in url or hostname in {"127.0.0.1", "::1"}) and localhost_cfg is not None:
+    # The predefined localhost constant is pinned to :8000; other ports get their own config.
+    if (
+        ("localhost" in url or hostname in {"127.0.0.1", "::1"})
+        and parsed.port in (None, 8000)
+        and localhost_cfg is not None
+    ):
         return localhost_cfg
 
     if any(domain in hostname for domain in ("psim.us", "pokemonshowdown.com")) and (
@@ -68,3 +73,11 @@ def server_configuration_for_url(url: str):
     websocket_url = f"{scheme}://{netloc}/showdown/websocket"
     auth_url = "https://play.pokemonshowdown.com/action.php?"
     return server_cfg(websocket_url, auth_url)
+
+
+def url_with_port(url: str, port: int) -> str:
+    # Return the server URL with its port replaced (used to give each worker its own server).
+
+    parsed = urlparse(url if "//" in url else f"http://{url}")
+    host = parsed.hostname or "localhost"
+    return parsed._replace(netloc=f"{host}:{port}").geturl()
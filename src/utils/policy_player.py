@@ -0,0 +1,62 @@
+# Poke-env Players that ask a shared InferenceBatcher for their moves.
+#
+# choose_move returns a coroutine (poke-env awaits it), so while one battle waits for its
+# batch the player's other battles keep receiving requests and join the same batch. The
+# action pair is turned into an order with strict=False, so a joint choice the server would
+# reject (both slots switching to the same mon) becomes the default order. PoolPolicyPlayer
+# samples a checkpoint from an OpponentPool at each battle's first move, plays the whole
+# battle with it and records the result for the pool's win-rate prioritized sampling.
+
+from __future__ import annotations
+
+from typing import Any
+
+from poke_env.battle import AbstractBattle, DoubleBattle
+from poke_env.environment import DoublesEnv
+from poke_env.player import BattleOrder, Player
+
+from src.utils.action_masks import legal_action_masks
+from src.utils.inference_batcher import InferenceBatcher
+from src.utils.obs_encoder import ObsEncoderV0
+from src.utils.opponent_pool import Checkpoint, OpponentPool
+
+
+class BatchedPolicyPlayer(Player):
+    def __init__(self, batcher: InferenceBatcher | None, act_size: int, **kwargs: Any):
+        self._batcher = batcher
+        self._act_size = act_size
+        self._encoder = ObsEncoderV0()
+        super().__init__(**kwargs)
+
+    def batcher_for(self, battle: DoubleBattle) -> InferenceBatcher:
+        assert self._batcher is not None
+        return self._batcher
+
+    def choose_move(self, battle: AbstractBattle) -> Any:
+        if not isinstance(battle, DoubleBattle):
+            return self.choose_random_move(battle)
+        return self._choose(battle)
+
+    async def _choose(self, battle: DoubleBattle) -> BattleOrder:
+        obs = self._encoder.encode(battle)
+        masks = legal_action_masks(battle, self._act_size)
+        action = await self.batcher_for(battle).submit(obs, masks)
+        return DoublesEnv.action_to_order(action, battle, fake=False, strict=False)
+
+
+class PoolPolicyPlayer(BatchedPolicyPlayer):
+    def __init__(self, pool: OpponentPool, act_size: int, **kwargs: Any):
+        self.pool = pool
+        self._assigned: dict[str, Checkpoint] = {}
+        super().__init__(batcher=None, act_size=act_size, **kwargs)
+
+    def batcher_for(self, battle: DoubleBattle) -> InferenceBatcher:
+        checkpoint = self._assigned.get(battle.battle_tag)
+        if checkpoint is None:
+            checkpoint = self._assigned[battle.battle_tag] = self.pool.sample()
+        return self.pool.batcher(checkpoint)
+
+    def _battle_finished_callback(self, battle: AbstractBattle) -> None:
+        checkpoint = self._assigned.pop(battle.battle_tag, None)
+        if checkpoint is not None and battle.won is not None:
+            self.pool.record(checkpoint.name, battle.won)
@@ -0,0 +1,165 @@
+# JSONL recorders for imitation tuples.
+#
+# Recorder writes and flushes one line per call, which is simple but costs a syscall per
+# decision on the event-loop thread. BufferedRecorder serialises with orjson on the caller
+# and hands batches to a writer thread, flushing when a batch fills up or goes stale. On
+# close(), SIGTERM or interpreter exit everything pending is written, so a hard crash loses
+# at most one batch (batch_size records or flush_interval seconds of play).
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import json
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+import orjson
+
+
+@dataclass
+class RecorderStats:
+    records: int = 0
+    bytes: int = 0
+    batches: int = 0
+    max_pending: int = 0
+    write_s: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def records_per_s(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.records / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        avg_batch = self.records / self.batches if self.batches else 0.0
+        return (
+            f"{self.records} records ({self.bytes / 1e6:.1f} MB) in {self.batches} writes, "
+            f"avg batch {avg_batch:.1f}, max pending {self.max_pending}, "
+            f"{self.records_per_s:.1f} records/s, {self.write_s:.2f}s in write()"
+        )
+
+
+class RecordSink(Protocol):
+    stats: RecorderStats
+
+    def write(self, payload: dict[str, Any]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class Recorder:
+    def __init__(self, out_path: Path):
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = out_path.open("ab")
+        self.stats = RecorderStats()
+
+    def write(self, payload: dict[str, Any]) -> None:
+        line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        started = time.perf_counter()
+        self._fh.write(line)
+        self._fh.flush()
+        self.stats.write_s += time.perf_counter() - started
+        self.stats.records += 1
+        self.stats.bytes += len(line)
+        self.stats.batches += 1
+
+    def close(self) -> None:
+        with contextlib.suppress(Exception):
+            self._fh.close()
+
+
+class BufferedRecorder(Recorder):
+    def __init__(
+        self,
+        out_path: Path,
+        batch_size: int = 512,
+        flush_interval: float = 2.0,
+        handle_signals: bool = True,
+    ):
+        super().__init__(out_path)
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._pending: list[bytes] = []
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="recorder-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        self._previous_handlers: dict[int, Any] = {}
+        if handle_signals and threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM,):
+                self._previous_handlers[signum] = signal.signal(signum, self._on_signal)
+
+    def write(self, payload: dict[str, Any]) -> None:
+        line = orjson.dumps(payload) + b"\n"
+        with self._cond:
+            if self._closed:
+                raise ValueError("write to closed BufferedRecorder")
+            self._pending.append(line)
+            pending = len(self._pending)
+            self.stats.max_pending = max(self.stats.max_pending, pending)
+            if pending >= self._batch_size:
+                self._cond.notify()
+
+    def flush(self) -> None:
+        with self._cond:
+            batch, self._pending = self._pending, []
+        self._write_batch(batch)
+
+    def _write_batch(self, batch: list[bytes]) -> None:
+        if not batch:
+            return
+        blob = b"".join(batch)
+        with self._io_lock:
+            started = time.perf_counter()
+            self._fh.write(blob)
+            self._fh.flush()
+            self.stats.write_s += time.perf_counter() - started
+            self.stats.records += len(batch)
+            self.stats.bytes += len(blob)
+            self.stats.batches += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self._flush_interval
+                while (
+                    not self._closed
+                    and len(self._pending) < self._batch_size
+                    and (remaining := deadline - time.monotonic()) > 0
+                ):
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            self._write_batch(batch)
+            if closed:
+                return
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        # The handler may interrupt write() while it holds the buffer lock, so it only turns
+        # the signal into SystemExit; close() then runs from finally blocks or atexit.
+        previous = self._previous_handlers.get(signum)
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            raise SystemExit(128 + signum)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+        for signum, handler in self._previous_handlers.items():
+            with contextlib.suppress(ValueError):
+                signal.signal(signum, handler)
+        super().close()
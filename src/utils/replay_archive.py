@@ -0,0 +1,214 @@
+# Append-only compressed archive for raw replays.
+#
+# Replays are appended to <root>/shard-NNNNN.gz as independent gzip members (a shard is still
+# a valid multi-member .gz file, so `zcat` works on it), and <root>/archive.jsonl journals
+# where each one landed: {"id", "ext", "shard", "offset", "length", "size", "hash",
+# "added_ns"}. A replay is read back with one seek and one zlib call, and streaming walks each
+# shard front to back, so nothing is ever unpacked to disk. A new shard starts once the
+# current one passes `shard_bytes`. A crash can leave bytes past the last journaled member;
+# the shard is cut back to that point when the archive is reopened. Re-adding an id appends
+# a new member and the journal's last line wins. Readers (parser, viewer) open the archive
+# with readonly=True, which never truncates, so they can run while a fetch is appending.
+# Entries also carry "turns", the byte offsets of each |turn| line in the extracted log
+# (src/utils/turn_index.py), so one turn can be sliced out without splitting the whole log.
+# gzip rather than zstd keeps this stdlib-only.
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any, BinaryIO, NamedTuple
+
+import orjson
+
+from src.utils.showdown_protocol import log_from_blob
+from src.utils.turn_index import TurnIndex
+
+JOURNAL_NAME = "archive.jsonl"
+SHARD_TEMPLATE = "shard-{:05d}.gz"
+REPLAY_SUFFIXES = {".json", ".log", ".html", ""}
+
+
+def iter_loose_replays(raw_dir: Path) -> Iterator[Path]:
+    # Replay files as fetch_replays writes them, skipping its index.json/index.jsonl.
+    for path in sorted(raw_dir.glob("*")):
+        if path.is_file() and path.suffix.lower() in REPLAY_SUFFIXES and path.stem != "index":
+            yield path
+
+
+def _compress(blob: bytes, level: int) -> bytes:
+    packer = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip header and trailer
+    return packer.compress(blob) + packer.flush()
+
+
+def read_member(shard: Path, offset: int, length: int) -> bytes:
+    with shard.open("rb") as handle:
+        handle.seek(offset)
+        return zlib.decompress(handle.read(length), 31)
+
+
+class ReplayRef(NamedTuple):
+    # One replay to read, from a loose file (length < 0) or an archive member. Plain tuple so
+    # it pickles cheaply into pool workers.
+    name: str  # "<replay_id><ext>"
+    path: Path
+    offset: int = 0
+    length: int = -1
+
+    @property
+    def label(self) -> str:
+        return str(self.path) if self.length < 0 else f"{self.path}:{self.name}"
+
+    def read(self) -> bytes:
+        if self.length < 0:
+            return self.path.read_bytes()
+        return read_member(self.path, self.offset, self.length)
+
+
+class ReplayArchive:
+    def __init__(
+        self,
+        root: Path,
+        shard_bytes: int = 256 << 20,
+        level: int = 6,
+        readonly: bool = False,
+    ):
+        self.root = root
+        self.shard_bytes = shard_bytes
+        self.level = level
+        self.readonly = readonly
+        self._entries: dict[str, dict[str, Any]] = {}
+        self.path = root / JOURNAL_NAME
+        if self.path.exists():
+            self._load()
+        elif readonly:
+            raise FileNotFoundError(f"no replay archive at {root}")
+        if readonly:
+            return
+        root.mkdir(parents=True, exist_ok=True)
+        self._index = self.path.open("ab")
+        if self._index.tell() and not self._ends_with_newline():
+            self._index.write(b"\n")
+        self._shard_no = self._last_shard()
+        self._shard = self._open_shard(self._shard_no)
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def _load(self) -> None:
+        with self.path.open("rb") as handle:
+            for line in handle:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("id"), str):
+                    self._entries[entry["id"]] = entry
+
+    def _last_shard(self) -> int:
+        numbers = [int(path.name[6:11]) for path in self.root.glob("shard-[0-9]*.gz")]
+        return max(numbers, default=0)
+
+    def _shard_path(self, number: int) -> Path:
+        return self.root / SHARD_TEMPLATE.format(number)
+
+    def _open_shard(self, number: int) -> BinaryIO:
+        handle = self._shard_path(number).open("ab")
+        # Anything past the last journaled member was written by a run that died before
+        # journaling it; cut it off so offsets stay consistent.
+        name = self._shard_path(number).name
+        end = max(
+            (e["offset"] + e["length"] for e in self._entries.values() if e["shard"] == name),
+            default=0,
+        )
+        if handle.tell() > end:
+            handle.truncate(end)
+            handle.seek(end)
+        return handle
+
+    def __contains__(self, replay_id: object) -> bool:
+        return replay_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __getitem__(self, replay_id: str) -> dict[str, Any]:
+        return self._entries[replay_id]
+
+    def get(self, replay_id: str) -> dict[str, Any] | None:
+        return self._entries.get(replay_id)
+
+    def add(self, replay_id: str, blob: bytes, ext: str) -> dict[str, Any]:
+        if self.readonly:
+            raise PermissionError("replay archive was opened read-only")
+        if self._shard.tell() >= self.shard_bytes:
+            self._shard.close()
+            self._shard_no += 1
+            self._shard = self._open_shard(self._shard_no)
+        member = _compress(blob, self.level)
+        offset = self._shard.tell()
+        self._shard.write(member)
+        self._shard.flush()
+        entry = {
+            "id": replay_id,
+            "ext": ext,
+            "shard": self._shard_path(self._shard_no).name,
+            "offset": offset,
+            "length": len(member),
+            "size": len(blob),
+            "hash": hashlib.blake2b(blob, digest_size=16).hexdigest(),
+            "added_ns": time.time_ns(),
+            "turns": TurnIndex.scan(log_from_blob(blob, ext).encode()).offsets,
+        }
+        self._index.write(orjson.dumps(entry) + b"\n")
+        self._index.flush()
+        self._entries[replay_id] = entry
+        return entry
+
+    def ref(self, replay_id: str) -> ReplayRef:
+        entry = self._entries[replay_id]
+        return ReplayRef(
+            replay_id + entry["ext"], self.root / entry["shard"], entry["offset"], entry["length"]
+        )
+
+    def refs(self) -> list[ReplayRef]:
+        # Sorted by name, matching the order loose files are listed in.
+        return [self.ref(replay_id) for replay_id in sorted(self._entries)]
+
+    def read(self, replay_id: str) -> bytes:
+        return self.ref(replay_id).read()
+
+    def iter_replays(self, ids: Iterable[str] | None = None) -> Iterator[tuple[str, str, bytes]]:
+        # (id, ext, blob) in on-disk order: each shard is opened once and read front to back.
+        wanted = self._entries.values() if ids is None else map(self._entries.__getitem__, ids)
+        entries = sorted(wanted, key=lambda e: (e["shard"], e["offset"]))
+        handle = None
+        shard = None
+        try:
+            for entry in entries:
+                if entry["shard"] != shard:
+                    if handle is not None:
+                        handle.close()
+                    shard = entry["shard"]
+                    handle = (self.root / shard).open("rb")
+                assert handle is not None
+                handle.seek(entry["offset"])
+                yield entry["id"], entry["ext"], zlib.decompress(handle.read(entry["length"]), 31)
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def close(self) -> None:
+        if self.readonly:
+            return
+        self._shard.close()
+        self._index.close()
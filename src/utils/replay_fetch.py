@@ -0,0 +1,212 @@
+# Concurrent replay downloads over pooled keep-alive HTTP connections.
+#
+# FetchEngine runs up to `concurrency` requests at once. Each request borrows a persistent
+# http.client connection from a per-host pool, so TLS handshakes happen once per connection
+# rather than once per replay, and the blocking I/O runs in worker threads. A shared
+# TokenBucket caps the request rate across all of them (retries and variant probes
+# included), and 429/5xx responses or dropped connections are retried with exponential
+# backoff, honouring Retry-After when the server sends one.
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+REPLAY_VARIANTS = (".json", ".log", "")
+
+
+class TokenBucket:
+    # `rate` tokens per second with up to `burst` saved up; rate <= 0 disables limiting.
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1.0
+
+
+@dataclass
+class HttpResult:
+    status: int
+    body: bytes
+    headers: dict[str, str]
+
+
+class ConnectionPool:
+    def __init__(self, timeout: float = 15.0):
+        self._timeout = timeout
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _checkout(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+            self.opened += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self._timeout)
+        return http.client.HTTPConnection(netloc, timeout=self._timeout)
+
+    def request(self, url: str, headers: dict[str, str]) -> HttpResult:
+        # Blocking; called from worker threads.
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        conn = self._checkout(parts.scheme, parts.netloc)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                self._idle.setdefault((parts.scheme, parts.netloc), []).append(conn)
+        return HttpResult(response.status, body, {k.lower(): v for k, v in response.getheaders()})
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+@dataclass
+class FetchStats:
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    bytes: int = 0
+    statuses: Counter[int] = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.requests / elapsed if elapsed > 0 else 0.0
+        codes = ", ".join(f"{code}={n}" for code, n in sorted(self.statuses.items()))
+        return (
+            f"{self.requests} requests ({rate:.2f}/s), {self.retries} retries, "
+            f"{self.errors} errors, {self.bytes / 1e6:.1f} MB; statuses: {codes}"
+        )
+
+
+class FetchEngine:
+    def __init__(
+        self,
+        user_agent: str,
+        rate: float = 0.5,
+        concurrency: int = 4,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = 15.0,
+    ):
+        self.user_agent = user_agent
+        self.bucket = TokenBucket(rate)
+        self.pool = ConnectionPool(timeout=timeout)
+        self.stats = FetchStats()
+        self._concurrency = max(1, concurrency)
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+
+    def _delay(self, attempt: int, result: HttpResult | None) -> float:
+        retry_after = result.headers.get("retry-after") if result else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self._max_backoff)
+        delay = min(self._backoff * 2.0**attempt, self._max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def get(self, url: str) -> HttpResult | None:
+        # Returns the final response (possibly a non-retryable error status), or None when
+        # the connection kept failing.
+        headers = {"User-Agent": self.user_agent, "Connection": "keep-alive"}
+        for attempt in range(self._max_retries + 1):
+            await self.bucket.acquire()
+            self.stats.requests += 1
+            result: HttpResult | None
+            try:
+                result = await asyncio.to_thread(self.pool.request, url, headers)
+            except (OSError, http.client.HTTPException):
+                result = None
+                self.stats.errors += 1
+            else:
+                self.stats.statuses[result.status] += 1
+                self.stats.bytes += len(result.body)
+                if result.status not in RETRY_STATUSES:
+                    return result
+            if attempt == self._max_retries:
+                return result
+            self.stats.retries += 1
+            await asyncio.sleep(self._delay(attempt, result))
+        return None
+
+    async def fetch_replay(
+        self, base_url: str, replay_id: str, variants: Iterable[str] = REPLAY_VARIANTS
+    ) -> tuple[bytes | None, str | None]:
+        # Same contract as the old try_fetch_variants: 404 moves on to the next variant,
+        # any other failure gives up on the replay.
+        for ext in variants:
+            result = await self.get(f"{base_url}/{replay_id}{ext}")
+            if result is None:
+                return None, None
+            if result.status == 404:
+                continue
+            if result.status != 200:
+                return None, None
+            if result.body:
+                return result.body, (ext or ".html")
+        return None, None
+
+    async def fetch_many(
+        self,
+        base_url: str,
+        replay_ids: Iterable[str],
+        on_result: Callable[[str, bytes | None, str | None], Awaitable[None] | None],
+        variants: Callable[[str], Iterable[str]] | None = None,
+    ) -> FetchStats:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for replay_id in replay_ids:
+            queue.put_nowait(replay_id)
+
+        async def worker() -> None:
+            while not queue.empty():
+                replay_id = queue.get_nowait()
+                exts = variants(replay_id) if variants else REPLAY_VARIANTS
+                blob, ext = await self.fetch_replay(base_url, replay_id, exts)
+                pending = on_result(replay_id, blob, ext)
+                if pending is not None:
+                    await pending
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self._concurrency)))
+        finally:
+            self.pool.close()
+        return self.stats
@@ -0,0 +1,306 @@
+# Offline conversion of human Showdown replays into imitation records.
+#
+# Each replay is played back once per side through a poke-env DoubleBattle with no server:
+# the protocol lines go straight into parse_message. Spectator logs carry no |request|, so
+# the request-only fields (available moves/switches, tera) are rebuilt from public state
+# before every decision. The side's own moves are all preloaded, since the real player knew
+# its full set from turn 1. At each |turn| the side gets a record with the same fields as
+# RecordingHeuristics writes: obs_v0 from ObsEncoderV0, legal_action_masks and the DoublesEnv
+# action pair. That pair is read from what each active slot actually did before |upkeep|
+# (a move plus its target, -terastallize, or a chosen switch). Decisions we cannot recover
+# are skipped and counted rather than guessed. That covers a slot that could not act
+# (|cant|, locked or called moves) and an action the rebuilt mask rejects. End-of-turn
+# replacements after a faint are not decisions at a |turn| line and are not emitted.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from poke_env.battle import DoubleBattle, Move, Pokemon
+from poke_env.data.normalize import to_id_str
+from poke_env.player import DoubleBattleOrder, SingleBattleOrder
+
+from src.utils.action_masks import (
+    GIMMICK_STRIDE,
+    MOVE_OFFSET,
+    N_TARGETS,
+    action_to_tuple,
+    legal_action_masks,
+)
+from src.utils.obs_encoder import ObsEncoderV0
+from src.utils.poke_env_utils import act_size_for_format
+
+# Messages a Player handles itself instead of passing to the battle.
+PLAYER_MESSAGES = {"t:", "expire", "uhtmlchange", "request", "showteam", "error", "bigerror"}
+SLOTS = ("a", "b")
+TERA_GIMMICK = 4
+
+
+@dataclass
+class ConvertStats:
+    replays: int = 0
+    sides: int = 0
+    records: int = 0
+    unknown: int = 0  # a slot's choice is not visible in the log
+    off_mask: int = 0  # the observed choice is outside the rebuilt mask
+    failed: int = 0  # sides whose playback raised
+
+    def add(self, other: ConvertStats) -> None:
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def summary(self) -> str:
+        return (
+            f"{self.records} records from {self.sides} sides of {self.replays} replays; "
+            f"skipped {self.unknown} unknown and {self.off_mask} off-mask decisions, "
+            f"{self.failed} sides failed"
+        )
+
+
+def split_log(log: str) -> list[list[str]]:
+    return [line.rstrip("\r").split("|") for line in log.splitlines() if line.startswith("|")]
+
+
+def _species(details: str) -> str:
+    return details.split(", ")[0]
+
+
+def _base_id(species: str) -> str:
+    return to_id_str(species.split("-")[0])
+
+
+def _team_sheet(lines: list[list[str]], role: str) -> tuple[list[str], dict[str, list[str]]]:
+    # (details per team member, moves in first-use order per base species) for one side.
+    # Team preview lists the whole team; switch-ins fill in formes preview hides
+    # ("Urshifu-*") and teams of formats without preview.
+    preview: list[str] = []
+    switched: dict[str, str] = {}
+    species_by_name: dict[str, str] = {}
+    moves: dict[str, list[str]] = {}
+    for parts in lines:
+        kind = parts[1] if len(parts) > 1 else ""
+        if kind == "poke" and len(parts) > 3 and parts[2] == role:
+            preview.append(parts[3])
+        elif kind in ("switch", "drag") and len(parts) > 3 and parts[2].startswith(role):
+            switched.setdefault(_base_id(_species(parts[3])), parts[3])
+            species_by_name[parts[2].partition(": ")[2]] = _base_id(_species(parts[3]))
+        elif kind == "move" and len(parts) > 3 and parts[2].startswith(role):
+            if any(part.startswith("[from]") for part in parts[4:]):
+                continue
+            base = species_by_name.get(parts[2].partition(": ")[2])
+            if base is not None and parts[3] not in moves.setdefault(base, []):
+                moves[base].append(parts[3])
+    if not preview:
+        return list(switched.values()), moves
+    team = []
+    for details in preview:
+        base = _base_id(_species(details))
+        team.append(switched.get(base, details.replace("-*", "")))
+    return team, moves
+
+
+def _seed_team(battle: DoubleBattle, role: str, lines: list[list[str]]) -> None:
+    team, moves = _team_sheet(lines, role)
+    for details in team:
+        mon = battle.get_pokemon(f"{role}: {_species(details)}", details=details)
+        for move in moves.get(_base_id(_species(details)), [])[:4]:
+            mon._add_move(Move.retrieve_id(move))
+
+
+def _rebuild_request(battle: DoubleBattle) -> None:
+    # Public-state stand-in for the |request| a spectator log does not contain.
+    bench = [mon for mon in battle.team.values() if not mon.active and not mon.fainted]
+    for pos, mon in enumerate(battle.active_pokemon):
+        alive = mon is not None and not mon.fainted
+        battle._available_moves[pos] = list(mon.moves.values())[:4] if alive and mon else []
+        battle._available_switches[pos] = list(bench)
+        battle._can_tera[pos] = alive and not battle.used_tera
+    battle._force_switch = [False, False]
+    battle._trapped = [False, False]
+
+
+def _observed_choices(lines: list[list[str]], start: int, role: str) -> dict[str, Any]:
+    # What each of the side's slots did between this |turn| and |upkeep|: ("switch",
+    # details), ("move", name, target) or ("cant",); "tera" marks -terastallize.
+    choices: dict[str, Any] = {}
+    for parts in lines[start + 1 :]:
+        kind = parts[1] if len(parts) > 1 else ""
+        if kind in ("upkeep", "turn", "win", "tie"):
+            break
+        if len(parts) < 3 or not parts[2].startswith(role) or len(parts[2]) < 3:
+            continue
+        slot = parts[2][2]
+        if kind == "-terastallize":
+            choices[f"tera{slot}"] = True
+        elif slot in choices:
+            continue
+        elif kind == "switch" and len(parts) > 3:
+            choices[slot] = ("switch", parts[3])
+        elif kind == "move" and len(parts) > 3:
+            if any(part.startswith("[from]") for part in parts[4:]):
+                choices[slot] = ("cant",)
+            else:
+                choices[slot] = ("move", parts[3], parts[4] if len(parts) > 4 else "")
+        elif kind == "cant":
+            choices[slot] = ("cant",)
+    return choices
+
+
+def _target_position(target: str, role: str) -> int:
+    if len(target) < 3 or target[0] != "p":
+        return DoubleBattle.EMPTY_TARGET_POSITION
+    offset = SLOTS.index(target[2]) + 1 if target[2] in SLOTS else 0
+    if not offset:
+        return DoubleBattle.EMPTY_TARGET_POSITION
+    return -offset if target[:2] == role else offset
+
+
+def _find_member(battle: DoubleBattle, species: str, base: bool = False) -> Pokemon | None:
+    for mon in battle.team.values():
+        if (mon.base_species if base else mon.species) == species:
+            return mon
+    return None
+
+
+def _slot_order(
+    battle: DoubleBattle,
+    pos: int,
+    choice: tuple[str, ...],
+    tera: bool,
+    mask: np.ndarray,
+) -> SingleBattleOrder | None:
+    if choice[0] == "switch":
+        species = to_id_str(_species(choice[1]))
+        base = _base_id(_species(choice[1]))
+        mon = _find_member(battle, species) or _find_member(battle, base, base=True)
+        return SingleBattleOrder(mon) if mon is not None else None
+    if choice[0] != "move":
+        return None
+    active = battle.active_pokemon[pos]
+    moves = list(active.moves) if active else []
+    move_id = Move.retrieve_id(choice[1])
+    if active is None or move_id not in moves:
+        return None
+    # Spread, self and field moves log a nominal target; the mask knows the real options.
+    block = (
+        MOVE_OFFSET
+        + moves.index(move_id) * N_TARGETS
+        + (TERA_GIMMICK * GIMMICK_STRIDE if tera else 0)
+    )
+    legal = [
+        target
+        for target in range(-2, 3)
+        if block + target + 2 < len(mask) and mask[block + target + 2]
+    ]
+    target = _target_position(choice[2], battle.player_role or "")
+    if target not in legal and len(legal) == 1:
+        target = legal[0]
+    return SingleBattleOrder(active.moves[move_id], move_target=target, terastallize=tera)
+
+
+class ReplayConverter:
+    def __init__(self, teacher_name: str = "human"):
+        self.teacher_name = teacher_name
+        self._encoder = ObsEncoderV0()
+
+    def convert(self, replay_id: str, log: str) -> tuple[list[dict[str, Any]], ConvertStats]:
+        stats = ConvertStats(replays=1)
+        lines = split_log(log)
+        players = {
+            parts[2]: parts[3]
+            for parts in lines
+            if len(parts) > 3 and parts[1] == "player" and parts[3]
+        }
+        records: list[dict[str, Any]] = []
+        for role in sorted(players):
+            try:
+                records.extend(self._convert_side(replay_id, lines, role, players[role], stats))
+            except Exception:
+                stats.failed += 1
+                continue
+            stats.sides += 1
+        stats.records = len(records)
+        return records, stats
+
+    def _convert_side(
+        self,
+        replay_id: str,
+        lines: list[list[str]],
+        role: str,
+        username: str,
+        stats: ConvertStats,
+    ) -> list[dict[str, Any]]:
+        fmt = replay_id.split("-")[0]
+        act_size = act_size_for_format(fmt)
+        gen = int(fmt[3]) if fmt.startswith("gen") and fmt[3:4].isdigit() else 9
+        battle = DoubleBattle(
+            f"battle-{replay_id}",
+            username,
+            None,  # type: ignore[arg-type]
+            gen=gen,
+        )
+        battle.player_role = role
+        _seed_team(battle, role, lines)
+        records = []
+        for idx, parts in enumerate(lines):
+            kind = parts[1] if len(parts) > 1 else ""
+            if kind in PLAYER_MESSAGES:
+                continue
+            if kind == "win":
+                battle.won_by(parts[2] if len(parts) > 2 else "")
+                break
+            if kind == "tie":
+                battle.tied()
+                break
+            battle.parse_message(parts)
+            if kind == "turn":
+                record = self._decision(battle, lines, idx, act_size, stats)
+                if record is not None:
+                    records.append(record)
+        return records
+
+    def _decision(
+        self,
+        battle: DoubleBattle,
+        lines: list[list[str]],
+        idx: int,
+        act_size: int,
+        stats: ConvertStats,
+    ) -> dict[str, Any] | None:
+        role = battle.player_role or ""
+        _rebuild_request(battle)
+        masks = legal_action_masks(battle, act_size)
+        choices = _observed_choices(lines, idx, role)
+        orders: list[SingleBattleOrder | None] = []
+        for pos, mon in enumerate(battle.active_pokemon):
+            if mon is None or mon.fainted:
+                orders.append(None)
+                continue
+            choice = choices.get(SLOTS[pos], ("cant",))
+            order = _slot_order(
+                battle, pos, choice, bool(choices.get(f"tera{SLOTS[pos]}")), masks[pos]
+            )
+            if order is None:
+                stats.unknown += 1
+                return None
+            orders.append(order)
+        if all(order is None for order in orders):
+            return None
+        first, second = action_to_tuple(DoubleBattleOrder(orders[0], orders[1]), battle)
+        if not (0 <= first < act_size and 0 <= second < act_size) or not (
+            masks[0, first] and masks[1, second]
+        ):
+            stats.off_mask += 1
+            return None
+        return {
+            "battle_tag": battle.battle_tag,
+            "turn": battle.turn,
+            "side": role,
+            "teacher": self.teacher_name,
+            "format": battle.battle_tag.split("-")[1],
+            "obs_v0": self._encoder.encode(battle).tolist(),
+            "action": [first, second],
+            "mask": masks.astype(np.int8).tolist(),
+        }
@@ -0,0 +1,159 @@
+# Single-agent, action-masked DoublesEnv for PPO, plus picklable specs to fan it out.
+#
+# MaskedDoublesEnv is poke-env's DoublesEnv with obs_v0 observations (ObsEncoderV0), a shaped
+# reward (fainted/HP deltas and a victory bonus through reward_computing_helper) and a
+# MultiDiscrete([A, A]) action space with A = act_size_for_format. SelfPlayEnv is its
+# single-agent view: the learner plays agent1 and an in-process opponent Player picks agent2's
+# orders. action_masks() returns both slots' legal_action_masks flattened to 2 * A, the layout
+# MaskablePPO expects for MultiDiscrete. The slot masks are independent, so a joint choice the
+# server would reject (both slots switching to the same mon) becomes a default order
+# (strict=False) instead of raising. With opponent="policy" the opponent's pair is not picked
+# in-process: step() takes a 4-wide action (learner pair, then opponent pair) that the vector
+# env fills in from one batched forward pass over every env's opponent_inputs(). EnvSpec
+# describes one environment (format, server URL, accounts, opponent) as plain data so make_env
+# can build it inside a worker process, and env_specs spreads M environments over K local
+# servers on consecutive ports.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from gymnasium.spaces import Box, MultiDiscrete
+from poke_env.battle import AbstractBattle, DoubleBattle
+from poke_env.environment import DoublesEnv, SingleAgentWrapper
+from poke_env.player import Player
+from poke_env.player.baselines import MaxBasePowerPlayer, RandomPlayer, SimpleHeuristicsPlayer
+from poke_env.ps_client import AccountConfiguration
+
+from src.utils.action_masks import legal_action_masks
+from src.utils.obs_encoder import OBS_V0_DIM, ObsEncoderV0
+from src.utils.poke_env_utils import (
+    act_size_for_format,
+    server_configuration_for_url,
+    url_with_port,
+)
+
+POLICY_OPPONENT = "policy"
+OPPONENTS: dict[str, type[Player]] = {
+    "random": RandomPlayer,
+    "maxbp": MaxBasePowerPlayer,
+    "simple": SimpleHeuristicsPlayer,
+}
+FAINTED_VALUE = 2.0
+HP_VALUE = 1.0
+VICTORY_VALUE = 30.0
+
+
+class MaskedDoublesEnv(DoublesEnv[npt.NDArray[np.float32]]):
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.act_size = act_size_for_format(self.agent1.format)
+        self.action_spaces = {
+            agent: MultiDiscrete([self.act_size, self.act_size]) for agent in self.possible_agents
+        }
+        self.observation_spaces = {
+            agent: Box(0.0, 1.0, shape=(OBS_V0_DIM,), dtype=np.float32)
+            for agent in self.possible_agents
+        }
+        self._encoder = ObsEncoderV0()
+
+    def embed_battle(self, battle: AbstractBattle) -> npt.NDArray[np.float32]:
+        assert isinstance(battle, DoubleBattle)
+        return self._encoder.encode(battle)
+
+    def calc_reward(self, battle: AbstractBattle) -> float:
+        return self.reward_computing_helper(
+            battle, fainted_value=FAINTED_VALUE, hp_value=HP_VALUE, victory_value=VICTORY_VALUE
+        )
+
+    def action_masks(self, battle: AbstractBattle | None) -> npt.NDArray[np.bool_]:
+        # (2 * act_size,) bool; before the first request every action is allowed.
+        if not isinstance(battle, DoubleBattle):
+            return np.ones(2 * self.act_size, dtype=np.bool_)
+        return legal_action_masks(battle, self.act_size).reshape(-1)
+
+
+class SelfPlayEnv(SingleAgentWrapper):
+    env: MaskedDoublesEnv
+
+    def action_masks(self) -> npt.NDArray[np.bool_]:
+        return self.env.action_masks(self.env.battle1)
+
+    def opponent_inputs(self) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.bool_]]:
+        # What a policy opponent needs for its next move: obs_v0 and (2, act_size) masks.
+        battle = self.env.battle2
+        if not isinstance(battle, DoubleBattle):
+            return (
+                np.zeros(OBS_V0_DIM, dtype=np.float32),
+                np.ones((2, self.env.act_size), dtype=np.bool_),
+            )
+        return self.env.embed_battle(battle), legal_action_masks(battle, self.env.act_size)
+
+    def step(self, action: npt.NDArray[np.int64]) -> tuple[Any, float, bool, bool, dict[str, Any]]:
+        if len(action) != 4:
+            return super().step(action)
+        agent1, agent2 = self.env.agent1.username, self.env.agent2.username
+        actions = {agent1: np.asarray(action[:2]), agent2: np.asarray(action[2:])}
+        obs, rewards, terms, truncs, infos = self.env.step(actions)
+        info = infos[agent1]
+        if terms[agent1] or truncs[agent1]:
+            # Lets the vector env credit the opponent checkpoint with the result.
+            info = {**info, "won": self.env.battle1.won if self.env.battle1 else None}
+        return obs[agent1], rewards[agent1], terms[agent1], truncs[agent1], info
+
+
+@dataclass(frozen=True)
+class EnvSpec:
+    index: int
+    battle_format: str
+    server_url: str
+    opponent: str = "random"
+    team: str | None = None
+    account_prefix: str = "ppo"
+
+    def username(self, side: str) -> str:
+        # Showdown caps usernames at 18 characters.
+        return f"{self.account_prefix}{self.index}{side}"[:18]
+
+
+def env_specs(
+    n_envs: int,
+    battle_format: str,
+    server_url: str,
+    n_servers: int = 1,
+    base_port: int = 8000,
+    **kwargs: Any,
+) -> list[EnvSpec]:
+    # Environment i talks to server i % n_servers, on base_port + i % n_servers.
+    n_servers = max(1, n_servers)
+    return [
+        EnvSpec(
+            index=idx,
+            battle_format=battle_format,
+            server_url=url_with_port(server_url, base_port + idx % n_servers),
+            **kwargs,
+        )
+        for idx in range(n_envs)
+    ]
+
+
+def make_env(spec: EnvSpec) -> SelfPlayEnv:
+    # Top-level so SubprocVecEnv can pickle it into a spawned worker.
+    if spec.opponent not in OPPONENTS and spec.opponent != POLICY_OPPONENT:
+        raise ValueError(f"Unknown opponent kind: {spec.opponent}")
+    env = MaskedDoublesEnv(
+        account_configuration1=AccountConfiguration(spec.username("a"), None),
+        account_configuration2=AccountConfiguration(spec.username("b"), None),
+        battle_format=spec.battle_format,
+        server_configuration=server_configuration_for_url(spec.server_url),
+        team=spec.team,
+        strict=False,
+    )
+    # The opponent only chooses orders for agent2's battle; it never connects itself. A policy
+    # opponent's moves arrive with the learner's, so its Player is just a placeholder.
+    kind = "random" if spec.opponent == POLICY_OPPONENT else spec.opponent
+    opponent = OPPONENTS[kind](battle_format=spec.battle_format, start_listening=False)
+    return SelfPlayEnv(env, opponent)
@@ -0,0 +1,367 @@
+# Single-pass tokenizer for Showdown battle logs.
+#
+# Lines are screened with one str.startswith against the "|type" prefixes that have a
+# handler, so chat, upkeep and other noise are rejected in C; the rest are split on "|" once
+# and dispatched on the exact message type through a table. The prefixes carry no trailing
+# "|" because some messages (|tie, |upkeep) end right after the type; a longer type that
+# shares a prefix (|tier| for |tie) passes the screen and is dropped at dispatch. Handlers
+# emit small slotted event records that carry the current turn (None before |turn|1):
+#   Turn, Player, Preview, Move, Switch, Damage, Heal, Status, Weather, Field, Tera, Faint, Win
+# Records keep the raw protocol tokens (e.g. ident "p1a: Incineroar", condition "45/100 par")
+# and decode them in properties, so building an event costs a few slot stores and consumers
+# only pay for the fields they read. Pokemon are addressed by side ("p1"/"p2"), slot
+# ("a"/"b", "" when the log omits it) and name.
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Collection, Iterable, Iterator
+from dataclasses import dataclass
+
+
+def parse_ident(ident: str) -> tuple[str, str, str]:
+    # "p1a: Incineroar" -> ("p1", "a", "Incineroar"); "p2: Bob" -> ("p2", "", "Bob")
+    position, _, name = ident.partition(": ")
+    return position[:2], position[2:3], name.strip()
+
+
+def parse_hp(condition: str) -> tuple[int | None, int | None, str | None]:
+    # "45/100 par" -> (45, 100, "par"); "0 fnt" -> (0, None, "fnt")
+    value, _, status = condition.strip().partition(" ")
+    current, _, maximum = value.partition("/")
+    try:
+        return int(current), int(maximum) if maximum else None, status or None
+    except ValueError:
+        return None, None, status or None
+
+
+@dataclass(slots=True)
+class Turn:
+    turn: int
+
+
+@dataclass(slots=True)
+class Player:
+    turn: int | None
+    side: str
+    name: str
+
+
+@dataclass(slots=True)
+class Preview:
+    # One team-preview |poke| line: the whole team is listed before turn 1.
+    turn: int | None
+    side: str
+    details: str
+
+    @property
+    def species(self) -> str:
+        return self.details.partition(", ")[0]
+
+
+@dataclass(slots=True)
+class PokemonEvent:
+    turn: int | None
+    ident: str
+
+    @property
+    def side(self) -> str:
+        return self.ident[:2]
+
+    @property
+    def slot(self) -> str:
+        return parse_ident(self.ident)[1]
+
+    @property
+    def pokemon(self) -> str:
+        return parse_ident(self.ident)[2]
+
+
+@dataclass(slots=True)
+class Move(PokemonEvent):
+    move: str
+    target: str  # raw target ident, "" when the move has none
+
+    @property
+    def target_side(self) -> str | None:
+        return self.target[:2] if self.target[:1] == "p" else None
+
+    @property
+    def target_slot(self) -> str | None:
+        return parse_ident(self.target)[1] if self.target[:1] == "p" else None
+
+
+@dataclass(slots=True)
+class Switch(PokemonEvent):
+    details: str  # "Incineroar, L50, F, tera:Fire"
+    condition: str
+    forced: bool  # |drag| (Roar, Red Card...) rather than a chosen switch
+
+    @property
+    def species(self) -> str:
+        return self.details.partition(", ")[0]
+
+    @property
+    def level(self) -> int | None:
+        for detail in self.details.split(", ")[1:]:
+            if detail[:1] == "L" and detail[1:].isdigit():
+                return int(detail[1:])
+        return None
+
+    @property
+    def hp(self) -> int | None:
+        return parse_hp(self.condition)[0]
+
+    @property
+    def max_hp(self) -> int | None:
+        return parse_hp(self.condition)[1]
+
+
+@dataclass(slots=True)
+class HpChange(PokemonEvent):
+    condition: str
+    source: str | None
+
+    @property
+    def hp(self) -> int | None:
+        return parse_hp(self.condition)[0]
+
+    @property
+    def max_hp(self) -> int | None:
+        return parse_hp(self.condition)[1]
+
+    @property
+    def status(self) -> str | None:
+        return parse_hp(self.condition)[2]
+
+
+@dataclass(slots=True)
+class Damage(HpChange):
+    pass
+
+
+@dataclass(slots=True)
+class Heal(HpChange):
+    pass
+
+
+@dataclass(slots=True)
+class Status(PokemonEvent):
+    status: str
+    cured: bool
+    source: str | None
+
+
+@dataclass(slots=True)
+class Weather:
+    turn: int | None
+    weather: str  # "none" when the weather ends
+    upkeep: bool
+    source: str | None
+
+
+@dataclass(slots=True)
+class Field:
+    turn: int | None
+    effect: str
+    started: bool
+    side: str | None  # set for side conditions (-sidestart/-sideend)
+
+
+@dataclass(slots=True)
+class Tera(PokemonEvent):
+    tera_type: str
+
+
+@dataclass(slots=True)
+class Faint(PokemonEvent):
+    pass
+
+
+@dataclass(slots=True)
+class Win:
+    turn: int | None
+    winner: str | None  # None for a tie
+
+
+Event = (
+    Turn
+    | Player
+    | Preview
+    | Move
+    | Switch
+    | Damage
+    | Heal
+    | Status
+    | Weather
+    | Field
+    | Tera
+    | Faint
+    | Win
+)
+Handler = Callable[[list[str], "int | None"], "Event | None"]
+
+
+def _source(parts: list[str], start: int) -> str | None:
+    for part in parts[start:]:
+        if part.startswith("[from]"):
+            return part[6:].strip()
+    return None
+
+
+def _player(parts: list[str], turn: int | None) -> Player | None:
+    # |player|p1|| is sent when a player leaves; only lines carrying a name count.
+    if len(parts) < 4 or not parts[3]:
+        return None
+    return Player(turn, parts[2], parts[3])
+
+
+def _preview(parts: list[str], turn: int | None) -> Preview | None:
+    if len(parts) < 4:
+        return None
+    return Preview(turn, parts[2], parts[3])
+
+
+def _move(parts: list[str], turn: int | None) -> Move | None:
+    if len(parts) < 4:
+        return None
+    return Move(turn, parts[2], parts[3], parts[4] if len(parts) > 4 else "")
+
+
+def _switch(parts: list[str], turn: int | None) -> Switch | None:
+    if len(parts) < 4:
+        return None
+    condition = parts[4] if len(parts) > 4 else ""
+    return Switch(turn, parts[2], parts[3], condition, parts[1] == "drag")
+
+
+def _damage(parts: list[str], turn: int | None) -> Damage | Heal | None:
+    if len(parts) < 4:
+        return None
+    source = _source(parts, 4) if len(parts) > 4 else None
+    if parts[1] == "-damage":
+        return Damage(turn, parts[2], parts[3], source)
+    return Heal(turn, parts[2], parts[3], source)
+
+
+def _status(parts: list[str], turn: int | None) -> Status | None:
+    if len(parts) < 4:
+        return None
+    cured = parts[1] == "-curestatus"
+    return Status(turn, parts[2], parts[3].strip(), cured, _source(parts, 4))
+
+
+def _weather(parts: list[str], turn: int | None) -> Weather | None:
+    if len(parts) < 3:
+        return None
+    upkeep = "[upkeep]" in parts[3:]
+    return Weather(turn, parts[2].strip(), upkeep, _source(parts, 3))
+
+
+def _field(parts: list[str], turn: int | None) -> Field | None:
+    kind = parts[1]
+    if kind in ("-sidestart", "-sideend"):
+        if len(parts) < 4:
+            return None
+        effect = parts[3].removeprefix("move: ").strip()
+        return Field(turn, effect, kind == "-sidestart", parts[2][:2])
+    if len(parts) < 3:
+        return None
+    effect = parts[2].removeprefix("move: ").strip()
+    return Field(turn, effect, kind == "-fieldstart", None)
+
+
+def _tera(parts: list[str], turn: int | None) -> Tera | None:
+    if len(parts) < 4:
+        return None
+    return Tera(turn, parts[2], parts[3].strip())
+
+
+def _faint(parts: list[str], turn: int | None) -> Faint | None:
+    if len(parts) < 3:
+        return None
+    return Faint(turn, parts[2])
+
+
+def _win(parts: list[str], turn: int | None) -> Win:
+    return Win(turn, parts[2].strip() if parts[1] == "win" and len(parts) > 2 else None)
+
+
+HANDLERS: dict[str, Handler] = {
+    "player": _player,
+    "poke": _preview,
+    "move": _move,
+    "switch": _switch,
+    "drag": _switch,
+    "-damage": _damage,
+    "-heal": _damage,
+    "-status": _status,
+    "-curestatus": _status,
+    "-weather": _weather,
+    "-fieldstart": _field,
+    "-fieldend": _field,
+    "-sidestart": _field,
+    "-sideend": _field,
+    "-terastallize": _tera,
+    "faint": _faint,
+    "win": _win,
+    "tie": _win,
+}
+
+
+def log_from_blob(blob: bytes, ext: str) -> str:
+    # Fetched replays are .json (log under one of a few keys), .log or raw .html pages.
+    if ext == ".json":
+        try:
+            payload = json.loads(blob.decode("utf-8", errors="ignore"))
+        except Exception:
+            payload = None
+        if isinstance(payload, dict):
+            for key in ("log", "logdata", "replay", "payload"):
+                value = payload.get(key)
+                if isinstance(value, str):
+                    return value
+    text = blob.decode("utf-8", errors="ignore")
+    if "|init|battle" in text:
+        text = text[text.index("|init|battle") :]
+    return text
+
+
+class ProtocolParser:
+    # `types` limits parsing to those protocol message types (e.g. {"move", "switch"});
+    # |turn| is always tracked so events keep their turn number.
+
+    def __init__(self, types: Collection[str] | None = None):
+        wanted = HANDLERS.keys() if types is None else types
+        self._handlers = {kind: HANDLERS[kind] for kind in wanted if kind in HANDLERS}
+        # str.startswith with a tuple rejects unwanted lines in C before any slicing.
+        self._prefixes = tuple(f"|{kind}" for kind in ("turn", *self._handlers))
+
+    def events(self, lines: Iterable[str]) -> Iterator[Event]:
+        handlers, prefixes = self._handlers, self._prefixes
+        turn: int | None = None
+        for line in lines:
+            if not line.startswith(prefixes):
+                continue
+            parts = line.rstrip("\r\n").split("|")
+            kind = parts[1]
+            if kind == "turn":
+                try:
+                    turn = int(parts[2])
+                except ValueError:
+                    continue
+                yield Turn(turn)
+                continue
+            handler = handlers.get(kind)
+            if handler is None:
+                continue
+            event = handler(parts, turn)
+            if event is not None:
+                yield event
+
+    def events_from_text(self, text: str) -> Iterator[Event]:
+        return self.events(text.splitlines())
+
+
+def iter_events(lines: Iterable[str], types: Collection[str] | None = None) -> Iterator[Event]:
+    return ProtocolParser(types).events(lines)
@@ -0,0 +1,150 @@
+# Check teams against the local Showdown server's validator before any battle is started.
+#
+# A team the server rejects never produces a battle; the pool only notices when its start
+# timeout expires, so each bad team costs a full timeout per attempt. Here every team is run
+# once through `pokemon-showdown validate-team <format>` (reads the team on stdin, exits 0 if
+# legal, otherwise prints the reasons and exits 1). Verdicts are journaled per (format, packed
+# team hash) to an append-only JSONL cache, a torn last line is ignored, and the last line
+# for a key wins. Later runs and worker processes therefore only validate teams they have
+# not seen. A validator that cannot be started is an error rather than a verdict, so nothing
+# is cached for it. A check that times out rejects the team for this run only ("validator
+# timed out"); it is not cached, so the next run validates that team again.
+
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import orjson
+
+
+def team_hash(packed: str) -> str:
+    return hashlib.blake2b(packed.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def showdown_validate_command(showdown_dir: Path) -> list[str]:
+    # The CLI entry point of a pokemon-showdown checkout (the same one the local server runs).
+    return ["node", str(showdown_dir / "pokemon-showdown"), "validate-team"]
+
+
+def run_validator(
+    command: list[str], packed: str, battle_format: str, timeout: float
+) -> list[str] | None:
+    # Returns the server's reasons for rejecting the team; an empty list means it is legal and
+    # None that the validator did not answer within `timeout` seconds.
+    try:
+        result = subprocess.run(
+            [*command, battle_format],
+            input=packed,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode == 0:
+        return []
+    output = result.stderr.strip() or result.stdout.strip()
+    problems = [line.strip() for line in output.splitlines() if line.strip()]
+    return problems or [f"validator exited with code {result.returncode}"]
+
+
+class TeamValidator:
+    def __init__(
+        self,
+        command: list[str],
+        cache_path: Path | None = None,
+        workers: int = 4,
+        timeout: float = 60.0,
+    ):
+        self.command = command
+        self.cache_path = cache_path
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._verdicts: dict[tuple[str, str], list[str]] = {}
+        self.validated = 0  # teams actually sent to the validator by this process
+        if cache_path is not None and cache_path.exists():
+            self._load(cache_path)
+
+    def _load(self, path: Path) -> None:
+        with path.open("rb") as handle:
+            for line in handle:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("problems"), list):
+                    self._verdicts[(entry["format"], entry["hash"])] = entry["problems"]
+
+    def _append(self, entries: list[dict[str, object]]) -> None:
+        if self.cache_path is None or not entries:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.cache_path.open("ab") as handle:
+            if handle.tell() and not self._ends_with_newline(self.cache_path):
+                handle.write(b"\n")  # start after a torn last line instead of extending it
+            handle.write(b"".join(orjson.dumps(entry) + b"\n" for entry in entries))
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def problems(self, packed: str, battle_format: str) -> list[str] | None:
+        # Cached verdict for one team, or None if it has not been validated yet.
+        return self._verdicts.get((battle_format, team_hash(packed)))
+
+    def check(self, teams: Mapping[str, str], battle_format: str) -> dict[str, list[str]]:
+        # {label: packed team} -> {label: reasons} for the rejected ones. Uncached teams are
+        # validated in parallel (each check is a separate node process). Teams whose check
+        # timed out are rejected with "validator timed out" but not cached.
+        pending = {
+            team_hash(packed): packed
+            for packed in teams.values()
+            if (battle_format, team_hash(packed)) not in self._verdicts
+        }
+        timed_out: set[str] = set()
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                verdicts = list(
+                    pool.map(
+                        lambda packed: run_validator(
+                            self.command, packed, battle_format, self.timeout
+                        ),
+                        pending.values(),
+                    )
+                )
+            now = time.time_ns()
+            entries: list[dict[str, object]] = []
+            for digest, problems in zip(pending, verdicts, strict=True):
+                if problems is None:
+                    timed_out.add(digest)
+                    continue
+                self._verdicts[(battle_format, digest)] = problems
+                entries.append(
+                    {
+                        "format": battle_format,
+                        "hash": digest,
+                        "problems": problems,
+                        "checked_ns": now,
+                    }
+                )
+            self.validated += len(entries)
+            self._append(entries)
+        rejected: dict[str, list[str]] = {}
+        for label, packed in teams.items():
+            digest = team_hash(packed)
+            if digest in timed_out:
+                rejected[label] = [f"validator timed out after {self.timeout:g}s"]
+                continue
+            problems = self._verdicts[(battle_format, digest)]
+            if problems:
+                rejected[label] = problems
+        return rejected
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import random
+import time
 from collections.abc import Iterable
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
+import orjson
 from poke_env.teambuilder import ConstantTeambuilder, Teambuilder, TeambuilderPokemon
 
 
@@ -23,24 +29,188 @@ def load_showdown_teams_from_dir(directory: Path) -> list[str]:
     return teams
 
 
+def pack_team(raw: str) -> str | None:
+    # Showdown export or packed text -> packed team, or None if it does not parse.
+    if not raw or not raw.strip():
+        return None
+    try:
+        mons: list[TeambuilderPokemon] = (
+            Teambuilder.parse_packed_team(raw)
+            if "|" in raw
+            else Teambuilder.parse_showdown_team(raw.strip())
+        )
+    except Exception:
+        return None
+    return Teambuilder.join_team(mons) if mons else None
+
+
 class RotatingTeambuilder(Teambuilder):
     def __init__(self, teams: Iterable[str]):
-        parsed: list[list[TeambuilderPokemon]] = []
-        for raw in teams:
-            if not raw or not raw.strip():
+        packed = [team for team in map(pack_team, teams) if team is not None]
+        if not packed:
+            raise ValueError("RotatingTeambuilder needs at least one valid team text")
+        self._teams = packed
+
+    def yield_team(self) -> str:
+        return random.choice(self._teams)
+
+
+@dataclass
+class _TeamFile:
+    size: int
+    mtime_ns: int
+    hash: str
+
+
+class TeamPool:
+    # Packed teams for every team file in a directory, parsed once per distinct file content.
+    #
+    # refresh() stats the directory and only reads files whose size/mtime moved; a file is
+    # re-parsed only if its hash is new, so renames and touched-but-identical files are free.
+    # With `cache_path`, the stat/hash per file and the packed team per hash persist between
+    # runs as one JSON file, so worker processes that open the same cache start without
+    # parsing anything. Players share the pool through builder(), whose yield_team draws from
+    # the pool's current teams; with `refresh_interval` > 0 it also picks up edited files.
+
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str = "*.txt",
+        cache_path: Path | None = None,
+        refresh_interval: float = 0.0,
+    ):
+        self.directory = directory
+        self.pattern = pattern
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self._files: dict[str, _TeamFile] = {}
+        self._packed: dict[str, str | None] = {}  # content hash -> packed team (None: invalid)
+        self._refreshed = 0.0
+        self.generation = 0  # bumped whenever the set of teams may have changed
+        self.parsed = 0  # teams actually parsed by this process, for logging
+        if cache_path is not None:
+            self._load_cache(cache_path)
+        self.refresh()
+
+    def _load_cache(self, path: Path) -> None:
+        try:
+            payload = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return
+        if not isinstance(payload, dict):
+            return
+        packed = payload.get("packed", {})
+        files = payload.get("files", {})
+        self._packed = {key: value for key, value in packed.items() if isinstance(key, str)}
+        for name, entry in files.items():
+            try:
+                self._files[name] = _TeamFile(entry["size"], entry["mtime_ns"], entry["hash"])
+            except (KeyError, TypeError):
+                continue
+
+    def _save_cache(self, path: Path) -> None:
+        hashes = {entry.hash for entry in self._files.values()}
+        payload: dict[str, Any] = {
+            "files": {name: vars(entry) for name, entry in sorted(self._files.items())},
+            "packed": {key: value for key, value in self._packed.items() if key in hashes},
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(payload))
+        os.replace(tmp, path)
+
+    def refresh(self) -> int:
+        # Returns how many files were added, changed or removed since the last refresh.
+        self._refreshed = time.monotonic()
+        seen: dict[str, _TeamFile] = {}
+        changed = 0
+        for path in sorted(self.directory.glob(self.pattern)):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            known = self._files.get(path.name)
+            unchanged = known is not None and (known.size, known.mtime_ns) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+            if known is not None and unchanged and known.hash in self._packed:
+                seen[path.name] = known
                 continue
             try:
-                mons = self.parse_packed_team(raw) if "|" in raw else self.parse_showdown_team(raw)
-            except Exception:
+                blob = path.read_bytes()
+            except OSError:
                 continue
-            if mons:
-                parsed.append(mons)
-        if not parsed:
-            raise ValueError("RotatingTeambuilder needs at least one valid team text")
-        self._teams = [self.join_team(mons) for mons in parsed]
+            digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+            if digest not in self._packed:
+                self._packed[digest] = pack_team(blob.decode("utf-8", errors="ignore"))
+                self.parsed += 1
+            seen[path.name] = _TeamFile(stat.st_size, stat.st_mtime_ns, digest)
+            changed += known is None or known.hash != digest
+        changed += len(self._files.keys() - seen.keys())
+        dirty = changed or seen != self._files
+        if changed:
+            self.generation += 1
+        self._files = seen
+        if dirty and self.cache_path is not None:
+            self._save_cache(self.cache_path)
+        return changed
+
+    def maybe_refresh(self) -> None:
+        if (
+            self.refresh_interval > 0
+            and time.monotonic() - self._refreshed >= self.refresh_interval
+        ):
+            self.refresh()
+
+    def teams(self, exclude: Iterable[str] = ()) -> list[str]:
+        # Valid packed teams, one per distinct file content, in file name order.
+        skip = {pack_team(team) or team for team in exclude}
+        packed: dict[str, None] = {}
+        for entry in self._files.values():
+            team = self._packed.get(entry.hash)
+            if team is not None and team not in skip:
+                packed.setdefault(team, None)
+        return list(packed)
+
+    def team_files(self) -> dict[str, str]:
+        # File name -> packed team, for every file that parsed.
+        files = {name: self._packed.get(entry.hash) for name, entry in self._files.items()}
+        return {name: team for name, team in files.items() if team is not None}
+
+    def __len__(self) -> int:
+        return len(self.teams())
+
+    def builder(self, exclude: Iterable[str] = (), fallback: str | None = None) -> Teambuilder:
+        return PoolTeambuilder(self, exclude, fallback)
+
+
+class PoolTeambuilder(Teambuilder):
+    # Draws from a shared TeamPool; `exclude` holds teams (any text form) never to hand out,
+    # and `fallback` is used if that leaves the pool empty.
+
+    def __init__(self, pool: TeamPool, exclude: Iterable[str] = (), fallback: str | None = None):
+        self.pool = pool
+        self.exclude = [team for team in map(pack_team, exclude) if team is not None]
+        self.fallback = pack_team(fallback) if fallback else None
+        self._teams: list[str] = []
+        self._generation = -1
+        if not self._current():
+            raise ValueError("PoolTeambuilder needs at least one valid team text")
+
+    def _current(self) -> list[str]:
+        self.pool.maybe_refresh()
+        if self.pool.generation != self._generation:
+            self._generation = self.pool.generation
+            teams = self.pool.teams(self.exclude)
+            if not teams and self.fallback is not None:
+                teams = [self.fallback]
+            # A directory emptied mid-run keeps serving the last teams instead of failing.
+            self._teams = teams or self._teams
+        return self._teams
 
     def yield_team(self) -> str:
-        return random.choice(self._teams)
+        return random.choice(self._current())
 
 
 def constant_team_from_text(team_text: str) -> ConstantTeambuilder:
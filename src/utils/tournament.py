@@ -0,0 +1,201 @@
+# Round-robin tournament bookkeeping: per-matchup results, sequential stopping and Elo.
+#
+# Every unordered pair of agents is one matchup. Games are scored from the first agent's side
+# (win 1, tie 0.5) and a matchup stops once the Wilson interval on that score is within
+# +-`precision`, or at `max_games`; it always gets at least `min_games` first. The interval
+# width depends on the games played and only weakly on the win rate, so checking it after
+# every chunk does not bias which result is reported the way stopping on "the interval
+# excludes 0.5" would. Lopsided matchups tighten fastest: at +-0.05 a 90% matchup stops after
+# about 140 games and an even one after about 380. next_matchup hands out the unfinished
+# matchup with the fewest games played or in flight, so several servers spread over the
+# matchups evenly.
+#
+# Elo comes from a Bradley-Terry fit over all results (Hunter's MM iterations, ties as half a
+# win, plus one virtual tie per pair so an agent without wins keeps a finite rating),
+# centred on 1500. Games are journaled to an append-only JSONL file (a torn last line is
+# ignored), so an interrupted evaluation resumes where it stopped.
+
+from __future__ import annotations
+
+import math
+import os
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from itertools import combinations
+from pathlib import Path
+
+import orjson
+
+ELO_CENTER = 1500.0
+
+
+def wilson_interval(score: float, games: int, z: float = 1.96) -> tuple[float, float]:
+    # Interval on the win rate from `score` (wins + ties / 2) over `games`.
+    if games <= 0:
+        return 0.0, 1.0
+    rate = score / games
+    denom = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denom
+    half = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+@dataclass
+class Matchup:
+    first: str
+    second: str
+    wins: int = 0  # games won by `first`
+    losses: int = 0
+    ties: int = 0
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    @property
+    def score(self) -> float:
+        return self.wins + 0.5 * self.ties
+
+    @property
+    def win_rate(self) -> float:
+        return self.score / self.games if self.games else 0.5
+
+    def interval(self, z: float = 1.96) -> tuple[float, float]:
+        return wilson_interval(self.score, self.games, z)
+
+    def record(self, first_won: bool | None) -> None:
+        if first_won is None:
+            self.ties += 1
+        elif first_won:
+            self.wins += 1
+        else:
+            self.losses += 1
+
+
+class Tournament:
+    def __init__(
+        self,
+        agents: Sequence[str],
+        max_games: int = 1000,
+        min_games: int = 40,
+        precision: float = 0.05,
+        z: float = 1.96,
+        journal_path: Path | None = None,
+    ):
+        if len(set(agents)) != len(agents) or len(agents) < 2:
+            raise ValueError("A tournament needs at least two distinct agents")
+        self.agents = list(agents)
+        self.max_games = max_games
+        self.min_games = min(min_games, max_games)
+        self.precision = precision
+        self.z = z
+        self.journal_path = journal_path
+        self.matchups = {(a, b): Matchup(a, b) for a, b in combinations(self.agents, 2)}
+        self.in_flight: Counter[tuple[str, str]] = Counter()
+        if journal_path is not None and journal_path.exists():
+            self._load(journal_path)
+
+    def _load(self, path: Path) -> None:
+        with path.open("rb") as handle:
+            for line in handle:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and "first" in entry and "second" in entry:
+                    self._record((entry["first"], entry["second"]), entry.get("first_won"))
+
+    def _record(self, pair: tuple[str, str], first_won: bool | None) -> None:
+        if pair in self.matchups:
+            self.matchups[pair].record(first_won)
+        elif pair[::-1] in self.matchups:
+            self.matchups[pair[::-1]].record(None if first_won is None else not first_won)
+
+    def record(self, first: str, second: str, first_won: bool | None) -> None:
+        self._record((first, second), first_won)
+        if self.journal_path is None:
+            return
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"first": first, "second": second, "first_won": first_won}
+        with self.journal_path.open("ab") as handle:
+            if handle.tell() and not _ends_with_newline(self.journal_path):
+                handle.write(b"\n")  # start after a torn last line instead of extending it
+            handle.write(orjson.dumps(entry) + b"\n")
+
+    def decided(self, pair: tuple[str, str]) -> bool:
+        matchup = self.matchups[pair]
+        if matchup.games >= self.max_games:
+            return True
+        if matchup.games < self.min_games:
+            return False
+        low, high = matchup.interval(self.z)
+        return (high - low) / 2 <= self.precision
+
+    @property
+    def finished(self) -> bool:
+        return all(self.decided(pair) for pair in self.matchups)
+
+    def next_matchup(self, chunk: int) -> tuple[tuple[str, str], int] | None:
+        # The open matchup with the fewest games played or in flight, and how many games to
+        # start for it (at most `chunk`, never past max_games). The caller reports the games
+        # through record() and hands them back with release().
+        open_pairs = [
+            pair
+            for pair, matchup in self.matchups.items()
+            if not self.decided(pair) and matchup.games + self.in_flight[pair] < self.max_games
+        ]
+        if not open_pairs:
+            return None
+        pair = min(open_pairs, key=lambda p: self.matchups[p].games + self.in_flight[p])
+        games = min(chunk, self.max_games - self.matchups[pair].games - self.in_flight[pair])
+        self.in_flight[pair] += games
+        return pair, games
+
+    def release(self, pair: tuple[str, str], games: int) -> None:
+        self.in_flight[pair] -= games
+
+    @property
+    def games(self) -> int:
+        return sum(matchup.games for matchup in self.matchups.values())
+
+    @property
+    def budget(self) -> int:
+        return self.max_games * len(self.matchups)
+
+    def ratings(self, iterations: int = 200) -> dict[str, float]:
+        return elo_ratings(self.matchups.values(), self.agents, iterations)
+
+
+def elo_ratings(
+    matchups: Iterable[Matchup], agents: Sequence[str], iterations: int = 200
+) -> dict[str, float]:
+    # Bradley-Terry strengths by MM iterations, as Elo: 400 * log10(strength) + 1500.
+    score: dict[str, float] = dict.fromkeys(agents, 0.0)
+    played: dict[tuple[str, str], float] = {}
+    for matchup in matchups:
+        if not matchup.games:
+            continue
+        # One virtual tie per pair keeps a winless agent's strength above zero.
+        score[matchup.first] += matchup.score + 0.5
+        score[matchup.second] += matchup.games - matchup.score + 0.5
+        played[(matchup.first, matchup.second)] = matchup.games + 1
+    strength = dict.fromkeys(agents, 1.0)
+    for _ in range(iterations):
+        denom = dict.fromkeys(agents, 0.0)
+        for (a, b), n in played.items():
+            denom[a] += n / (strength[a] + strength[b])
+            denom[b] += n / (strength[a] + strength[b])
+        updated = {
+            agent: score[agent] / denom[agent] if denom[agent] else strength[agent]
+            for agent in agents
+        }
+        mean_log = sum(math.log(value) for value in updated.values()) / len(updated)
+        strength = {agent: value / math.exp(mean_log) for agent, value in updated.items()}
+    return {agent: ELO_CENTER + 400 * math.log10(value) for agent, value in strength.items()}
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as handle:
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
@@ -0,0 +1,136 @@
+# Byte offsets of each |turn|N line in a battle log, so a turn can be read with one seek.
+#
+# offsets[n] is where the `|turn|n` line starts and offsets[0] is 0 (everything before turn 1),
+# so turn n spans offsets[n]..offsets[n + 1] and the last turn runs to the end of the log.
+# `covered` is how many bytes have been scanned; only lines whose newline has arrived are
+# counted, so an index over a log that is still being written is extended from `covered`
+# rather than rebuilt. For a loose log the index lives in a `<name>.turns` sidecar (little-
+# endian uint64: covered, then the offsets); a sidecar that claims more bytes than the log has
+# belongs to a truncated or replaced file and is discarded. The replay archive keeps the
+# offsets in its journal entry instead, measured on the extracted log text.
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+from array import array
+from pathlib import Path
+
+TURN_SUFFIX = ".turns"
+TURN_MARKER = b"\n|turn|"
+
+
+class TurnIndex:
+    def __init__(self, offsets: list[int] | None = None, covered: int = 0):
+        self.offsets = offsets or [0]
+        self.covered = covered
+
+    @property
+    def turns(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def scan(cls, data: bytes) -> TurnIndex:
+        # Index of a finished log held in memory; a last line without a newline still counts.
+        index = cls()
+        index.extend(data if data.endswith(b"\n") else data + b"\n")
+        index.covered = len(data)
+        return index
+
+    def extend(self, data: bytes) -> bool:
+        # `data` continues the log at `self.covered`. Returns whether any turn was added.
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return False
+        added = False
+        # The byte before `covered` is always a newline (or the start of the log), so a turn
+        # line at the very start of `data` is found by pretending one precedes it.
+        view = b"\n" + data[:end]
+        pos = view.find(TURN_MARKER)
+        while pos >= 0:
+            line_end = view.find(b"\n", pos + 1)
+            number = view[pos + len(TURN_MARKER) : line_end].strip()
+            if number.isdigit() and int(number) >= len(self.offsets):
+                # Missing turns point at the next one that exists, so spans stay ordered.
+                gap = int(number) - len(self.offsets) + 1
+                self.offsets.extend([self.covered + pos] * gap)
+                added = True
+            pos = view.find(TURN_MARKER, line_end)
+        self.covered += end
+        return added
+
+    def span(self, first: int, last: int | None = None) -> tuple[int, int | None]:
+        # Byte range of turns first..last inclusive; an end of None means "to the end".
+        first = min(max(first, 0), self.turns)
+        last = first if last is None else max(last, first)
+        end = self.offsets[last + 1] if last + 1 <= self.turns else None
+        return self.offsets[first], end
+
+    def to_bytes(self) -> bytes:
+        packed = array("Q", [self.covered, *self.offsets])
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return packed.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> TurnIndex | None:
+        if len(blob) < 16 or len(blob) % 8:
+            return None
+        packed = array("Q")
+        packed.frombytes(blob)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        covered, *offsets = packed
+        if offsets[0] != 0 or offsets != sorted(offsets) or offsets[-1] > covered:
+            return None
+        return cls(offsets, covered)
+
+
+def sidecar_path(path: Path) -> Path:
+    return path.with_name(path.name + TURN_SUFFIX)
+
+
+def load_turn_index(path: Path, data: bytes | None = None, save: bool = True) -> TurnIndex:
+    # Sidecar index for a loose log, extended over whatever was appended since it was saved.
+    # Pass `data` when the caller already holds the whole file, to skip reading it again.
+    sidecar = sidecar_path(path)
+    size = len(data) if data is not None else path.stat().st_size
+    index = None
+    with contextlib.suppress(OSError):
+        index = TurnIndex.from_bytes(sidecar.read_bytes())
+    if index is None or index.covered > size:
+        index = TurnIndex()
+    if index.covered == size and sidecar.exists():
+        return index
+    if data is not None:
+        tail = data[index.covered :]
+    else:
+        with path.open("rb") as handle:
+            handle.seek(index.covered)
+            tail = handle.read(size - index.covered)
+    scanned = index.covered
+    index.extend(tail)
+    if save and (index.covered != scanned or not sidecar.exists()):
+        # A cache: a read-only replay directory just means rebuilding next time.
+        with contextlib.suppress(OSError):
+            tmp = sidecar.with_name(sidecar.name + ".tmp")
+            tmp.write_bytes(index.to_bytes())
+            os.replace(tmp, sidecar)
+    return index
+
+
+def read_turns(path: Path, first: int, last: int | None = None) -> str:
+    # Text of turns first..last of a loose log (turn 0 is the preamble) via a single seek.
+    index = load_turn_index(path)
+    start, end = index.span(first, last)
+    with path.open("rb") as handle:
+        handle.seek(start)
+        blob = handle.read() if end is None else handle.read(end - start)
+    return blob.decode("utf-8", errors="ignore")
+
+
+def slice_turns(data: bytes, offsets: list[int], first: int, last: int | None = None) -> str:
+    # Same as read_turns for a log already in memory, using stored offsets.
+    start, end = TurnIndex(list(offsets), len(data)).span(first, last)
+    return data[start:end].decode("utf-8", errors="ignore")
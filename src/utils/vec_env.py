@@ -0,0 +1,135 @@
+# Stable-Baselines3 vector env over SelfPlayEnv workers, with a steps/sec counter.
+#
+# make_vec_env starts one SubprocVecEnv worker per EnvSpec with the "spawn" start method
+# (poke-env runs its own event-loop thread, which does not survive a fork). step_async sends
+# all M actions before step_wait gathers the M results, so the battles advance concurrently
+# and the policy gets one (M, obs_dim) batch per step. MaskablePPO fetches masks through
+# env_method("action_masks"), also one round trip to every worker at once. StepRateVecEnv
+# counts environment steps, so throughput can be compared across worker and server counts.
+# With a policy opponent, BatchedOpponentVecEnv collects every env's opponent_inputs() in one
+# env_method round trip, runs one batched forward pass through an InferenceBatcher and sends
+# the opponent pairs along with the learner's actions. PoolOpponentVecEnv does the same with
+# past checkpoints from an OpponentPool: each env plays one sampled checkpoint per battle, envs
+# on the same checkpoint share a forward pass, and finished battles feed the pool's win rates.
+
+from __future__ import annotations
+
+import time
+from functools import partial
+from typing import Any
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecEnv, VecEnvWrapper
+
+from src.utils.inference_batcher import InferenceBatcher
+from src.utils.opponent_pool import Checkpoint, OpponentPool
+from src.utils.selfplay_env import EnvSpec, make_env
+
+
+class StepRateVecEnv(VecEnvWrapper):
+    def __init__(self, venv: VecEnv):
+        super().__init__(venv)
+        self.steps = 0
+        self.episodes = 0
+        self._started = time.perf_counter()
+        self._mark = (self._started, 0)
+
+    def reset(self) -> Any:
+        return self.venv.reset()
+
+    def step_wait(self) -> Any:
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self.steps += self.num_envs
+        self.episodes += int(dones.sum())
+        return obs, rewards, dones, infos
+
+    def steps_per_s(self, since_last: bool = False) -> float:
+        # Overall rate, or the rate since the previous since_last=True call.
+        now = time.perf_counter()
+        start, steps = self._mark if since_last else (self._started, 0)
+        if since_last:
+            self._mark = (now, self.steps)
+        elapsed = now - start
+        return (self.steps - steps) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.steps} env steps, {self.episodes} battles over {self.num_envs} envs "
+            f"({self.steps_per_s():.1f} steps/s)"
+        )
+
+
+class BatchedOpponentVecEnv(VecEnvWrapper):
+    def __init__(self, venv: VecEnv, batcher: InferenceBatcher):
+        super().__init__(venv)
+        self.batcher = batcher
+
+    def reset(self) -> Any:
+        return self.venv.reset()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        inputs = self.venv.env_method("opponent_inputs")
+        obs = np.stack([item[0] for item in inputs])
+        masks = np.stack([item[1] for item in inputs])
+        opponent = self.batcher.infer(obs, masks)
+        self.venv.step_async(np.concatenate([np.asarray(actions), opponent], axis=1))
+
+    def step_wait(self) -> Any:
+        return self.venv.step_wait()
+
+
+class PoolOpponentVecEnv(VecEnvWrapper):
+    def __init__(self, venv: VecEnv, pool: OpponentPool):
+        super().__init__(venv)
+        self.pool = pool
+        # Sampled at each env's first step, so the pool may still be empty when this is built.
+        self.assigned: list[Checkpoint | None] = [None] * self.num_envs
+
+    def reset(self) -> Any:
+        return self.venv.reset()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        inputs = self.venv.env_method("opponent_inputs")
+        obs = np.stack([item[0] for item in inputs])
+        masks = np.stack([item[1] for item in inputs])
+        groups: dict[str, tuple[Checkpoint, list[int]]] = {}
+        for idx, assigned in enumerate(self.assigned):
+            checkpoint = self.assigned[idx] = assigned or self.pool.sample()
+            groups.setdefault(checkpoint.name, (checkpoint, []))[1].append(idx)
+        opponent = np.zeros((self.num_envs, 2), dtype=np.int64)
+        for checkpoint, indices in groups.values():
+            batcher = self.pool.batcher(checkpoint)
+            opponent[indices] = batcher.infer(obs[indices], masks[indices])
+        self.venv.step_async(np.concatenate([np.asarray(actions), opponent], axis=1))
+
+    def step_wait(self) -> Any:
+        obs, rewards, dones, infos = self.venv.step_wait()
+        if dones.any():
+            self.pool.refresh()  # picks up checkpoints saved since the last battle ended
+        for idx in np.flatnonzero(dones):
+            checkpoint, won = self.assigned[idx], infos[idx].get("won")
+            if checkpoint is not None and won is not None:
+                self.pool.record(checkpoint.name, not won)
+            self.assigned[idx] = None
+        return obs, rewards, dones, infos
+
+
+def make_vec_env(
+    specs: list[EnvSpec],
+    subprocess: bool = True,
+    opponent_batcher: InferenceBatcher | None = None,
+    opponent_pool: OpponentPool | None = None,
+) -> StepRateVecEnv:
+    if not specs:
+        raise ValueError("make_vec_env needs at least one EnvSpec")
+    factories = [partial(make_env, spec) for spec in specs]
+    venv: VecEnv
+    if subprocess and len(specs) > 1:
+        venv = SubprocVecEnv(factories, start_method="spawn")
+    else:
+        venv = DummyVecEnv(factories)
+    if opponent_batcher is not None:
+        venv = BatchedOpponentVecEnv(venv, opponent_batcher)
+    elif opponent_pool is not None:
+        venv = PoolOpponentVecEnv(venv, opponent_pool)
+    return StepRateVecEnv(venv)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+from poke_env.battle import DoubleBattle
+
+STATES_PATH = Path(__file__).parent / "data" / "doubles_states.json"
+
+
+def battle_from_state(state: dict) -> DoubleBattle:
+    fmt = state["format"]
+    battle = DoubleBattle(
+        battle_tag=f"battle-{fmt}-{state['name']}",
+        username=state["username"],
+        logger=logging.getLogger("tests"),
+        gen=int(fmt[3]),
+    )
+    for message in state["messages"]:
+        battle.parse_message(message)
+    battle.parse_request(state["request"])
+    return battle
+
+
+@pytest.fixture(scope="session")
+def recorded_states() -> list[dict]:
+    return json.loads(STATES_PATH.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def recorded_battles(recorded_states: list[dict]) -> list[tuple[str, DoubleBattle]]:
+    return [(state["name"], battle_from_state(state)) for state in recorded_states]
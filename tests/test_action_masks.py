@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import numpy as np
+from poke_env.battle import DoubleBattle
+from poke_env.environment.doubles_env import DoublesEnv
+
+from src.utils.action_masks import legal_action_masks, slot_action_mask
+from src.utils.poke_env_utils import act_size_for_format
+
+
+def brute_force_mask(battle: DoubleBattle, slot: int, act_size: int) -> np.ndarray:
+    mask = np.zeros(act_size, dtype=np.bool_)
+    for action_idx in range(act_size):
+        try:
+            DoublesEnv._action_to_order_individual(np.int64(action_idx), battle, False, slot)
+        except Exception:
+            continue
+        mask[action_idx] = True
+    return mask
+
+
+def test_masks_match_brute_force(recorded_states, recorded_battles):
+    formats = {state["name"]: state["format"] for state in recorded_states}
+    for name, battle in recorded_battles:
+        act_size = act_size_for_format(formats[name])
+        masks = legal_action_masks(battle, act_size)
+        assert masks.shape == (2, act_size)
+        assert masks.dtype == np.bool_
+        for slot in (0, 1):
+            expected = brute_force_mask(battle, slot, act_size)
+            np.testing.assert_array_equal(masks[slot], expected, err_msg=f"{name} slot {slot}")
+            np.testing.assert_array_equal(slot_action_mask(battle, slot, act_size), expected)
+
+
+def test_recorded_states_cover_edge_cases(recorded_states, recorded_battles):
+    by_name = dict(recorded_battles)
+    act_size = act_size_for_format("gen9doublesou")
+
+    forced = legal_action_masks(by_name["force_switch_slot_b"], act_size)
+    assert forced[0].sum() == 1 and forced[0][0]
+    assert not forced[1][7:].any() and forced[1][1:7].any()
+
+    trapped = legal_action_masks(by_name["disabled_and_trapped_no_tera"], act_size)
+    assert not trapped[1][1:7].any()
+    assert not trapped[:, 87:].any()
+
+    fresh = legal_action_masks(by_name["turn1_all_moves"], act_size)
+    assert fresh[:, 87:].any()
+    assert not fresh[:, 27:87].any()
+
+
+def test_out_buffer_is_reused(recorded_battles):
+    _, battle = recorded_battles[0]
+    act_size = act_size_for_format("gen9doublesou")
+    out = np.ones((2, act_size), dtype=np.bool_)
+    result = legal_action_masks(battle, act_size, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out[0], brute_force_mask(battle, 0, act_size))
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from src.utils.battle_index import BattleIndex, summarize_log
+from src.utils.replay_archive import ReplayArchive
+
+
+def _log(p1: str, p2: str, lead: str, move: str, turns: int, winner: str) -> str:
+    lines = [
+        "|init|battle",
+        f"|player|p1|{p1}|1",
+        f"|player|p2|{p2}|2",
+        "|poke|p1|Urshifu-*, L50|",
+        f"|switch|p1a: {lead}|{lead}, L50|100/100",
+        "|switch|p2a: Amoonguss|Amoonguss, L50|100/100",
+    ]
+    for turn in range(1, turns + 1):
+        lines += [f"|turn|{turn}", f"|move|p1a: {lead}|{move}|p2a: Amoonguss"]
+    lines.append(f"|win|{winner}")
+    return "\n".join(lines) + "\n"
+
+
+def test_summary_reads_players_team_moves_and_result():
+    summary = summarize_log(_log("Alice", "Bob", "Incineroar", "Fake Out", 3, "Bob"), "x.log")
+    assert summary.players == {"p1": "Alice", "p2": "Bob"}
+    assert summary.team == ["Urshifu", "Incineroar", "Amoonguss"]
+    assert summary.moves == ["Fake Out"]
+    assert (summary.turns, summary.winner) == (3, "Bob")
+
+
+def test_incremental_update_and_filtered_pages(tmp_path: Path):
+    replay_dir = tmp_path / "replays"
+    replay_dir.mkdir()
+    for idx in range(12):
+        lead, move = ("Incineroar", "Fake Out") if idx % 2 else ("Tornadus", "Tailwind")
+        text = _log(f"Alice{idx % 3}", "Bob", lead, move, 2 + idx, "Bob" if idx < 4 else "Alice0")
+        path = replay_dir / f"gen9doublesou-{idx}.log"
+        path.write_text(text, encoding="utf-8")
+        os.utime(path, ns=(idx * 10**9, idx * 10**9))
+    (replay_dir / "notes.txt").write_text("not a log", encoding="utf-8")
+
+    index = BattleIndex(tmp_path / "index.sqlite")
+    assert index.update(replay_dir).added == 12
+
+    rows, total = index.search(move="fake out", page_size=4)
+    assert total == 6 and [row["name"] for row in rows][:2] == [
+        "gen9doublesou-11.log",
+        "gen9doublesou-9.log",
+    ]
+    assert (
+        index.search(move="fake out", page=1, page_size=4)[0][-1]["name"] == "gen9doublesou-1.log"
+    )
+    assert index.search(player="alice2", team=["incineroar"], min_turns=8)[1] == 1
+    assert index.search(winner="bob", format="gen9doublesou")[1] == 4
+    assert index.search(team=["Urshifu"], max_turns=3)[1] == 2
+    assert index.search(format="gen8vgc2022")[1] == 0
+
+    (replay_dir / "gen9doublesou-0.log").unlink()
+    changed = replay_dir / "gen9doublesou-1.log"
+    changed.write_text(_log("Carol", "Bob", "Incineroar", "Fake Out", 30, "Carol"), "utf-8")
+    archive = ReplayArchive(tmp_path / "archive")
+    archive.add(
+        "gen9doublesou-99", _log("Dan", "Eve", "Ogerpon", "Ivy Cudgel", 5, "Eve").encode(), ".log"
+    )
+    stats = index.update(replay_dir, archive=archive)
+    assert (stats.added, stats.updated, stats.removed, stats.unchanged) == (1, 1, 1, 10)
+    assert index.search(player="carol")[0][0]["turns"] == 30
+    assert index.search(move="Ivy Cudgel")[0][0]["name"] == "archive:gen9doublesou-99"
+    assert index.search()[1] == 12
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.utils.battle_pool import BattlePool
+
+
+class FakeBattle:
+    def __init__(self, tag: str):
+        self.battle_tag = tag
+        self.turn = 0
+        self.finished = False
+        self.current_observation = SimpleNamespace(events=[])
+
+
+async def _chatter(battle: FakeBattle, condition: asyncio.Condition, seconds: float) -> None:
+    # A healthy battle: a protocol message every 50 ms, a new turn every 200 ms.
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        await asyncio.sleep(0.05)
+        battle.current_observation.events.append(["", "move"])
+        if len(battle.current_observation.events) % 4 == 0:
+            battle.turn += 1
+            battle.current_observation.events = []
+    async with condition:
+        battle.finished = True
+        condition.notify_all()
+
+
+def test_watchdog_forfeits_stalls_and_overruns_but_lets_slow_games_finish():
+    forfeited: list[str] = []
+
+    async def scenario() -> tuple[BattlePool, dict[str, float]]:
+        async def send_message(message: str, room: str = "") -> None:
+            forfeited.append(room)
+
+        condition = asyncio.Condition()
+        player = SimpleNamespace(
+            _battle_end_condition=condition, ps_client=SimpleNamespace(send_message=send_message)
+        )
+        pool = BattlePool(
+            player,  # type: ignore[arg-type]
+            {"random": player},  # type: ignore[dict-item]
+            stall_timeout=0.3,
+            battle_timeout=1.2,
+            watch_interval=0.05,
+        )
+        slots = asyncio.Semaphore(3)
+        battles = {tag: FakeBattle(tag) for tag in ("slow", "stalled", "endless")}
+        chatter = [
+            asyncio.create_task(_chatter(battles["slow"], condition, 0.8)),
+            asyncio.create_task(_chatter(battles["endless"], condition, 5.0)),
+        ]
+        freed: dict[str, float] = {}
+        started = time.monotonic()
+
+        async def watch(tag: str) -> None:
+            await slots.acquire()
+            await pool._finish_battle("random", battles[tag], slots, None)  # type: ignore[arg-type]
+            freed[tag] = time.monotonic() - started
+
+        await asyncio.gather(*(watch(tag) for tag in battles))
+        for task in chatter:
+            task.cancel()
+        return pool, freed
+
+    pool, freed = asyncio.run(scenario())
+    stats = pool.stats
+    assert (stats.finished, stats.stalls, stats.battle_timeouts, stats.forfeits) == (1, 1, 1, 2)
+    assert sorted(forfeited) == ["endless", "stalled"]
+    assert freed["stalled"] < 0.6 < freed["slow"] < 1.1 < freed["endless"] < 1.6
+    assert "stalls=1 battle timeouts=1 forfeits=2" in stats.summary()
+
+
+class FakeServer:
+    # Just enough of Showdown for the pool: a challenge reaches the opponent a moment after it
+    # is sent and is announced twice (as |pm| and |updatechallenges|), accepting it starts a
+    # battle that ends after `duration`, and a player named "rejected" has a team the server
+    # refuses.
+    def __init__(self, duration: float):
+        self.duration = duration
+        self.pending: set[tuple[str, str]] = set()
+        self.players: dict[str, SimpleNamespace] = {}
+        self.messages: list[str] = []
+        self.stale_accepts = 0
+        self.live = self.peak = 0
+
+    def player(self, name: str) -> SimpleNamespace:
+        player = SimpleNamespace(
+            username=name,
+            format="gen9doublesou",
+            next_team=None,
+            battles={},
+            _battle_semaphore=asyncio.Semaphore(0),
+            _battle_end_condition=asyncio.Condition(),
+            _challenge_queue=asyncio.Queue(),
+        )
+        logged_in = asyncio.Event()
+        logged_in.set()
+
+        async def deliver(opponent: str) -> None:
+            await asyncio.sleep(0.01)  # the round trip to the server
+            self.pending.add((name, opponent))
+            for _ in range(2):
+                await self.players[opponent]._challenge_queue.put(name)
+
+        async def challenge(opponent: str, battle_format: str, team: object) -> None:
+            asyncio.get_running_loop().create_task(deliver(opponent))
+
+        async def accept_challenge(challenger: str, team: object) -> None:
+            if (challenger, name) not in self.pending:
+                self.stale_accepts += 1
+                return
+            self.pending.discard((challenger, name))
+            if name != "rejected":
+                asyncio.get_running_loop().create_task(self._battle(challenger, name))
+
+        async def send_message(message: str, room: str = "") -> None:
+            self.messages.append(message)
+
+        player.ps_client = SimpleNamespace(
+            logged_in=logged_in,
+            challenge=challenge,
+            accept_challenge=accept_challenge,
+            send_message=send_message,
+        )
+        self.players[name] = player
+        return player
+
+    async def _battle(self, first: str, second: str) -> None:
+        battle = FakeBattle(f"battle-gen9doublesou-{len(self.players[first].battles)}")
+        for name in (first, second):
+            self.players[name].battles[battle.battle_tag] = battle
+            self.players[name]._battle_semaphore.release()
+        self.live += 1
+        self.peak = max(self.peak, self.live)
+        await asyncio.sleep(self.duration)
+        self.live -= 1
+        condition = self.players[first]._battle_end_condition
+        async with condition:
+            battle.finished = True
+            condition.notify_all()
+
+
+def test_pool_keeps_slots_full_and_cancels_challenges_that_never_start():
+    async def scenario() -> tuple[FakeServer, BattlePool, BattlePool, float, list[str]]:
+        server = FakeServer(duration=0.1)
+        player = server.player("agent")
+        pool = BattlePool(
+            player,  # type: ignore[arg-type]
+            {"simple": server.player("simple")},  # type: ignore[dict-item]
+            concurrency=2,
+            start_timeout=0.5,
+        )
+        finished: list[str] = []
+        started = time.monotonic()
+        await pool._run(5, lambda kind, battle: finished.append(battle.battle_tag))
+        elapsed = time.monotonic() - started
+
+        rejecting = BattlePool(
+            player,  # type: ignore[arg-type]
+            {"rejected": server.player("rejected")},  # type: ignore[dict-item]
+            start_timeout=0.2,
+        )
+        await rejecting._run(1, None)
+        return server, pool, rejecting, elapsed, finished
+
+    server, pool, rejecting, elapsed, finished = asyncio.run(scenario())
+    # Two battles in flight at a time and each finished one frees its slot at once: five
+    # 0.1 s battles take about three rounds, not five.
+    assert server.peak == 2 and len(set(finished)) == 5
+    assert (pool.stats.started, pool.stats.finished, pool.stats.start_timeouts) == (5, 5, 0)
+    assert elapsed < 0.45
+    # The duplicate announcement of each challenge was drained rather than accepted later.
+    assert server.stale_accepts == 0
+    assert (rejecting.stats.started, rejecting.stats.start_timeouts) == (0, 1)
+    assert server.messages == ["/cancelchallenge rejected"]
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from src.utils.dataset_merge import merge_jsonl_shards, shard_path
+
+
+def _write_shard(path: Path, records: list[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def test_merge_dedupes_within_shard_and_keeps_tags_unique(tmp_path: Path):
+    out = tmp_path / "imitation.jsonl"
+    row = {"battle_tag": "battle-gen9doublesou-1", "turn": 1, "side": "p1", "action": [7, 8]}
+    later = {**row, "turn": 2}
+    _write_shard(shard_path(out, 0), [row, later, row])
+    _write_shard(shard_path(out, 1), [row])
+
+    manifest = merge_jsonl_shards([shard_path(out, 0), shard_path(out, 1)], out)
+
+    merged = [json.loads(line) for line in out.read_text().splitlines()]
+    assert len(merged) == 3
+    assert {r["battle_tag"] for r in merged} == {
+        "battle-gen9doublesou-1-shard-000",
+        "battle-gen9doublesou-1-shard-001",
+    }
+    assert [s["records"] for s in manifest["shards"]] == [2, 1]
+    assert [s["duplicates"] for s in manifest["shards"]] == [1, 0]
+    assert [s["battles"] for s in manifest["shards"]] == [1, 1]
+    assert json.loads((tmp_path / "imitation.manifest.json").read_text())["records"] == 3
+
+
+def test_merge_appends_and_separates_reused_tags(tmp_path: Path):
+    out = tmp_path / "imitation.jsonl"
+    earlier = {"battle_tag": "battle-gen9doublesou-9", "turn": 4, "side": "p1", "action": [1, 2]}
+    out.write_text(json.dumps(earlier) + "\n", encoding="utf-8")
+    first_run = [
+        {"battle_tag": "battle-gen9doublesou-1", "turn": turn, "side": "p1", "action": [7, 8]}
+        for turn in (1, 2, 3)
+    ]
+    # A later run against a restarted server numbers its battles from 1 again.
+    second_run = [{**row, "action": [3, 3]} for row in first_run[:2]]
+    _write_shard(shard_path(out, 0), first_run + second_run)
+
+    manifest = merge_jsonl_shards([shard_path(out, 0)], out)
+    assert manifest["existing"] == 1 and manifest["records"] == 5
+    assert manifest["shards"][0]["battles"] == 2
+    merged = [json.loads(line) for line in out.read_text().splitlines()]
+    assert merged[0] == earlier
+    assert [r["battle_tag"] for r in merged[1:]] == ["battle-gen9doublesou-1-shard-000"] * 3 + [
+        "battle-gen9doublesou-1-shard-000-r1"
+    ] * 2
+
+    again = merge_jsonl_shards([shard_path(out, 0)], out)
+    assert again["records"] == 0 and again["duplicates"] == 5
+    assert len(out.read_text().splitlines()) == 6
+
+
+def test_forced_switch_on_the_same_turn_is_kept(tmp_path: Path):
+    out = tmp_path / "imitation.jsonl"
+    tag = "battle-gen9doublesou-1"
+    rows = [
+        {"battle_tag": tag, "turn": 1, "side": "p1", "decision": 0, "action": [7, 8]},
+        {"battle_tag": tag, "turn": 2, "side": "p1", "decision": 1, "action": [7, 8]},
+        # A faint at the end of turn 2: the replacement is requested before |turn|3.
+        {"battle_tag": tag, "turn": 2, "side": "p1", "decision": 2, "action": [1, 0]},
+        {"battle_tag": tag, "turn": 3, "side": "p1", "decision": 3, "action": [7, 8]},
+    ]
+    _write_shard(shard_path(out, 0), [*rows, rows[2]])
+
+    manifest = merge_jsonl_shards([shard_path(out, 0)], out)
+    assert (manifest["records"], manifest["duplicates"], manifest["battles"]) == (4, 1, 1)
+    merged = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [(r["turn"], r["action"]) for r in merged] == [
+        (1, [7, 8]),
+        (2, [7, 8]),
+        (2, [1, 0]),
+        (3, [7, 8]),
+    ]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from src.utils.fetch_index import JOURNAL_NAME, FetchIndex
+
+
+def test_journal_survives_torn_writes_and_compacts(tmp_path: Path):
+    index = FetchIndex(tmp_path)
+    index.record("gen9doublesou-1", tmp_path / "gen9doublesou-1.log", ".log")
+    index.record("gen9doublesou-2", tmp_path / "gen9doublesou-2.html", ".html")
+    index.record("gen9doublesou-1", tmp_path / "gen9doublesou-1.json", ".json")
+    index.close()
+    with (tmp_path / JOURNAL_NAME).open("ab") as handle:
+        handle.write(b'{"id": "gen9doublesou-3", "pa')  # crash mid-line
+
+    index = FetchIndex(tmp_path)
+    assert "gen9doublesou-1" in index and "gen9doublesou-3" not in index
+    assert index.variants("gen9doublesou-1") == [".json", ".log", ""]
+    assert index.variants("gen9doublesou-2") == ["", ".json", ".log"]
+    assert index.variants("gen9doublesou-9") == [".json", ".log", ""]
+    index.record("gen9doublesou-3", tmp_path / "gen9doublesou-3.log", ".log")
+    assert index.redundant_lines == 1
+    index.compact()
+    index.close()
+
+    lines = (tmp_path / JOURNAL_NAME).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 3
+    reopened = FetchIndex(tmp_path)
+    assert sorted(reopened) == ["gen9doublesou-1", "gen9doublesou-2", "gen9doublesou-3"]
+    entry = reopened.get("gen9doublesou-1")
+    assert entry is not None and entry["ext"] == ".json"
+
+
+def test_imports_legacy_index_json(tmp_path: Path):
+    legacy = {"gen9doublesou-5": {"path": "x/gen9doublesou-5.log", "ext": ".log", "format": "g"}}
+    (tmp_path / "index.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    index = FetchIndex(tmp_path)
+    index.close()
+    assert "gen9doublesou-5" in FetchIndex(tmp_path)
+    assert (tmp_path / JOURNAL_NAME).read_text(encoding="utf-8").count("\n") == 1
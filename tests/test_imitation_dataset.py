@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from src.utils.imitation_dataset import ImitationStream, make_imitation_loader
+from src.utils.imitation_shards import convert_jsonl, iter_jsonl_records
+
+
+def _write_jsonl(path: Path, n: int, act_size: int = 107) -> None:
+    rng = np.random.default_rng(3)
+    lines = []
+    for idx in range(n):
+        record = {
+            "battle_tag": f"battle-{idx // 5}",
+            "turn": idx % 5 + 1,
+            "obs_v0": [float(idx)] + rng.random(7).astype(np.float32).tolist(),
+            "action": [idx % act_size, -2],
+            "mask": (rng.random((2, act_size)) < 0.3).astype(int).tolist(),
+        }
+        lines.append(json.dumps(record) + "\n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def _row_ids(batches) -> list[int]:
+    return [int(v) for batch in batches for v in batch["obs"][:, 0]]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_every_row_streams_once_across_units_and_workers(tmp_path: Path, workers: int):
+    jsonl = tmp_path / "a.jsonl"
+    _write_jsonl(jsonl, 40)
+    shard = tmp_path / "b.shard"
+    _write_jsonl(tmp_path / "b.jsonl", 30)
+    convert_jsonl(iter_jsonl_records(tmp_path / "b.jsonl"), shard, chunk_rows=8)
+
+    loader = make_imitation_loader(
+        [jsonl, shard],
+        batch_size=16,
+        shuffle_buffer=8,
+        num_workers=workers,
+        prefetch_factor=2,
+        unit_bytes=1500,
+        unit_rows=7,
+    )
+    batches = list(loader)
+    ids = _row_ids(batches)
+    assert sorted(ids) == sorted(list(range(40)) + list(range(30)))
+    assert ids != sorted(ids)
+    first = batches[0]
+    assert first["obs"].dtype == torch.float32 and first["action"].dtype == torch.int64
+    assert first["mask"].dtype == torch.bool and first["mask"].shape[1:] == (2, 107)
+
+
+def test_shuffle_is_seeded_per_epoch(tmp_path: Path):
+    jsonl = tmp_path / "a.jsonl"
+    _write_jsonl(jsonl, 50)
+    dataset = ImitationStream([jsonl], batch_size=50, shuffle_buffer=16, seed=1, unit_bytes=2000)
+
+    first = _row_ids(dataset)
+    assert _row_ids(dataset) == first
+    dataset.set_epoch(1)
+    assert sorted(_row_ids(dataset)) == sorted(first) and _row_ids(dataset) != first
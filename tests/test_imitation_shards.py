@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.imitation_dataset import ImitationStream
+from src.utils.imitation_shards import (
+    ShardRecorder,
+    ShardWriter,
+    convert_jsonl,
+    iter_jsonl_records,
+    open_shard,
+)
+
+
+def _records(n: int, act_size: int = 107) -> list[dict]:
+    rng = np.random.default_rng(7)
+    return [
+        {
+            "battle_tag": f"battle-gen9doublesou-{idx // 4}",
+            "turn": idx % 4 + 1,
+            "teacher": "SimpleHeuristicsPlayer",
+            "side": ("p1", "p2")[idx % 2],
+            "obs_v0": rng.random(100).astype(np.float32).tolist(),
+            "action": [int(rng.integers(0, act_size)), -2],
+            "mask": (rng.random((2, act_size)) < 0.2).astype(int).tolist(),
+        }
+        for idx in range(n)
+    ]
+
+
+def test_jsonl_round_trip_through_shard(tmp_path: Path):
+    records = _records(11)
+    src = tmp_path / "imitation.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+    assert convert_jsonl(iter_jsonl_records(src), tmp_path / "imitation.shard", chunk_rows=4) == 11
+    shard = open_shard(tmp_path / "imitation.shard")
+
+    assert isinstance(shard.obs, np.memmap) and shard.obs.dtype == np.float32
+    assert shard.action.dtype == np.int16 and shard.mask.dtype == np.uint8
+    np.testing.assert_array_equal(shard.obs, np.array([r["obs_v0"] for r in records], np.float32))
+    np.testing.assert_array_equal(shard.action, [r["action"] for r in records])
+    np.testing.assert_array_equal(shard.masks(), np.array([r["mask"] for r in records], bool))
+    assert [shard.battle_tag(i) for i in range(11)] == [r["battle_tag"] for r in records]
+    assert shard.turn.tolist() == [r["turn"] for r in records]
+    assert shard.teacher_name(3) == "SimpleHeuristicsPlayer"
+    assert [shard.side_name(i) for i in range(11)] == [r["side"] for r in records]
+
+
+def test_recorder_appends_and_partial_shard_is_readable(tmp_path: Path):
+    path = tmp_path / "live.shard"
+    records = _records(6)
+    recorder = ShardRecorder(path, chunk_rows=4)
+    for record in records[:5]:
+        recorder.write(record)
+    assert len(open_shard(path)) == 4
+    recorder.close()
+    assert len(open_shard(path)) == 5
+
+    writer = ShardWriter(path)
+    writer.append(
+        records[5]["obs_v0"], records[5]["action"], records[5]["mask"], "battle-new", 9, "t"
+    )
+    writer.close()
+    shard = open_shard(path)
+    assert len(shard) == 6
+    assert shard.battle_tag(5) == "battle-new" and shard.teacher_name(5) == "t"
+    np.testing.assert_array_equal(shard.obs[:5], [r["obs_v0"] for r in records[:5]])
+
+
+def test_flush_journals_only_new_names(tmp_path: Path):
+    path = tmp_path / "journal.shard"
+    records = _records(12)
+    recorder = ShardRecorder(path, chunk_rows=4)
+    for record in records:
+        recorder.write(record)
+    # Three chunks over three battles: each tag is journaled once, meta.json carries no names.
+    lines = (path / "battle_tags.jsonl").read_text(encoding="utf-8").splitlines()
+    assert lines == [json.dumps(f"battle-gen9doublesou-{idx}") for idx in range(3)]
+    assert "battle_tags" not in json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    assert len(open_shard(path)) == 12  # read from the column headers before close()
+    recorder.close()
+    assert json.loads((path / "meta.json").read_text(encoding="utf-8"))["rows"] == 12
+
+
+def test_writer_upgrades_schema_1_shard(tmp_path: Path):
+    path = tmp_path / "old.shard"
+    records = _records(5)
+    convert_jsonl(records[:4], path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    tags = (path / "battle_tags.jsonl").read_text(encoding="utf-8").splitlines()
+    meta.update(
+        schema_version=1,
+        battle_tags=[json.loads(tag) for tag in tags],
+        teachers=["SimpleHeuristicsPlayer"],
+    )
+    (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    for name in ("battle_tags.jsonl", "teachers.jsonl", "side.npy"):
+        (path / name).unlink()
+    assert open_shard(path).side_name(0) is None
+
+    convert_jsonl(records[4:], path)
+    shard = open_shard(path)
+    assert shard.meta["schema_version"] == 2 and len(shard) == 5
+    assert [shard.battle_tag(i) for i in range(5)] == [r["battle_tag"] for r in records]
+    assert [shard.side_name(i) for i in range(5)] == [None] * 4 + ["p1"]
+
+
+def test_a_shard_without_rows_opens_empty(tmp_path: Path):
+    path = tmp_path / "idle.shard"
+    ShardRecorder(path).close()  # a worker that recorded nothing
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["rows"] == 0 and meta["obs_dim"] is None
+    shard = open_shard(path)
+    assert len(shard) == 0 and shard.battle_tags == []
+
+    (tmp_path / "crashed.shard").mkdir()  # died before the writer got going
+    assert len(open_shard(tmp_path / "crashed.shard")) == 0
+    assert ImitationStream([path, tmp_path / "crashed.shard"]).units == []
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import torch
+from poke_env.player import BattleOrder
+
+from src.utils.inference_batcher import InferenceBatcher, torch_policy
+from src.utils.obs_encoder import OBS_V0_DIM
+from src.utils.policy_player import BatchedPolicyPlayer
+
+ACT = 107
+
+
+def make_policy(dim: int = 16) -> InferenceBatcher:
+    torch.manual_seed(0)
+    return InferenceBatcher(torch_policy(torch.nn.Linear(dim, 2 * ACT)), max_batch=8)
+
+
+def test_concurrent_submits_share_forward_passes():
+    batcher = make_policy()
+    rng = np.random.default_rng(0)
+    obs = rng.random((20, 16), dtype=np.float32)
+    masks = rng.random((20, 2, ACT)) < 0.1
+    masks[:, :, 0] = True  # keep at least one legal action per slot
+
+    async def run() -> list[np.ndarray]:
+        results = await asyncio.gather(
+            *(batcher.submit(o, m) for o, m in zip(obs, masks, strict=True))
+        )
+        batcher.close()
+        return results
+
+    actions = np.stack(asyncio.run(run()))
+    assert actions.shape == (20, 2)
+    assert batcher.stats.requests == 20
+    assert batcher.stats.batches == 3 and batcher.stats.max_batch == 8
+    for action, mask in zip(actions, masks, strict=True):
+        assert mask[0, action[0]] and mask[1, action[1]]
+    np.testing.assert_array_equal(actions, batcher.infer(obs, masks))
+
+
+def test_policy_player_orders_come_from_the_batch(recorded_battles):
+    batcher = make_policy(OBS_V0_DIM)
+    player = BatchedPolicyPlayer(
+        batcher, act_size=ACT, battle_format="gen9doublesou", start_listening=False
+    )
+    battles = [battle for _, battle in recorded_battles]
+
+    async def run() -> list[BattleOrder]:
+        orders = await asyncio.gather(*(player.choose_move(battle) for battle in battles))
+        batcher.close()
+        return orders
+
+    orders = asyncio.run(run())
+    assert len(orders) == len(battles)
+    assert batcher.stats.requests == len(battles) and batcher.stats.batches < len(battles)
+    assert all(isinstance(order, BattleOrder) for order in orders)
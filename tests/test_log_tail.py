@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.utils.log_tail import LogFollower, tail_lines
+
+
+def test_tail_reads_blocks_from_the_end(tmp_path: Path):
+    path = tmp_path / "battle.log"
+    lines = [f"|move|p1a: Incineroar|Fake Out|p2a: Tornadus|{idx}" for idx in range(2000)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    tail, end = tail_lines(path, 5, block_size=16)
+    assert tail == lines[-5:] and end == path.stat().st_size
+    assert tail_lines(path, 5000)[0] == lines
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("|turn|")  # still being written
+    assert tail_lines(path, 2, block_size=7)[0] == [lines[-1], "|turn|"]
+    tail, offset = tail_lines(path, 2, block_size=7, complete_only=True)
+    assert tail == lines[-2:] and offset == end
+
+
+def test_following_a_tail_that_ends_mid_line_emits_the_line_once(tmp_path: Path):
+    path = tmp_path / "battle.log"
+    path.write_text("|turn|1\n|move|p1a: Incineroar|Fake Out|p2a: Torn", encoding="utf-8")
+    tail, offset = tail_lines(path, 10, complete_only=True)
+    assert tail == ["|turn|1"]
+    follower = LogFollower(path, offset)
+    assert follower.poll() == []
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("adus\n")
+    assert follower.poll() == ["|move|p1a: Incineroar|Fake Out|p2a: Tornadus"]
+
+
+def test_follower_only_returns_complete_appended_lines(tmp_path: Path):
+    path = tmp_path / "battle.log"
+    path.write_text("|turn|1\n", encoding="utf-8")
+    follower = LogFollower(path, offset=tail_lines(path, 10)[1])
+    assert follower.poll() == []
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("|move|p1a: Incineroar|Fake Out|p2a: Tornadus\n|turn")
+    assert follower.poll() == ["|move|p1a: Incineroar|Fake Out|p2a: Tornadus"]
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("|2\n\n")
+    assert follower.poll() == ["|turn|2", ""]
+
+    path.write_text("|init|battle\n", encoding="utf-8")  # new battle reuses the file
+    assert follower.poll() == ["|init|battle"]
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.utils.obs_encoder import OBS_V0_DIM, ObsEncoderV0, encode_obs_v0
+
+
+def test_encoder_is_bit_identical_to_v0(recorded_battles):
+    encoder = ObsEncoderV0()
+    buffer = np.full(OBS_V0_DIM, 7.0, dtype=np.float32)  # stale values must be cleared
+    for name, battle in recorded_battles:
+        expected = np.asarray(encode_obs_v0(battle), dtype=np.float32)
+        assert expected.shape == (OBS_V0_DIM,), name
+        out = encoder.encode(battle, buffer)
+        assert out is buffer
+        assert out.tobytes() == expected.tobytes(), name
+
+
+def test_batch_encoding_fills_rows_in_order(recorded_battles):
+    battles = [battle for _, battle in recorded_battles]
+    encoder = ObsEncoderV0()
+    out = np.empty((len(battles) + 3, OBS_V0_DIM), dtype=np.float32)
+
+    batch = encoder.encode_batch(battles, out)
+    assert batch.shape == (len(battles), OBS_V0_DIM) and np.shares_memory(batch, out)
+    expected = np.array([encode_obs_v0(battle) for battle in battles], dtype=np.float32)
+    assert batch.tobytes() == expected.tobytes()
+    assert encoder.encode_batch(battles).tobytes() == expected.tobytes()
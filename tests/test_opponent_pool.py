@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+import pickle
+from multiprocessing.reduction import ForkingPickler
+from pathlib import Path
+
+import pytest
+import torch
+
+from src.utils.inference_batcher import torch_policy
+from src.utils.opponent_pool import OpponentPool
+
+
+def load_module(path: Path) -> torch.nn.Module:
+    module: torch.nn.Module = torch.load(path, weights_only=False)
+    return module
+
+
+def save_checkpoints(directory: Path, count: int) -> None:
+    for idx in range(count):
+        path = directory / f"ppo_{idx}_steps.pt"
+        torch.save(torch.nn.Linear(4, 2 * 3), path)
+        os.utime(path, (1_000 + idx, 1_000 + idx))
+
+
+def make_pool(directory: Path, **kwargs) -> OpponentPool:
+    return OpponentPool(
+        directory, pattern="*.pt", loader=load_module, adapter=torch_policy, **kwargs
+    )
+
+
+def test_lru_cache_loads_each_checkpoint_once_into_shared_memory(tmp_path):
+    save_checkpoints(tmp_path, 3)
+    pool = make_pool(tmp_path, cache_size=2)
+    first, second, third = pool.checkpoints
+    assert pool.sample() is third  # "latest"
+
+    assert pool.module(first) is pool.module(first)
+    pool.module(second)
+    pool.module(first)  # refreshes first, so second is evicted next
+    pool.module(third)
+    assert (pool.stats.hits, pool.stats.misses, pool.stats.evictions) == (2, 3, 1)
+    module = pool.module(first)
+    assert pool.stats.hits == 3
+    assert all(param.is_shared() for param in module.parameters())
+    assert pool.batcher(first) is pool.batcher(first)
+
+    # What a spawned worker receives: handles to the same weights, not a copy.
+    copy = pickle.loads(ForkingPickler.dumps(pool))
+    with torch.no_grad():
+        copy.module(first).weight.fill_(7.0)
+    assert module.weight[0, 0].item() == 7.0
+    assert copy.stats.misses == 3  # served from the inherited cache
+
+    save_checkpoints(tmp_path, 4)
+    assert pool.refresh() == 1 and len(pool) == 4
+
+
+def test_sampling_strategies(tmp_path):
+    save_checkpoints(tmp_path, 3)
+    with pytest.raises(ValueError):
+        make_pool(tmp_path, strategy="best")
+    pool = make_pool(tmp_path, strategy="prioritized", seed=0)
+    strong = pool.checkpoints[0]
+    for _ in range(20):
+        pool.record(strong.name, won=True)
+        pool.record(pool.checkpoints[1].name, won=False)
+    draws = [pool.sample().name for _ in range(300)]
+    assert draws.count(strong.name) > 200
+    uniform = make_pool(tmp_path, strategy="uniform", seed=0)
+    assert {uniform.sample().name for _ in range(50)} == {c.name for c in pool.checkpoints}
+    with pytest.raises(ValueError):
+        make_pool(tmp_path / "missing").sample()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import scripts.parse_replays_minimal as parser
+from src.utils.parse_manifest import manifest_path
+from src.utils.replay_archive import ReplayRef
+
+LOG = """|init|battle
+|player|p1|Alice|1
+|player|p2|Bob|2
+|switch|p1a: Incineroar|Incineroar, L50|100/100
+|turn|1
+|move|p1a: Incineroar|Protect|p1a: Incineroar
+|move|p2b: Tornadus|Tailwind|p2b: Tornadus
+|switch|p2a: Amoonguss|Amoonguss, L50|100/100
+|turn|2
+|win|Alice
+"""
+
+
+def _write_replays(raw_dir: Path, n: int) -> list[Path]:
+    raw_dir.mkdir()
+    paths = []
+    for idx in range(n):
+        path = raw_dir / f"gen9doublesou-{100 + idx}.json"
+        path.write_text(json.dumps({"log": LOG}), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _run(raw_dir: Path, out: Path, **kwargs) -> None:
+    options = {"workers": 1, "chunk_size": 8, "full": False, "archive": None, **kwargs}
+    parser.main(raw_dir=raw_dir, out=out, **options)
+
+
+def test_pool_output_matches_serial_order(tmp_path: Path):
+    paths = _write_replays(tmp_path / "raw", 7)
+    jobs: list[tuple[ReplayRef, str | None]] = [
+        (ReplayRef(path.name, path), None) for path in paths
+    ]
+
+    serial = list(parser.scan_all(jobs, workers=1))
+    pooled = list(parser.scan_all(jobs, workers=2, chunk_size=3))
+    assert pooled == serial
+    assert [ref.path for ref, _, _, _ in pooled] == paths
+    hints = serial[0][2]
+    assert hints is not None
+    assert [hint["hint"] for hint in hints] == ["protect", "tailwind", "switch"]
+
+
+def test_failures_are_reported_per_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys):
+    paths = _write_replays(tmp_path / "raw", 3)
+    real_hints = parser.replay_hints
+
+    def flaky(tag: str, blob: bytes, ext: str):
+        if tag == paths[1].stem:
+            raise UnicodeError("bad bytes")
+        return real_hints(tag, blob, ext)
+
+    monkeypatch.setattr(parser, "replay_hints", flaky)
+    _run(tmp_path / "raw", tmp_path / "hints.jsonl")
+
+    output = capsys.readouterr().out
+    assert "from 2 files" in output and "1 files failed" in output
+    assert f"{paths[1]}: UnicodeError: bad bytes" in output
+
+
+def test_reruns_only_parse_the_delta(tmp_path: Path, capsys):
+    raw_dir, out = tmp_path / "raw", tmp_path / "hints.jsonl"
+    paths = _write_replays(raw_dir, 4)
+    _run(raw_dir, out)
+    capsys.readouterr()
+
+    # A new replay is parsed and appended; the others are not even read.
+    new = raw_dir / "gen9doublesou-200.log"
+    new.write_text(LOG, encoding="utf-8")
+    os.utime(paths[0], ns=(0, 10**9))  # touched, same bytes
+    _run(raw_dir, out)
+    output = capsys.readouterr().out
+    assert "from 1 files" in output and "3 unchanged, 1 touched" in output
+    assert "appended 3 events" in output
+
+    # A removed replay and an edited one force a rewrite from the manifest.
+    paths[1].unlink()
+    paths[2].write_text(json.dumps({"log": LOG.replace("|Tailwind|", "|Tackle|")}), "utf-8")
+    _run(raw_dir, out)
+    output = capsys.readouterr().out
+    assert "from 1 files" in output and "1 removed" in output and "rewrote 11 events" in output
+
+    incremental = out.read_text(encoding="utf-8")
+    _run(raw_dir, tmp_path / "full.jsonl", full=True)
+    assert incremental == (tmp_path / "full.jsonl").read_text(encoding="utf-8")
+
+    # A run that died after appending is rolled back to the committed output.
+    with out.open("a", encoding="utf-8") as handle:
+        handle.write('{"torn": ')
+    with manifest_path(out).open("ab") as handle:
+        handle.write(b'{"name": "gen9doublesou-999.json", "size": 1')
+    _run(raw_dir, out)
+    assert "rewrote 11 events" in capsys.readouterr().out
+    assert out.read_text(encoding="utf-8") == incremental
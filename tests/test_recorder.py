@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from src.utils.recorder import BufferedRecorder, Recorder
+
+
+def _lines(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_buffered_recorder_batches_and_flushes_on_close(tmp_path: Path):
+    out = tmp_path / "imitation.jsonl"
+    recorder = BufferedRecorder(out, batch_size=4, flush_interval=60.0, handle_signals=False)
+    for turn in range(10):
+        recorder.write({"battle_tag": "battle-x-1", "turn": turn, "obs_v0": [0.5, 1.0]})
+    deadline = time.monotonic() + 5
+    while recorder.stats.records < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.stats.records >= 8
+    recorder.close()
+    assert [row["turn"] for row in _lines(out)] == list(range(10))
+    assert recorder.stats.records == 10
+    assert recorder.stats.batches < 10
+
+
+def test_buffered_recorder_flushes_stale_batches(tmp_path: Path):
+    out = tmp_path / "imitation.jsonl"
+    recorder = BufferedRecorder(out, batch_size=1000, flush_interval=0.05, handle_signals=False)
+    recorder.write({"turn": 1})
+    deadline = time.monotonic() + 5
+    while not out.read_bytes() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _lines(out) == [{"turn": 1}]
+    recorder.close()
+
+
+def test_recorders_write_the_same_rows(tmp_path: Path):
+    row = {"battle_tag": "battle-x-1", "turn": 3, "obs_v0": [0.25, 0.0], "teacher": "é"}
+    direct, buffered = Recorder(tmp_path / "a.jsonl"), BufferedRecorder(tmp_path / "b.jsonl")
+    for recorder in (direct, buffered):
+        recorder.write(row)
+        recorder.close()
+    assert _lines(tmp_path / "a.jsonl") == _lines(tmp_path / "b.jsonl") == [row]
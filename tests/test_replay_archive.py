@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+
+import scripts.migrate_replay_archive as migrate
+import scripts.parse_replays_minimal as parser
+from src.utils.replay_archive import ReplayArchive
+
+LOG = """|init|battle
+|turn|1
+|move|p1a: Incineroar|Protect|p1a: Incineroar
+|switch|p2a: Amoonguss|Amoonguss, L50|100/100
+|win|Alice
+"""
+
+
+def test_members_round_trip_across_shards_and_crashes(tmp_path: Path):
+    archive = ReplayArchive(tmp_path, shard_bytes=1)  # every add after the first rotates
+    blobs = {f"gen9doublesou-{idx}": (LOG * (idx + 1)).encode() for idx in range(3)}
+    for replay_id, blob in blobs.items():
+        archive.add(replay_id, blob, ".log")
+    archive.close()
+    with (tmp_path / "shard-00002.gz").open("ab") as handle:
+        handle.write(b"\x1f\x8b half a member")  # died before journaling it
+
+    archive = ReplayArchive(tmp_path)
+    assert sorted(archive) == sorted(blobs)
+    assert (tmp_path / "shard-00002.gz").stat().st_size == archive["gen9doublesou-2"]["length"]
+    archive.add("gen9doublesou-0", b"|turn|1\n", ".log")  # last write wins
+    archive.close()
+
+    reader = ReplayArchive(tmp_path, readonly=True)
+    assert reader.read("gen9doublesou-0") == b"|turn|1\n"
+    assert {replay_id: blob for replay_id, _, blob in reader.iter_replays()} == {
+        **blobs,
+        "gen9doublesou-0": b"|turn|1\n",
+    }
+    # Shards stay plain multi-member gzip files.
+    assert gzip.decompress((tmp_path / "shard-00001.gz").read_bytes()) == blobs["gen9doublesou-1"]
+
+
+def test_migrated_archive_parses_like_loose_files(tmp_path: Path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for idx in range(4):
+        path = raw_dir / f"gen9doublesou-{idx}.json"
+        path.write_text(json.dumps({"log": LOG}), encoding="utf-8")
+    (raw_dir / "index.jsonl").write_text("{}\n", encoding="utf-8")
+    options = {"workers": 1, "chunk_size": 8, "full": False}
+    parser.main(raw_dir=raw_dir, out=tmp_path / "loose.jsonl", archive=None, **options)
+
+    archive_dir = tmp_path / "archive"
+    migrate.main(raw_dir=raw_dir, archive=archive_dir, shard_mb=1, level=6, delete=True)
+    assert [path.name for path in raw_dir.iterdir()] == ["index.jsonl"]
+    parser.main(raw_dir=raw_dir, out=tmp_path / "packed.jsonl", archive=archive_dir, **options)
+
+    packed = (tmp_path / "packed.jsonl").read_text(encoding="utf-8")
+    assert packed == (tmp_path / "loose.jsonl").read_text(encoding="utf-8")
+    assert packed.count("\n") == 8
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.replay_fetch import FetchEngine, TokenBucket
+
+
+class ReplayStandIn(BaseHTTPRequestHandler):
+    # /<id>.json exists for ids ending in even digits, /<id>.log for the rest. "flaky" ids
+    # answer 503 on their first hit and "limited" ids answer 429 with Retry-After: 0.
+    protocol_version = "HTTP/1.1"
+    hits: Counter[str] = Counter()
+    peers: set[int] = set()
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.hits[self.path] += 1
+        self.peers.add(self.client_address[1])
+        replay_id, _, ext = self.path.lstrip("/").partition(".")
+        if "flaky" in replay_id and self.hits[self.path] == 1:
+            return self._send(503, b"busy")
+        if "limited" in replay_id and self.hits[self.path] == 1:
+            return self._send(429, b"slow down", {"Retry-After": "0"})
+        wanted = "json" if replay_id[-1] in "02468" else "log"
+        if ext != wanted:
+            return self._send(404, b"")
+        self._send(200, f"|init|battle\n|player|p1|{replay_id}".encode())
+
+    def _send(self, status: int, body: bytes, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    ReplayStandIn.hits = Counter()
+    ReplayStandIn.peers = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ReplayStandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_many_reuses_connections_and_retries(server: str):
+    ids = [f"gen9doublesou-{i}" for i in range(12)] + ["flaky-2", "limited-4"]
+    results: dict[str, tuple[bytes | None, str | None]] = {}
+    engine = FetchEngine("test-agent", rate=0, concurrency=3, backoff=0.01)
+
+    stats = asyncio.run(
+        engine.fetch_many(server, ids, lambda rid, blob, ext: results.update({rid: (blob, ext)}))
+    )
+
+    assert set(results) == set(ids)
+    for replay_id, (blob, ext) in results.items():
+        assert blob is not None and replay_id.encode() in blob
+        assert ext == (".json" if replay_id[-1] in "02468" else ".log")
+    assert stats.retries == 2 and stats.statuses[503] == 1 and stats.statuses[429] == 1
+    assert engine.pool.opened <= 3 and len(ReplayStandIn.peers) <= 3
+    assert ReplayStandIn.hits["/gen9doublesou-1.json"] == 1
+
+
+def test_gives_up_after_max_retries(server: str):
+    engine = FetchEngine("test-agent", rate=0, max_retries=0)
+    assert asyncio.run(engine.fetch_replay(server, "flaky-0")) == (None, None)
+
+
+def test_token_bucket_is_a_global_ceiling():
+    async def burst() -> float:
+        bucket = TokenBucket(rate=50)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+        return time.monotonic() - started
+
+    # one token is available up front, the other ten arrive at 50/s
+    assert asyncio.run(burst()) >= 0.19
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+import scripts.convert_replays_imitation as converter
+from src.utils.obs_encoder import OBS_V0_DIM
+from src.utils.replay_imitation import ReplayConverter
+
+LOG = """|j|☆Alice
+|j|☆Bob
+|t:|1700000000
+|gametype|doubles
+|player|p1|Alice|1|1500
+|player|p2|Bob|2|1500
+|teamsize|p1|4
+|teamsize|p2|4
+|gen|9
+|tier|[Gen 9] Doubles OU
+|rule|Species Clause: Limit one of each Pokémon
+|clearpoke
+|poke|p1|Incineroar, L50, M|
+|poke|p1|Rillaboom, L50, M|
+|poke|p1|Flutter Mane, L50|
+|poke|p1|Amoonguss, L50, F|
+|poke|p2|Tornadus, L50, M|
+|poke|p2|Urshifu-*, L50, M|
+|poke|p2|Ogerpon, L50, F|
+|poke|p2|Farigiraf, L50, F|
+|teampreview|4
+|
+|t:|1700000010
+|start
+|switch|p1a: Incy|Incineroar, L50, M|100/100
+|switch|p1b: Flutter Mane|Flutter Mane, L50|100/100
+|switch|p2a: Tornadus|Tornadus, L50, M|100/100
+|switch|p2b: Urshifu|Urshifu-Rapid-Strike, L50, M|100/100
+|-ability|p1a: Incy|Intimidate|boost
+|-unboost|p2a: Tornadus|atk|1
+|-unboost|p2b: Urshifu|atk|1
+|turn|1
+|
+|t:|1700000030
+|move|p1a: Incy|Fake Out|p2b: Urshifu
+|-damage|p2b: Urshifu|88/100
+|cant|p2b: Urshifu|flinch
+|move|p2a: Tornadus|Tailwind|p2a: Tornadus
+|-sidestart|p2: Bob|move: Tailwind
+|-terastallize|p1b: Flutter Mane|Fairy
+|move|p1b: Flutter Mane|Dazzling Gleam|p2a: Tornadus|[spread] p2a,p2b
+|-damage|p2a: Tornadus|60/100
+|-damage|p2b: Urshifu|50/100
+|-supereffective|p2b: Urshifu
+|
+|upkeep
+|turn|2
+|
+|t:|1700000060
+|switch|p1a: Rillaboom|Rillaboom, L50, M|100/100
+|-fieldstart|move: Grassy Terrain|[from] ability: Grassy Surge|[of] p1a: Rillaboom
+|move|p1b: Flutter Mane|Moonblast|p2b: Urshifu
+|-damage|p2b: Urshifu|20/100
+|move|p2a: Tornadus|Bleakwind Storm|p1b: Flutter Mane|[spread] p1a,p1b
+|-damage|p1a: Rillaboom|80/100
+|-damage|p1b: Flutter Mane|40/100
+|move|p2b: Urshifu|Surging Strikes|p1b: Flutter Mane
+|-damage|p1b: Flutter Mane|0 fnt
+|faint|p1b: Flutter Mane
+|
+|upkeep
+|switch|p1b: Amoonguss|Amoonguss, L50, F|100/100
+|turn|3
+|
+|t:|1700000090
+|move|p1b: Amoonguss|Rage Powder|p1b: Amoonguss
+|-singleturn|p1b: Amoonguss|move: Rage Powder
+|move|p2a: Tornadus|Protect|p2a: Tornadus
+|-singleturn|p2a: Tornadus|Protect
+|move|p1a: Rillaboom|Wood Hammer|p2b: Urshifu
+|-supereffective|p2b: Urshifu
+|-damage|p2b: Urshifu|0 fnt
+|-damage|p1a: Rillaboom|70/100|[from] Recoil
+|faint|p2b: Urshifu
+|
+|upkeep
+|switch|p2b: Ogerpon|Ogerpon, L50, F|100/100
+|turn|4
+|
+|move|p1a: Rillaboom|Fake Out|p2b: Ogerpon
+|-damage|p2b: Ogerpon|90/100
+|move|p1b: Amoonguss|Spore|p2a: Tornadus
+|-status|p2a: Tornadus|slp
+|cant|p2a: Tornadus|slp
+|move|p2b: Ogerpon|Ivy Cudgel|p1a: Rillaboom
+|-damage|p1a: Rillaboom|0 fnt
+|faint|p1a: Rillaboom
+|
+|upkeep
+|-message|Alice forfeited.
+|
+|win|Bob
+"""
+
+
+def test_human_choices_become_masked_actions():
+    records, stats = ReplayConverter().convert("gen9doublesou-1", LOG)
+
+    actions = {(r["side"], r["turn"]): r["action"] for r in records}
+    assert actions == {
+        ("p1", 1): [11, 89],  # Fake Out -> p2b; tera Dazzling Gleam (spread, tera block)
+        ("p1", 2): [2, 16],  # switch to team[1] Rillaboom; Moonblast -> p2b
+        ("p1", 3): [11, 9],  # Wood Hammer -> p2b; Rage Powder (self, no target)
+        ("p1", 4): [16, 15],  # Fake Out -> p2b; Spore -> p2a
+        ("p2", 2): [14, 11],  # Bleakwind Storm (spread); Surging Strikes -> p1b
+    }
+    # Flinched, asleep or KO'd before moving: the choice is not in the log.
+    assert (stats.sides, stats.unknown, stats.off_mask, stats.failed) == (2, 3, 0, 0)
+    for record in records:
+        assert len(record["obs_v0"]) == OBS_V0_DIM
+        mask = np.asarray(record["mask"], dtype=bool)
+        assert (
+            mask.shape == (2, 107) and mask[0, record["action"][0]] and mask[1, record["action"][1]]
+        )
+    assert records[0]["teacher"] == "human" and records[0]["format"] == "gen9doublesou"
+
+
+def test_pool_matches_serial(tmp_path: Path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for idx in range(3):
+        payload = {"log": LOG.replace("|win|Bob", f"|win|Bob{idx}")}
+        (raw_dir / f"gen9doublesou-{idx}.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    for workers in (1, 2):
+        out = tmp_path / f"w{workers}.jsonl"
+        converter.main(raw_dir=raw_dir, archive=None, out=out, workers=workers, chunk_size=1)
+    serial = (tmp_path / "w1.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(serial) == 15
+    assert (tmp_path / "w2.jsonl").read_text(encoding="utf-8").splitlines() == serial
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.utils.action_masks import legal_action_masks
+from src.utils.obs_encoder import ObsEncoderV0
+from src.utils.selfplay_env import MaskedDoublesEnv, env_specs
+
+
+def test_env_spaces_observations_and_masks_line_up(recorded_battles):
+    env = MaskedDoublesEnv(battle_format="gen9doublesou", start_listening=False)
+    agent = env.possible_agents[0]
+    assert env.action_spaces[agent].nvec.tolist() == [107, 107]
+    assert env.action_masks(None).shape == (214,) and env.action_masks(None).all()
+    for _, battle in recorded_battles:
+        obs = env.embed_battle(battle)
+        assert env.observation_spaces[agent].contains(obs)
+        np.testing.assert_array_equal(obs, ObsEncoderV0().encode(battle))
+        mask = env.action_masks(battle)
+        assert mask.dtype == np.bool_ and mask.shape == (214,)
+        np.testing.assert_array_equal(mask.reshape(2, 107), legal_action_masks(battle, 107))
+    env.close()
+
+
+def test_specs_spread_envs_over_server_ports():
+    specs = env_specs(5, "gen9doublesou", "http://localhost:8000", n_servers=2, base_port=9000)
+    assert [spec.server_url for spec in specs] == [
+        "http://localhost:9000",
+        "http://localhost:9001",
+        "http://localhost:9000",
+        "http://localhost:9001",
+        "http://localhost:9000",
+    ]
+    long_prefix = env_specs(12, "gen9doublesou", "localhost", account_prefix="selfplay-run-")
+    names = {spec.username(side) for spec in long_prefix for side in "ab"}
+    assert len(names) == 24 and max(map(len, names)) <= 18
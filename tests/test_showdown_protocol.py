@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from src.utils.showdown_protocol import (
+    Damage,
+    Faint,
+    Field,
+    Heal,
+    Move,
+    Player,
+    ProtocolParser,
+    Status,
+    Switch,
+    Tera,
+    Turn,
+    Weather,
+    Win,
+    iter_events,
+)
+
+LOG = """|j|☆Alice
+|player|p1|Alice|1
+|switch|p1a: Incineroar|Incineroar, L50, F|100/100
+|turn|1
+|c|☆Bob|hi
+|move|p1a: Incineroar|Fake Out|p2b: Flutter Mane
+|-damage|p2b: Flutter Mane|38/100
+|move|p2a: Tornadus|Tailwind|p2a: Tornadus
+|-sidestart|p2: Bob|move: Tailwind
+|-terastallize|p1a: Incineroar|Grass
+|drag|p2b: Amoonguss|Amoonguss, L50|100/100
+|-status|p2b: Amoonguss|par
+|-heal|p1a: Incineroar|60/100|[from] item: Leftovers
+|-weather|SunnyDay|[upkeep]
+|-fieldstart|move: Psychic Terrain|[from] ability: Psychic Surge
+|upkeep
+|turn|2
+|-curestatus|p2b: Amoonguss|par|[msg]
+|faint|p2a: Tornadus
+|win|Alice
+"""
+
+
+def test_every_event_type_is_decoded():
+    player, *events = iter_events(LOG.splitlines())
+    assert player == Player(None, "p1", "Alice")
+    kinds = [type(event).__name__ for event in events]
+    assert kinds == [
+        "Switch", "Turn", "Move", "Damage", "Move", "Field", "Tera", "Switch", "Status",
+        "Heal", "Weather", "Field", "Turn", "Status", "Faint", "Win",
+    ]  # fmt: skip
+
+    lead, _, fake_out, damage, _, tailwind, tera, drag, status, heal, sun, terrain = events[:12]
+    assert isinstance(lead, Switch) and lead.turn is None and not lead.forced
+    assert (lead.side, lead.slot, lead.pokemon, lead.species, lead.level) == (
+        "p1", "a", "Incineroar", "Incineroar", 50,
+    )  # fmt: skip
+    assert (lead.hp, lead.max_hp) == (100, 100)
+    assert isinstance(fake_out, Move) and fake_out.turn == 1 and fake_out.move == "Fake Out"
+    assert (fake_out.target_side, fake_out.target_slot) == ("p2", "b")
+    assert isinstance(damage, Damage) and (damage.hp, damage.max_hp, damage.status) == (
+        38,
+        100,
+        None,
+    )
+    assert tailwind == Field(1, "Tailwind", True, "p2")
+    assert isinstance(tera, Tera) and tera.tera_type == "Grass"
+    assert isinstance(drag, Switch) and drag.forced and drag.slot == "b"
+    assert isinstance(status, Status) and status.status == "par" and not status.cured
+    assert isinstance(heal, Heal) and heal.hp == 60 and heal.source == "item: Leftovers"
+    assert sun == Weather(1, "SunnyDay", True, None)
+    assert terrain == Field(1, "Psychic Terrain", True, None)
+    cure, faint, win = events[13:]
+    assert isinstance(cure, Status) and cure.cured and cure.turn == 2
+    assert isinstance(faint, Faint) and faint.pokemon == "Tornadus"
+    assert win == Win(2, "Alice")
+
+
+def test_type_filter_keeps_turn_tracking():
+    parser = ProtocolParser(types=("faint",))
+    events = list(parser.events_from_text(LOG))
+    assert events == [Turn(1), Turn(2), Faint(2, "p2a: Tornadus")]
+
+
+def test_bare_tie_line_is_parsed():
+    log = "|tier|[Gen 9] Doubles OU\n|turn|30\n|-weather|none\n|tie\n"
+    assert list(iter_events(log.splitlines())) == [
+        Turn(30),
+        Weather(30, "none", False, None),
+        Win(30, None),
+    ]
+    assert list(iter_events(["|tie\r\n"], types=("tie",))) == [Win(None, None)]
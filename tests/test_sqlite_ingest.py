@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from db.ingest import connect, create_cache, ingest_hints, ingest_imitation, load_sample
+
+
+def _imitation_lines(n: int, act_size: int = 107) -> list[str]:
+    rng = np.random.default_rng(5)
+    return [
+        json.dumps(
+            {
+                "battle_tag": f"battle-gen9doublesou-{idx // 3}",
+                "turn": idx % 3 + 1,
+                "side": "p1",
+                "teacher": "SimpleHeuristicsPlayer",
+                "format": "gen9doublesou",
+                "obs_v0": rng.random(12).astype(np.float32).tolist(),
+                "action": [int(rng.integers(act_size)), -2],
+                "mask": (rng.random((2, act_size)) < 0.3).astype(int).tolist(),
+            }
+        )
+        for idx in range(n)
+    ]
+
+
+def test_imitation_ingest_dedupes_and_round_trips(tmp_path: Path):
+    lines = _imitation_lines(9)
+    # A forced switch after a faint: same battle, turn and side, the next decision.
+    switch = json.dumps({**json.loads(lines[4]), "decision": 1, "action": [3, 0]})
+    src = tmp_path / "imitation.jsonl"
+    src.write_text("\n".join([*lines, lines[4], switch, "{not json"]) + "\n", encoding="utf-8")
+    db_path = tmp_path / "cache.sqlite"
+    create_cache(db_path)
+    conn = connect(db_path)
+
+    stats = ingest_imitation(conn, src, batch_size=4)
+    assert (stats.read, stats.inserted, stats.duplicates, stats.invalid) == (12, 10, 1, 1)
+    assert ingest_imitation(conn, src).inserted == 0
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    expected = json.loads(lines[4])
+    sample = load_sample(conn, expected["battle_tag"], expected["turn"], "p1")
+    assert sample is not None and sample["action"] == expected["action"]
+    np.testing.assert_array_equal(sample["obs_v0"], np.float32(expected["obs_v0"]))
+    np.testing.assert_array_equal(sample["mask"], np.array(expected["mask"], bool))
+    forced = load_sample(conn, expected["battle_tag"], expected["turn"], "p1", decision=1)
+    assert forced is not None and forced["action"] == [3, 0]
+    assert load_sample(conn, expected["battle_tag"], 99, "p1") is None
+    plan = " ".join(
+        str(row[-1])
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT obs FROM imitation_v2 WHERE battle_tag=? AND turn=? "
+            "AND side=? AND decision=?",
+            ("x", 1, "p1", 0),
+        )
+    )
+    assert "USING INDEX" in plan
+
+
+def test_hints_keep_one_row_per_event_and_slot(tmp_path: Path):
+    db_path = tmp_path / "cache.sqlite"
+    create_cache(db_path)
+    create_cache(db_path)  # idempotent
+    conn = connect(db_path)
+
+    stats = ingest_hints(conn, Path(__file__).resolve().parents[1] / "data/human_hints.jsonl")
+    assert stats.inserted == stats.read == 21
+    turn_two = conn.execute(
+        "SELECT slot FROM hints_v2 WHERE battle_tag=? AND turn=2 ORDER BY slot",
+        ("battle-gen9doublesou-2032231707",),
+    ).fetchall()
+    assert turn_two == [("a",), ("b",)]
+    assert conn.execute("SELECT version FROM schema_info").fetchall() == [(2,), (2,)]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.utils.team_validation import TeamValidator
+from src.utils.teambuilders import TeamPool
+
+TEAMS = Path(__file__).resolve().parents[1] / "teams"
+
+# Stands in for `pokemon-showdown validate-team <format>`: same stdin/exit-code contract.
+FAKE_VALIDATOR = """
+import sys
+team = sys.stdin.read()
+with open(sys.argv[1], "a") as calls:
+    calls.write(sys.argv[2] + "\\n")
+if "Volcarona" in team:
+    print("Volcarona is banned.", file=sys.stderr)
+    print("- Your team has 1 banned Pokemon.", file=sys.stderr)
+    sys.exit(1)
+"""
+
+
+def test_rejections_are_reported_and_cached_by_team_hash(tmp_path: Path):
+    script = tmp_path / "validate.py"
+    script.write_text(FAKE_VALIDATOR, encoding="utf-8")
+    calls = tmp_path / "calls.txt"
+    command = [sys.executable, str(script), str(calls)]
+    cache = tmp_path / "verdicts.jsonl"
+    teams = TeamPool(TEAMS).team_files()
+
+    validator = TeamValidator(command, cache_path=cache, workers=2)
+    rejected = validator.check(teams, "gen9doublesou")
+    assert rejected == {
+        "gen9dou_volcarona_offense.txt": [
+            "Volcarona is banned.",
+            "- Your team has 1 banned Pokemon.",
+        ]
+    }
+    assert validator.validated == len(set(teams.values()))
+    assert validator.problems(teams["gen9dou_rain.txt"], "gen9doublesou") == []
+    assert validator.problems(teams["gen9dou_rain.txt"], "gen9vgc2025regg") is None
+
+    with cache.open("ab") as handle:
+        handle.write(b'{"format": "gen9doub')  # torn by a crash
+    again = TeamValidator(command, cache_path=cache)
+    assert again.check(teams, "gen9doublesou") == rejected and again.validated == 0
+    assert again.check({"rain": teams["gen9dou_rain.txt"]}, "gen9vgc2025regg") == {}
+    assert again.validated == 1
+    assert calls.read_text().count("gen9vgc2025regg") == 1
+    assert len(TeamValidator(command, cache_path=cache)._verdicts) == validator.validated + 1
+
+
+def test_a_validator_that_cannot_run_caches_nothing(tmp_path: Path):
+    cache = tmp_path / "verdicts.jsonl"
+    validator = TeamValidator([str(tmp_path / "missing")], cache_path=cache)
+    with pytest.raises(OSError):
+        validator.check(TeamPool(TEAMS).team_files(), "gen9doublesou")
+    assert not cache.exists()
+
+
+def test_a_timed_out_check_rejects_for_this_run_only(tmp_path: Path):
+    script = tmp_path / "validate.py"
+    script.write_text(
+        "import sys, time\nif 'Volcarona' in sys.stdin.read():\n    time.sleep(5)\n",
+        encoding="utf-8",
+    )
+    cache = tmp_path / "verdicts.jsonl"
+    teams = TeamPool(TEAMS).team_files()
+    validator = TeamValidator([sys.executable, str(script)], cache_path=cache, timeout=1.0)
+    assert validator.check(teams, "gen9doublesou") == {
+        "gen9dou_volcarona_offense.txt": ["validator timed out after 1s"]
+    }
+    volcarona = teams["gen9dou_volcarona_offense.txt"]
+    assert validator.problems(volcarona, "gen9doublesou") is None
+    again = TeamValidator([sys.executable, str(script)], cache_path=cache)
+    assert again.problems(volcarona, "gen9doublesou") is None
+    assert again.problems(teams["gen9dou_rain.txt"], "gen9doublesou") == []
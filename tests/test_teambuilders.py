@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.utils.teambuilders import RotatingTeambuilder, TeamPool, pack_team, read_showdown_team
+
+TEAMS = Path(__file__).resolve().parents[1] / "teams"
+
+
+def _copy_teams(target: Path, names: list[str]) -> None:
+    target.mkdir()
+    for name in names:
+        shutil.copy(TEAMS / name, target / name)
+
+
+def test_pool_parses_each_team_once_and_reuses_the_cache(tmp_path: Path):
+    teams_dir = tmp_path / "teams"
+    _copy_teams(teams_dir, ["gen9dou_rain.txt", "gen9dou_sun.txt", "gen9dou_sand.txt"])
+    cache = tmp_path / "team_pool.json"
+
+    pool = TeamPool(teams_dir, cache_path=cache)
+    assert pool.parsed == 3 and len(pool) == 3
+    texts = [read_showdown_team(path) for path in sorted(teams_dir.iterdir())]
+    expected = [pack_team(text) for text in texts]
+    assert pool.teams() == expected == RotatingTeambuilder(texts)._teams
+
+    worker = TeamPool(teams_dir, cache_path=cache)  # what a spawned worker does
+    assert worker.parsed == 0 and worker.teams() == expected
+
+    shutil.copy(teams_dir / "gen9dou_rain.txt", teams_dir / "copy_of_rain.txt")
+    (teams_dir / "gen9dou_sand.txt").unlink()
+    (teams_dir / "broken.txt").write_text("not a team|||", encoding="utf-8")
+    assert worker.refresh() == 3  # two added, one removed
+    assert worker.parsed == 1  # only the broken file; the copy hashes like rain
+    assert len(worker) == 2 and worker.refresh() == 0
+    assert TeamPool(teams_dir, cache_path=cache).parsed == 0
+
+
+def test_builders_share_the_pool_and_follow_edits(tmp_path: Path):
+    teams_dir = tmp_path / "teams"
+    _copy_teams(teams_dir, ["gen9dou_rain.txt", "gen9dou_sun.txt"])
+    pool = TeamPool(teams_dir, refresh_interval=1e-9)
+    ours = read_showdown_team(teams_dir / "gen9dou_sun.txt")
+    first, second = pool.builder(exclude=[ours]), pool.builder()
+
+    rain = pack_team(read_showdown_team(teams_dir / "gen9dou_rain.txt"))
+    assert {first.yield_team() for _ in range(20)} == {rain}
+    assert len({second.yield_team() for _ in range(50)}) == 2
+
+    (teams_dir / "gen9dou_rain.txt").unlink()
+    with pytest.raises(ValueError):
+        pool.builder(exclude=[ours])
+    assert first.yield_team() == rain  # keeps its last teams rather than failing mid-run
+    fallback = pool.builder(exclude=[ours], fallback=ours)
+    assert fallback.yield_team() == pack_team(ours)
+
+    shutil.copy(TEAMS / "gen9dou_trickroom.txt", teams_dir / "gen9dou_trickroom.txt")
+    trick_room = pack_team(read_showdown_team(teams_dir / "gen9dou_trickroom.txt"))
+    assert {fallback.yield_team() for _ in range(10)} == {trick_room}
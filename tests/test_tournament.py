@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import random
+
+from src.utils.tournament import Tournament, elo_ratings, wilson_interval
+
+
+def play(tournament: Tournament, strengths: dict[str, float], seed: int = 0) -> None:
+    rng = random.Random(seed)
+    while (job := tournament.next_matchup(chunk=10)) is not None:
+        (first, second), games = job
+        p_first = strengths[first] / (strengths[first] + strengths[second])
+        for _ in range(games):
+            tournament.record(first, second, rng.random() < p_first)
+        tournament.release((first, second), games)
+
+
+def test_lopsided_matchups_stop_early_and_elo_orders_agents(tmp_path):
+    journal = tmp_path / "eval.jsonl"
+    strengths = {"simple": 8.0, "maxbp": 3.0, "random": 1.0}
+    tournament = Tournament(list(strengths), max_games=1000, min_games=40, journal_path=journal)
+    play(tournament, strengths)
+    assert tournament.finished
+    assert tournament.games < tournament.budget / 3
+    assert all(matchup.games >= 40 for matchup in tournament.matchups.values())
+    ratings = tournament.ratings()
+    assert ratings["simple"] > ratings["maxbp"] > ratings["random"]
+    assert abs(sum(ratings.values()) / 3 - 1500) < 1e-6
+
+    with journal.open("ab") as handle:
+        handle.write(b'{"first": "simple", "sec')  # torn by a crash mid-write
+    resumed = Tournament(list(strengths), max_games=1000, journal_path=journal)
+    assert resumed.games == tournament.games and resumed.finished
+    resumed.record("random", "simple", True)  # reversed pair counts for the other side
+    assert resumed.matchups[("simple", "random")].losses == (
+        tournament.matchups[("simple", "random")].losses + 1
+    )
+    assert Tournament(list(strengths), journal_path=journal).games == tournament.games + 1
+
+
+def test_even_matchups_run_until_the_interval_is_tight():
+    tournament = Tournament(["a", "b"], max_games=2000, min_games=40, precision=0.05)
+    first = tournament.next_matchup(chunk=30)
+    second = tournament.next_matchup(chunk=30)
+    assert first == (("a", "b"), 30) and second == (("a", "b"), 30)
+    tournament.release(("a", "b"), 60)
+    play(tournament, {"a": 1.0, "b": 1.0})
+    matchup = tournament.matchups[("a", "b")]
+    low, high = matchup.interval()
+    assert (high - low) / 2 <= 0.05 and 300 < matchup.games < 500
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(50, 100)
+    assert low < 0.5 < high and abs((low + high) / 2 - 0.5) < 1e-9
+    even = elo_ratings(tournament.matchups.values(), ["a", "b"])
+    assert abs(even["a"] - even["b"]) < 100
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from src.utils.replay_archive import ReplayArchive
+from src.utils.turn_index import TurnIndex, load_turn_index, read_turns, sidecar_path, slice_turns
+
+HEADER = "|init|battle\n|player|p1|Alice|1\n"
+
+
+def _turn(number: int) -> str:
+    return f"|turn|{number}\n|move|p1a: Incineroar|Fake Out|p2a: Tornadus\n"
+
+
+def test_offsets_seek_to_turns_and_follow_appends(tmp_path: Path):
+    path = tmp_path / "battle.log"
+    log = HEADER + "".join(_turn(number) for number in range(1, 4))
+    path.write_text(log, encoding="utf-8")
+
+    index = load_turn_index(path)
+    assert index.turns == 3 and index.covered == len(log)
+    assert read_turns(path, 0) == HEADER
+    assert read_turns(path, 2) == _turn(2)
+    assert read_turns(path, 2, 9) == _turn(2) + _turn(3)
+    assert TurnIndex.from_bytes(sidecar_path(path).read_bytes()).offsets == index.offsets
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(_turn(4) + "|turn|5")  # turn 5 still being written
+    assert load_turn_index(path).turns == 4
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("\n|turn|7\n")  # a skipped turn is empty
+    grown = load_turn_index(path)
+    assert grown.offsets[:4] == index.offsets and grown.turns == 7
+    assert read_turns(path, 6) == "" and read_turns(path, 7) == "|turn|7\n"
+    assert read_turns(path, 5) == "|turn|5\n"
+
+    path.write_text(HEADER + _turn(1), encoding="utf-8")  # replaced by a shorter log
+    assert read_turns(path, 1) == _turn(1)
+    assert load_turn_index(path).turns == 1
+
+
+def test_archive_journals_turn_offsets_of_the_extracted_log(tmp_path: Path):
+    log = HEADER + "".join(_turn(number) for number in range(1, 6)) + "|win|Alice"
+    archive = ReplayArchive(tmp_path)
+    entry = archive.add("gen9doublesou-1", json.dumps({"log": log}).encode(), ".json")
+    archive.close()
+
+    assert entry["turns"] == TurnIndex.scan(log.encode()).offsets
+    assert len(entry["turns"]) == 6
+    reader = ReplayArchive(tmp_path, readonly=True)
+    assert reader["gen9doublesou-1"]["turns"] == entry["turns"]
+    assert slice_turns(log.encode(), entry["turns"], 5) == _turn(5) + "|win|Alice"
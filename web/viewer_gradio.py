@@ -1,40 +1,247 @@
+import contextlib
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
 from os import getenv
 from pathlib import Path
 
 import gradio as gr
 
+try:
+    from src.utils.battle_index import ARCHIVE_PREFIX, BattleIndex
+    from src.utils.log_tail import LogFollower, tail_lines
+    from src.utils.replay_archive import JOURNAL_NAME, ReplayArchive
+    from src.utils.showdown_protocol import log_from_blob
+    from src.utils.turn_index import TurnIndex, read_turns, sidecar_path
+except ImportError:  # allow running as a script without installing the package
+    ROOT = Path(__file__).resolve().parents[1]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from src.utils.battle_index import ARCHIVE_PREFIX, BattleIndex
+    from src.utils.log_tail import LogFollower, tail_lines
+    from src.utils.replay_archive import JOURNAL_NAME, ReplayArchive
+    from src.utils.showdown_protocol import log_from_blob
+    from src.utils.turn_index import TurnIndex, read_turns, sidecar_path
+
 REPLAY_DIR = Path(getenv("REPLAY_DIR", "replays"))
 REPLAY_DIR.mkdir(parents=True, exist_ok=True)
+REPLAY_ARCHIVE = getenv("REPLAY_ARCHIVE")  # optional compressed archive (fetch_replays --archive)
+REPLAY_INDEX = Path(getenv("REPLAY_INDEX", str(REPLAY_DIR / "battle_index.sqlite")))
+TURN_CACHE = REPLAY_INDEX.parent / "turn_cache"  # archived logs extracted on first read
+TURN_CACHE_FILES = int(getenv("TURN_CACHE_FILES", "256"))  # extracted logs kept, LRU
+PAGE_SIZE = 50
+FOLLOW_INTERVAL = float(getenv("FOLLOW_INTERVAL", "1.0"))  # seconds between polls
+INDEX_INTERVAL = float(getenv("INDEX_INTERVAL", "5.0"))  # seconds between index checks
+
+
+def open_archive():
+    if not REPLAY_ARCHIVE or not (Path(REPLAY_ARCHIVE) / JOURNAL_NAME).exists():
+        return None
+    return ReplayArchive(Path(REPLAY_ARCHIVE), readonly=True)
+
+
+INDEX = BattleIndex(REPLAY_INDEX)
+INDEX_LOCK = threading.Lock()  # one sqlite connection shared by Gradio's worker threads
+ARCHIVE = None  # reopened by refresh_index, so searches and turn reads share one journal parse
+SIGNATURE = None  # replay_signature() as of the last refresh
+CACHE_LOCK = threading.Lock()  # one TURN_CACHE trim at a time
+
+
+def replay_signature():
+    # Two stats instead of one per log: adding or removing a log bumps the directory's mtime,
+    # and a fetch adding replays to the archive grows its journal. A log growing in place does
+    # neither; "Refresh index" picks that up.
+    paths = [REPLAY_DIR]
+    if REPLAY_ARCHIVE:
+        paths.append(Path(REPLAY_ARCHIVE) / JOURNAL_NAME)
+    stats = [path.stat() for path in paths if path.exists()]
+    return tuple((st.st_mtime_ns, st.st_size) for st in stats)
+
+
+def refresh_index():
+    # Stats every log and archive entry (only new or changed ones are read). Taking the
+    # signature first means sidecars written by the update itself cost one more, quiet pass
+    # rather than hiding a log that arrived meanwhile.
+    global ARCHIVE, SIGNATURE
+    with INDEX_LOCK:
+        SIGNATURE = replay_signature()
+        ARCHIVE = open_archive()
+        stats = INDEX.update(REPLAY_DIR, archive=ARCHIVE)
+    return f"Index refreshed: {stats.summary()}"
+
+
+def refresh_if_changed():
+    # Run by the search and by a timer, so new logs show up without a full rescan per query.
+    if replay_signature() != SIGNATURE:
+        refresh_index()
+
+
+print(refresh_index())
+
 
+def list_battles(
+    format="", player="", team="", move="", winner="", min_turns=None, max_turns=None, page=1
+):
+    refresh_if_changed()
+    with INDEX_LOCK:
+        rows, total = INDEX.search(
+            format=format.strip() or None,
+            player=player.strip() or None,
+            team=[species.strip() for species in team.split(",")],
+            move=move.strip() or None,
+            winner=winner.strip() or None,
+            min_turns=int(min_turns) if min_turns else None,
+            max_turns=int(max_turns) if max_turns else None,
+            page=max(1, int(page or 1)) - 1,
+            page_size=PAGE_SIZE,
+        )
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    return [row["name"] for row in rows], f"{total} battles, page {int(page or 1)} of {pages}"
 
-def list_battles():
-    return sorted([f.name for f in REPLAY_DIR.glob("*.log")])
+
+def archived_log(replay_id: str):
+    # Path of an archived replay's log, extracted once into TURN_CACHE with its turn-offset
+    # sidecar, so later reads seek into it instead of inflating the whole member again. The
+    # content hash is in the name, so a replay re-added with new content is extracted afresh.
+    # None if it is not in the archive.
+    archive = ARCHIVE
+    if archive is None or replay_id not in archive:
+        return None
+    entry = archive[replay_id]
+    path = TURN_CACHE / f"{replay_id}-{entry['hash'][:16]}.log"
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(path)  # most recently used
+        return path
+    data = log_from_blob(archive.read(replay_id), entry["ext"]).encode()
+    offsets = entry.get("turns") or TurnIndex.scan(data).offsets  # entries older than "turns"
+    TURN_CACHE.mkdir(parents=True, exist_ok=True)
+    # Sidecar first and both via rename, so a concurrent reader never sees a log without it.
+    sidecar = sidecar_path(path)
+    tmp = sidecar.with_name(f"{sidecar.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(TurnIndex(list(offsets), len(data)).to_bytes())
+    os.replace(tmp, sidecar)
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    trim_turn_cache(keep=path)
+    return path
+
+
+def trim_turn_cache(keep: Path):
+    # Drops the least recently read extractions beyond TURN_CACHE_FILES, with their sidecars.
+    with CACHE_LOCK:
+        logs = sorted(TURN_CACHE.glob("*.log"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+        for stale in logs[max(1, TURN_CACHE_FILES) :]:
+            if stale == keep:
+                continue
+            for victim in (stale, sidecar_path(stale)):
+                victim.unlink(missing_ok=True)
 
 
 def read_battle(file_name: str, tail: int = 200):
     if not file_name:
         return ""
+    if file_name.startswith(ARCHIVE_PREFIX):
+        p = archived_log(file_name[len(ARCHIVE_PREFIX) :])
+        if p is None:
+            return "No such battle in archive"
+    else:
+        p = REPLAY_DIR / file_name
+        if not p.exists():
+            return "No such battle file"
+    lines, _ = tail_lines(p, int(tail))
+    return "\n".join(lines)
+
+
+def read_turn(file_name: str, turn=1, window=1):
+    # Seeks straight to the |turn| line via the offset index instead of reading the whole log.
+    if not file_name:
+        return ""
+    first = int(turn or 0)
+    last = first + max(1, int(window or 1)) - 1
+    if file_name.startswith(ARCHIVE_PREFIX):
+        p = archived_log(file_name[len(ARCHIVE_PREFIX) :])
+        if p is None:
+            return "No such battle in archive"
+    else:
+        p = REPLAY_DIR / file_name
+        if not p.exists():
+            return "No such battle file"
+    return read_turns(p, first, last)
+
+
+def follow_battle(file_name: str, tail: int = 200):
+    # Streams the tail of an in-progress log: one backwards read, then only appended bytes.
+    if not file_name or file_name.startswith(ARCHIVE_PREFIX):
+        yield read_battle(file_name, tail)
+        return
     p = REPLAY_DIR / file_name
     if not p.exists():
-        return "No such battle file"
-    lines = p.read_text(errors="ignore").splitlines()
-    return "\n".join(lines[-tail:])
+        yield "No such battle file"
+        return
+    lines, offset = tail_lines(p, int(tail), complete_only=True)
+    window = deque(lines, maxlen=int(tail))
+    follower = LogFollower(p, offset)
+    yield "\n".join(window)
+    while True:
+        time.sleep(FOLLOW_INTERVAL)
+        new_lines = follower.poll()
+        if new_lines:
+            window.extend(new_lines)
+            yield "\n".join(window)
 
 
 with gr.Blocks(title="Showdown RL viewer") as demo:
     gr.Markdown("# Battle Replays (tail view)")
     with gr.Row():
-        refresh = gr.Button("Refresh list")
-        battle = gr.Dropdown(choices=list_battles(), label="Battle file")
+        fmt = gr.Textbox(label="Format", placeholder="gen9doublesou")
+        player = gr.Textbox(label="Player")
+        team = gr.Textbox(label="Team", placeholder="Incineroar, Urshifu")
+        move = gr.Textbox(label="Move used")
+        winner = gr.Textbox(label="Winner")
+        min_turns = gr.Number(label="Min turns", precision=0)
+        max_turns = gr.Number(label="Max turns", precision=0)
+    with gr.Row():
+        page = gr.Number(value=1, label="Page", precision=0, minimum=1)
+        refresh = gr.Button("Search")
+        reindex = gr.Button("Refresh index")
+        status = gr.Markdown()
+    battle = gr.Dropdown(choices=[], label="Battle file")
     out = gr.Textbox(label="Tail", lines=24)
     tail = gr.Slider(100, 1000, value=200, step=50, label="Lines to show")
+    with gr.Row():
+        follow = gr.Button("Follow live")
+        stop = gr.Button("Stop")
+    with gr.Row():
+        turn = gr.Number(value=1, label="Turn", precision=0, minimum=0)
+        turn_window = gr.Number(value=1, label="Turns to show", precision=0, minimum=1)
+        jump = gr.Button("Jump to turn")
+
+    filters = [fmt, player, team, move, winner, min_turns, max_turns, page]
+
+    def refresh_choices(*values):
+        names, summary = list_battles(*values)
+        return gr.Dropdown(choices=names, value=None), summary
 
-    def refresh_choices():
-        return gr.Dropdown(choices=list_battles())
+    def reindex_choices(*values):
+        refreshed = refresh_index()
+        dropdown, summary = refresh_choices(*values)
+        return dropdown, f"{refreshed}. {summary}"
 
-    refresh.click(fn=refresh_choices, outputs=battle)
-    battle.change(fn=read_battle, inputs=[battle, tail], outputs=out)
-    tail.change(fn=read_battle, inputs=[battle, tail], outputs=out)
+    refresh.click(fn=refresh_choices, inputs=filters, outputs=[battle, status])
+    reindex.click(fn=reindex_choices, inputs=filters, outputs=[battle, status])
+    page.submit(fn=refresh_choices, inputs=filters, outputs=[battle, status])
+    demo.load(fn=refresh_choices, inputs=filters, outputs=[battle, status])
+    following = follow.click(fn=follow_battle, inputs=[battle, tail], outputs=out)
+    stop.click(fn=None, cancels=[following])
+    gr.Timer(INDEX_INTERVAL).tick(fn=refresh_if_changed)
+    jump.click(fn=read_turn, inputs=[battle, turn, turn_window], outputs=out, cancels=[following])
+    turn.submit(fn=read_turn, inputs=[battle, turn, turn_window], outputs=out, cancels=[following])
+    battle.change(fn=read_battle, inputs=[battle, tail], outputs=out, cancels=[following])
+    tail.change(fn=read_battle, inputs=[battle, tail], outputs=out, cancels=[following])
 
 if __name__ == "__main__":
     demo.launch()